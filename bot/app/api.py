@@ -0,0 +1,351 @@
+"""HTTP JSON API for the Mini App, served from the bot process.
+
+Every request carries the Mini App's signed ``initData`` in an
+``Authorization: tma <initData>`` header.  Cards belong to the signed
+user; with ``?chat_id=<group>`` they belong to that group instead, which
+the user must be a member of.
+
+=======  ==========================================  ===========================
+Method   Path                                        Result
+=======  ==========================================  ===========================
+GET      ``/api/cards[?q=<text>]``                   list / search cards
+POST     ``/api/cards``                              save a card (202 if queued)
+GET      ``/api/cards/<id>``                         one card
+DELETE   ``/api/cards/<id>``                         delete a card
+GET      ``/api/cards/<id>/barcode.<svg|png|webp>``  303 to the image URL
+=======  ==========================================  ===========================
+
+Images themselves are served without authentication from
+``/img/<key>.<format>``, where *key* is the ``RenderCache`` content key.
+Those URLs never change meaning, so clients and proxies may cache them
+forever.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any
+
+import orjson
+from telegram.constants import ChatMemberStatus
+from telegram.error import TelegramError
+from telegram.ext import Application
+from tornado.httpserver import HTTPServer
+from tornado.web import Application as WebApplication, HTTPError, RequestHandler
+
+from app.config import (
+    API_ALLOWED_ORIGINS,
+    API_PORT,
+    INIT_DATA_MAX_AGE_SECONDS,
+    RENDER_CACHE_DIR,
+    RENDER_CACHE_MAX_MB,
+    TELEGRAM_BOT_TOKEN,
+)
+from app.handlers.cards import prerender_card, resolve_profile
+from app.services.barcode_generator import (
+    IMAGE_FORMATS,
+    RENDER_PROFILES,
+    SUPPORTED_FORMATS,
+    validate_code,
+)
+from app.services.models import Card
+from app.services.opensearch_client import OpenSearchClient
+from app.services.render_cache import KEY_BYTES, RenderCache
+from app.services.resilience import StorageUnavailable
+from app.services.webapp_auth import WebAppAuthError, WebAppUser, validate_init_data
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY_BYTES = 64 * 1024
+MAX_CARD_NAME = 100
+
+_CARD_ID = r"([A-Za-z0-9_-]{20})"
+_IMAGE_KEY = rf"([0-9a-f]{{{KEY_BYTES * 2}}})"
+
+# Content-addressed images never change; a year is the customary maximum.
+_IMMUTABLE = "public, max-age=31536000, immutable"
+
+_CONTENT_TYPES = {
+    "png": "image/png",
+    "svg": "image/svg+xml",
+    "webp": "image/webp",
+}
+
+_MEMBER_STATUSES = {
+    ChatMemberStatus.OWNER,
+    ChatMemberStatus.ADMINISTRATOR,
+    ChatMemberStatus.MEMBER,
+}
+
+
+class ApiError(HTTPError):
+    """An error reported to the client as ``{"error": message}``."""
+
+    def __init__(self, status_code: int, message: str) -> None:
+        super().__init__(status_code)
+        self.message = message
+
+
+def _card_json(card: Card) -> dict[str, Any]:
+    return {
+        "id": card.id,
+        "card_name": card.card_name,
+        "barcode_format": card.barcode_format,
+        "format_label": SUPPORTED_FORMATS.get(card.barcode_format, card.barcode_format),
+        "card_code": card.card_code,
+        "created_at": card.created_at,
+        "render_profile": card.render_profile,
+    }
+
+
+# =====================================================================
+#  Request handlers
+# =====================================================================
+
+class _ApiHandler(RequestHandler):
+    """Authentication, owner resolution, CORS and JSON helpers."""
+
+    def initialize(self, bot_app: Application, render_cache: RenderCache) -> None:
+        self.bot_app = bot_app
+        self.render_cache = render_cache
+        self.user: WebAppUser | None = None
+        self.owner_id = 0
+
+    @property
+    def os_client(self) -> OpenSearchClient:
+        return self.bot_app.bot_data["os_client"]
+
+    def set_default_headers(self) -> None:
+        origin = self.request.headers.get("Origin", "")
+        if origin in API_ALLOWED_ORIGINS:
+            self.set_header("Access-Control-Allow-Origin", origin)
+            self.set_header("Vary", "Origin")
+
+    async def options(self, *args: str) -> None:
+        self.set_header("Access-Control-Allow-Methods", "GET, POST, DELETE, OPTIONS")
+        self.set_header("Access-Control-Allow-Headers", "Authorization, Content-Type")
+        self.set_header("Access-Control-Max-Age", "86400")
+        self.set_status(204)
+
+    async def prepare(self) -> None:
+        if self.request.method == "OPTIONS":
+            return
+
+        scheme, _, init_data = self.request.headers.get("Authorization", "").partition(" ")
+        if scheme.lower() != "tma":
+            raise ApiError(401, "Missing Mini App initData")
+        try:
+            self.user = validate_init_data(
+                init_data, TELEGRAM_BOT_TOKEN, INIT_DATA_MAX_AGE_SECONDS
+            )
+        except WebAppAuthError as exc:
+            raise ApiError(401, str(exc)) from None
+
+        chat_id = self.get_query_argument("chat_id", None)
+        if chat_id is None:
+            self.owner_id = self.user.id
+            return
+        try:
+            self.owner_id = int(chat_id)
+        except ValueError:
+            raise ApiError(400, "Bad chat_id") from None
+        await self._check_membership()
+
+    async def _check_membership(self) -> None:
+        assert self.user is not None
+        try:
+            member = await self.bot_app.bot.get_chat_member(self.owner_id, self.user.id)
+        except TelegramError:
+            raise ApiError(403, "Not a member of this chat") from None
+        if member.status not in _MEMBER_STATUSES and not getattr(member, "is_member", False):
+            raise ApiError(403, "Not a member of this chat")
+
+    def write_json(self, obj: Any, status: int = 200) -> None:
+        self.set_status(status)
+        self.set_header("Content-Type", "application/json")
+        self.finish(orjson.dumps(obj))
+
+    def write_error(self, status_code: int, **kwargs: Any) -> None:
+        exc = kwargs.get("exc_info", (None, None))[1]
+        if isinstance(exc, StorageUnavailable):
+            self.set_status(503)
+            self.set_header("Retry-After", "10")
+        message = exc.message if isinstance(exc, ApiError) else self._reason
+        self.set_header("Content-Type", "application/json")
+        self.finish(orjson.dumps({"error": message}))
+
+    async def owned_card(self, card_id: str) -> Card:
+        """Fetch *card_id* or fail with 404 if it does not belong to the owner."""
+        card = await asyncio.to_thread(self.os_client.get_card, card_id)
+        if card is None or card.owner_id != self.owner_id:
+            raise ApiError(404, "Card not found")
+        return card
+
+    async def image_url(
+        self, card: Card, image_format: str = "svg", profile: str | None = None,
+    ) -> str:
+        """Render *card* into the cache if needed and return its image path."""
+        if profile is None:
+            profile = await asyncio.to_thread(
+                resolve_profile, self.os_client, card.owner_id, card.render_profile
+            )
+        try:
+            key = await asyncio.to_thread(
+                self.render_cache.ensure,
+                card.card_code, card.barcode_format, profile, image_format,
+            )
+        except Exception:
+            logger.exception("Barcode generation failed for card %s", card.id)
+            raise ApiError(500, "Failed to generate barcode") from None
+        return f"/img/{key}.{image_format}"
+
+
+class CardsHandler(_ApiHandler):
+    async def get(self) -> None:
+        query = self.get_query_argument("q", "").strip()
+        if query:
+            cards = await asyncio.to_thread(self.os_client.search_cards, self.owner_id, query)
+        else:
+            cards = await asyncio.to_thread(self.os_client.get_cards, self.owner_id)
+        self.write_json({"cards": [
+            {
+                "id": card.id,
+                "card_name": card.card_name,
+                "barcode_format": card.barcode_format,
+            }
+            for card in cards
+        ]})
+
+    async def post(self) -> None:
+        try:
+            body = orjson.loads(self.request.body)
+            card_name = str(body.get("card_name") or "").strip()
+            card_code = str(body.get("card_code") or "").strip()
+            barcode_format = str(body.get("barcode_format") or "").strip().lower()
+        except (orjson.JSONDecodeError, AttributeError):
+            raise ApiError(400, "Expected a JSON object") from None
+
+        if not card_name or len(card_name) > MAX_CARD_NAME:
+            raise ApiError(400, f"Card name must be 1-{MAX_CARD_NAME} characters.")
+        ok, err = validate_code(card_code, barcode_format)
+        if not ok:
+            raise ApiError(400, err)
+
+        card_id, existing = await asyncio.to_thread(
+            self.os_client.add_card, self.owner_id, card_name, card_code, barcode_format
+        )
+        if existing is not None:
+            self.write_json({"card": _card_json(existing), "created": False})
+            return
+
+        self.bot_app.create_task(prerender_card(
+            self.bot_app.bot, self.os_client,
+            card_id, self.owner_id, card_code, barcode_format,
+        ))
+        card = Card(
+            id=card_id,
+            owner_id=self.owner_id,
+            card_name=card_name,
+            barcode_format=barcode_format,
+            card_code=card_code,
+        )
+        # Queued while storage is down: accepted, not yet stored.
+        pending = self.os_client.has_pending_writes(self.owner_id)
+        self.write_json(
+            {"card": _card_json(card), "created": True, "pending": pending},
+            status=202 if pending else 201,
+        )
+
+
+class CardHandler(_ApiHandler):
+    async def get(self, card_id: str) -> None:
+        card = await self.owned_card(card_id)
+        if (usage := self.bot_app.bot_data.get("usage")) is not None:
+            usage.record(card.id)
+        self.write_json({"card": _card_json(card), "image_url": await self.image_url(card)})
+
+    async def delete(self, card_id: str) -> None:
+        deleted = await asyncio.to_thread(self.os_client.delete_card, card_id, self.owner_id)
+        if not deleted:
+            raise ApiError(404, "Card not found")
+        self.set_status(204)
+
+
+class BarcodeHandler(_ApiHandler):
+    async def get(self, card_id: str, image_format: str) -> None:
+        card = await self.owned_card(card_id)
+        profile = self.get_query_argument("profile", None)
+        if profile is not None and profile not in RENDER_PROFILES:
+            raise ApiError(400, "Unknown render profile")
+        self.redirect(await self.image_url(card, image_format, profile), status=303)
+
+
+class ImageHandler(RequestHandler):
+    """Serve cached images with a strong ETag and immutable caching."""
+
+    def initialize(self, render_cache: RenderCache, **_: object) -> None:
+        self.render_cache = render_cache
+
+    def set_default_headers(self) -> None:
+        self.set_header("Access-Control-Allow-Origin", "*")
+
+    def compute_etag(self) -> str | None:
+        return None  # set explicitly from the content key
+
+    async def get(self, key: str, image_format: str) -> None:
+        etag = f'"{key}"'
+        self.set_header("ETag", etag)
+        self.set_header("Cache-Control", _IMMUTABLE)
+        if etag in self.request.headers.get("If-None-Match", ""):
+            self.set_status(304)
+            return
+
+        image = self.render_cache.read(key, image_format)
+        if image is None:
+            # Evicted (or never rendered): the API mints the URL again.
+            self.clear_header("Cache-Control")
+            self.clear_header("ETag")
+            self.set_status(404)
+            return
+        self.set_header("Content-Type", _CONTENT_TYPES[image_format])
+        self.finish(image)
+
+
+# =====================================================================
+#  Server lifecycle
+# =====================================================================
+
+def make_web_app(application: Application, render_cache: RenderCache) -> WebApplication:
+    """Build the tornado app; *application* provides the bot and storage."""
+    args = {"bot_app": application, "render_cache": render_cache}
+    image_formats = "|".join(IMAGE_FORMATS)
+    return WebApplication([
+        (r"/api/cards", CardsHandler, args),
+        (rf"/api/cards/{_CARD_ID}", CardHandler, args),
+        (rf"/api/cards/{_CARD_ID}/barcode\.({image_formats})", BarcodeHandler, args),
+        (rf"/img/{_IMAGE_KEY}\.({image_formats})", ImageHandler, args),
+    ])
+
+
+async def start_api(application: Application) -> None:
+    """``post_init`` hook: serve the API on ``API_PORT`` if it is set."""
+    if not API_PORT:
+        return
+    render_cache = RenderCache(
+        RENDER_CACHE_DIR, RENDER_CACHE_MAX_MB * 1024 * 1024, TELEGRAM_BOT_TOKEN.encode()
+    )
+    server = HTTPServer(
+        make_web_app(application, render_cache), max_body_size=MAX_BODY_BYTES
+    )
+    server.listen(API_PORT)
+    application.bot_data["api_server"] = server
+    logger.info("Mini App API listening on port %d", API_PORT)
+
+
+async def stop_api(application: Application) -> None:
+    """``post_shutdown`` hook."""
+    server: HTTPServer | None = application.bot_data.pop("api_server", None)
+    if server is not None:
+        server.stop()
+        await server.close_all_connections()
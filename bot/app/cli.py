@@ -0,0 +1,92 @@
+"""Admin command line for bulk card import / export.
+
+Usage::
+
+    python -m app.cli import --owner 123456 cards.csv
+    python -m app.cli export --owner 123456 --format json > cards.jsonl
+
+Connection settings come from ``OPENSEARCH_HOST`` / ``OPENSEARCH_PORT``
+(no Telegram token needed).  Files are streamed, so they can be larger
+than memory.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import sys
+
+from app.services.card_io import (
+    CHUNK_SIZE,
+    EXPORT_FORMATS,
+    ImportReport,
+    export_cards,
+    import_cards,
+    iter_rows,
+)
+from app.services.opensearch_client import OpenSearchClient
+
+
+def _client(args: argparse.Namespace) -> OpenSearchClient:
+    client = OpenSearchClient(args.host, args.port)
+    client.wait_for_cluster(retries=3)
+    client.init_index()
+    return client
+
+
+def _cmd_import(args: argparse.Namespace) -> int:
+    client = _client(args)
+
+    def on_progress(report: ImportReport) -> None:
+        print(f"{report.imported} saved, {report.failed} rejected", file=sys.stderr)
+
+    with open(args.file, "rb") if args.file != "-" else sys.stdin.buffer as stream:
+        report = import_cards(
+            client, args.owner, iter_rows(stream), args.chunk_size, on_progress
+        )
+
+    for row_no, message in report.errors:
+        print(f"row {row_no}: {message}", file=sys.stderr)
+    if report.failed > len(report.errors):
+        print(f"… and {report.failed - len(report.errors)} more", file=sys.stderr)
+    print(f"Imported {report.imported} card(s), rejected {report.failed}.", file=sys.stderr)
+    return 1 if report.failed else 0
+
+
+def _cmd_export(args: argparse.Namespace) -> int:
+    client = _client(args)
+    if args.output == "-":
+        count = export_cards(client, args.owner, sys.stdout, args.format)
+    else:
+        with open(args.output, "w", encoding="utf-8", newline="") as out:
+            count = export_cards(client, args.owner, out, args.format)
+    print(f"Exported {count} card(s).", file=sys.stderr)
+    return 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description=__doc__.split("\n")[0])
+    parser.add_argument("--host", default=os.environ.get("OPENSEARCH_HOST", "opensearch"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("OPENSEARCH_PORT", "9200")))
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_import = sub.add_parser("import", help="import cards from a CSV / JSON file")
+    p_import.add_argument("--owner", type=int, required=True, help="user id or group chat id")
+    p_import.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    p_import.add_argument("file", help="file to read, or - for stdin")
+    p_import.set_defaults(func=_cmd_import)
+
+    p_export = sub.add_parser("export", help="export cards to CSV / JSON Lines")
+    p_export.add_argument("--owner", type=int, required=True, help="user id or group chat id")
+    p_export.add_argument("--format", choices=EXPORT_FORMATS, default="csv")
+    p_export.add_argument("-o", "--output", default="-", help="file to write, or - for stdout")
+    p_export.set_defaults(func=_cmd_export)
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,8 +5,89 @@ TELEGRAM_BOT_TOKEN: str = os.environ["TELEGRAM_BOT_TOKEN"]
 OPENSEARCH_HOST: str = os.environ.get("OPENSEARCH_HOST", "opensearch")
 OPENSEARCH_PORT: int = int(os.environ.get("OPENSEARCH_PORT", "9200"))
 
+# Deadlines (seconds) for interactive OpenSearch reads and writes.  After
+# BREAKER_FAILURE_THRESHOLD consecutive failures calls fail fast for
+# BREAKER_RESET_SECONDS; reads then fall back to the last known answer and
+# writes are queued in WRITE_QUEUE_PATH until OpenSearch is back.
+OPENSEARCH_READ_TIMEOUT: float = float(os.environ.get("OPENSEARCH_READ_TIMEOUT", "2"))
+OPENSEARCH_WRITE_TIMEOUT: float = float(os.environ.get("OPENSEARCH_WRITE_TIMEOUT", "5"))
+BREAKER_FAILURE_THRESHOLD: int = int(os.environ.get("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_SECONDS: float = float(os.environ.get("BREAKER_RESET_SECONDS", "10"))
+WRITE_QUEUE_PATH: str = os.environ.get("WRITE_QUEUE_PATH", "data/write-queue.jsonl")
+
 # Optional: HTTPS URL where webapp/scanner.html is served.
 # Telegram WebApps require HTTPS. Leave empty to disable the in-chat scanner button.
 WEBAPP_URL: str = os.environ.get("WEBAPP_URL", "")
 
+# Optional: chat the bot uploads pre-rendered barcodes to (and immediately
+# deletes them from) to obtain reusable Telegram file_ids.  0 disables it.
+RENDER_CACHE_CHAT_ID: int = int(os.environ.get("RENDER_CACHE_CHAT_ID", "0"))
+
+# Threads used to decode photos, and how long to wait for the rest of an
+# album (media group) before decoding all of its photos in one go.
+DECODE_WORKERS: int = int(os.environ.get("DECODE_WORKERS", "4"))
+ALBUM_WINDOW_SECONDS: float = float(os.environ.get("ALBUM_WINDOW_SECONDS", "1.5"))
+
+# Maximum number of updates processed at the same time.  Updates from the
+# same (chat, user) are always processed one after another.  1 = sequential.
+CONCURRENT_UPDATES: int = int(os.environ.get("CONCURRENT_UPDATES", "16"))
+
+# Optional: port of the HTTP API used by the Mini App (0 disables it), the
+# origins allowed to call it (defaults to the origin of WEBAPP_URL), and how
+# long a signed Mini App ``initData`` stays valid.
+API_PORT: int = int(os.environ.get("API_PORT", "0"))
+API_ALLOWED_ORIGINS: frozenset[str] = frozenset(
+    origin.strip().rstrip("/")
+    for origin in os.environ.get(
+        "API_ALLOWED_ORIGINS", "/".join(WEBAPP_URL.split("/")[:3])
+    ).split(",")
+    if origin.strip()
+)
+INIT_DATA_MAX_AGE_SECONDS: int = int(os.environ.get("INIT_DATA_MAX_AGE_SECONDS", "86400"))
+
+# Rendered images served by the API are kept on disk here, up to this size.
+RENDER_CACHE_DIR: str = os.environ.get("RENDER_CACHE_DIR", "/tmp/barcode-render-cache")
+RENDER_CACHE_MAX_MB: int = int(os.environ.get("RENDER_CACHE_MAX_MB", "256"))
+
+# Conversations (add card, import, scanner naming) left idle this long are
+# ended and their scratch data dropped.
+CONVERSATION_TIMEOUT_SECONDS: float = float(
+    os.environ.get("CONVERSATION_TIMEOUT_SECONDS", "900")
+)
+
+# ``user_data`` is kept for at most this many users; the least recently
+# active ones are dropped first, but never within the conversation timeout.
+USER_DATA_MAX_USERS: int = int(os.environ.get("USER_DATA_MAX_USERS", "10000"))
+
+# Comma-separated Telegram user ids allowed to use admin commands (/memory,
+# /profile).
+ADMIN_USER_IDS: frozenset[int] = frozenset(
+    int(uid) for uid in os.environ.get("ADMIN_USER_IDS", "").split(",") if uid.strip()
+)
+
+# Card opens are counted in memory and written to OpenSearch in one bulk
+# request this often (and at shutdown).
+USAGE_FLUSH_SECONDS: float = float(os.environ.get("USAGE_FLUSH_SECONDS", "30"))
+
+# Tracing: every update is traced; TRACE_SAMPLE_RATIO of the traces are
+# exported through TRACE_EXPORTER ("jsonl" to TRACE_JSONL_PATH, "otlp" to an
+# OTLP/HTTP collector at TRACE_OTLP_ENDPOINT, empty for none).  Updates
+# slower than SLOW_UPDATE_SECONDS are always exported and logged with their
+# span tree (0 disables that).
+TRACE_EXPORTER: str = os.environ.get("TRACE_EXPORTER", "").lower()
+TRACE_JSONL_PATH: str = os.environ.get("TRACE_JSONL_PATH", "data/traces.jsonl")
+TRACE_OTLP_ENDPOINT: str = os.environ.get(
+    "TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces"
+)
+TRACE_SAMPLE_RATIO: float = float(os.environ.get("TRACE_SAMPLE_RATIO", "0.1"))
+SLOW_UPDATE_SECONDS: float = float(os.environ.get("SLOW_UPDATE_SECONDS", "2"))
+
+# The event loop blocked for longer than this many seconds is reported with
+# the blocking stack trace (0 disables the watchdog).
+STALL_THRESHOLD_SECONDS: float = float(os.environ.get("STALL_THRESHOLD_SECONDS", "1"))
+
+# The first "card added" notification to a group is sent at once; cards added
+# within this many seconds after it are collected and sent as one message.
+GROUP_DIGEST_SECONDS: float = float(os.environ.get("GROUP_DIGEST_SECONDS", "30"))
+
 LOG_LEVEL: str = os.environ.get("LOG_LEVEL", "INFO")
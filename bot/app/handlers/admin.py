@@ -0,0 +1,86 @@
+"""Operator commands, restricted to ``ADMIN_USER_IDS``."""
+
+from __future__ import annotations
+
+import asyncio
+import io
+import time
+
+from telegram import Update
+from telegram.ext import ContextTypes
+
+from app.config import ADMIN_USER_IDS
+from app.memory import memory_report
+from app.profiling import collapsed, sample_stacks
+
+PROFILE_DEFAULT_SECONDS = 10
+PROFILE_MAX_SECONDS = 60
+
+
+def _is_admin(update: Update) -> bool:
+    user = update.effective_user
+    return user is not None and user.id in ADMIN_USER_IDS
+
+
+def _kib(size: int) -> str:
+    return f"{size / 1024:.1f} KiB"
+
+
+async def memory_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """``/memory`` — size of per-user / per-chat data held by the bot."""
+    if not _is_admin(update):
+        return
+
+    report = memory_report(context.application)
+    lru = context.bot_data.get("user_data_lru")
+    lines = [
+        "\U0001f9e0 *Memory*\n",
+        f"user\\_data: {report.users} user(s)",
+        f"chat\\_data: {report.chats} chat(s)",
+        f"Entries: {report.entries}",
+        f"Size: {_kib(report.bytes)}",
+    ]
+    if lru is not None:
+        lines.append(f"Tracked users: {len(lru)}, evicted: {lru.evicted}")
+    if report.top_users:
+        lines.append("\n*Largest owners:*")
+        lines += [f"`{user_id}` \u2014 {_kib(size)}" for user_id, size in report.top_users]
+
+    await update.message.reply_text("\n".join(lines), parse_mode="Markdown")  # type: ignore[union-attr]
+
+
+async def profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """``/profile [seconds]`` — sample all threads and send collapsed stacks.
+
+    The file loads into speedscope or ``flamegraph.pl`` as a flame graph.
+    """
+    if not _is_admin(update):
+        return
+    message = update.message
+    assert message is not None
+
+    try:
+        seconds = float(context.args[0]) if context.args else PROFILE_DEFAULT_SECONDS
+    except ValueError:
+        await message.reply_text("Usage: /profile [seconds]")
+        return
+    seconds = min(max(seconds, 1), PROFILE_MAX_SECONDS)
+
+    await message.reply_text(f"\u23f1\ufe0f Profiling for {seconds:g} s\u2026")
+    try:
+        counts = await asyncio.to_thread(sample_stacks, seconds)
+    except RuntimeError as exc:
+        await message.reply_text(f"\u274c {exc}.")
+        return
+    if not counts:
+        await message.reply_text("Nothing was running while sampling.")
+        return
+
+    await message.reply_document(
+        document=io.BytesIO(collapsed(counts).encode()),
+        filename=f"profile-{int(time.time())}.folded",
+        caption=(
+            f"{sum(counts.values())} samples, {len(counts)} distinct stacks.\n"
+            "Open in speedscope.app or pipe through flamegraph.pl."
+        ),
+    )
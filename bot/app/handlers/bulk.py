@@ -0,0 +1,185 @@
+"""Bulk import (``/import``) and export (``/export``) of cards."""
+
+from __future__ import annotations
+
+import asyncio
+import io
+import logging
+import tempfile
+from concurrent.futures import Future
+
+from telegram import Update
+from telegram.ext import (
+    CommandHandler,
+    ContextTypes,
+    ConversationHandler,
+    MessageHandler,
+    filters,
+)
+
+from app.config import CONVERSATION_TIMEOUT_SECONDS
+from app.services.card_io import (
+    EXPORT_FORMATS,
+    ImportReport,
+    export_cards,
+    import_cards,
+    iter_rows,
+)
+from app.services.opensearch_client import OpenSearchClient
+
+logger = logging.getLogger(__name__)
+
+# State for the import conversation
+IMPORT_FILE = 0
+
+# Files this large are spooled to disk instead of being held in memory.
+_SPOOL_BYTES = 1024 * 1024
+
+
+def _os(context: ContextTypes.DEFAULT_TYPE) -> OpenSearchClient:
+    return context.bot_data["os_client"]
+
+
+def _owner_id(update: Update) -> int:
+    """Return the card owner: user_id in private chats, chat_id in groups."""
+    chat = update.effective_chat
+    if chat and chat.type != "private":
+        return chat.id
+    return update.effective_user.id  # type: ignore[union-attr]
+
+
+def _progress_text(report: ImportReport) -> str:
+    return f"\u23f3 Importing\u2026 {report.imported} saved, {report.failed} rejected."
+
+
+# =====================================================================
+#  Import
+# =====================================================================
+
+async def import_entry(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Ask for the file to import."""
+    await update.message.reply_text(  # type: ignore[union-attr]
+        "\U0001f4e5 *Import cards*\n\n"
+        "Send a CSV file with the columns `card_name`, `card_code` and "
+        "`barcode_format`, or a JSON file (array or one object per line) "
+        "with the same keys.\n\n/cancel to abort.",
+        parse_mode="Markdown",
+    )
+    return IMPORT_FILE
+
+
+async def import_received_file(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Download the document to a spool file and import it chunk by chunk."""
+    owner = _owner_id(update)
+    status = await update.message.reply_text("\u23f3 Importing\u2026")  # type: ignore[union-attr]
+    loop = asyncio.get_running_loop()
+
+    async def show_progress(text: str) -> None:
+        try:
+            await status.edit_text(text)
+        except Exception:
+            logger.debug("Progress update failed", exc_info=True)
+
+    # Progress edits still in flight; the final report must not race them.
+    edits: list[Future] = []
+
+    def on_progress(report: ImportReport) -> None:
+        edits[:] = [edit for edit in edits if not edit.done()]
+        edits.append(
+            asyncio.run_coroutine_threadsafe(show_progress(_progress_text(report)), loop)
+        )
+
+    with tempfile.SpooledTemporaryFile(max_size=_SPOOL_BYTES) as spool:
+        tg_file = await update.message.document.get_file()  # type: ignore[union-attr]
+        await tg_file.download_to_memory(spool)
+        spool.seek(0)
+        try:
+            report = await asyncio.to_thread(
+                import_cards, _os(context), owner, iter_rows(spool), on_progress=on_progress
+            )
+        except Exception:
+            logger.exception("Import failed")
+            await asyncio.gather(*map(asyncio.wrap_future, edits))
+            await status.edit_text("\u274c Import failed. Please try again.")
+            return ConversationHandler.END
+        await asyncio.gather(*map(asyncio.wrap_future, edits))
+
+    lines = [f"\u2705 Import finished: {report.imported} saved, {report.failed} rejected."]
+    if report.errors:
+        lines.append("")
+        lines += [f"Row {row_no}: {message}" for row_no, message in report.errors]
+        if report.failed > len(report.errors):
+            lines.append(f"\u2026 and {report.failed - len(report.errors)} more.")
+    await status.edit_text("\n".join(lines))
+    return ConversationHandler.END
+
+
+async def import_not_a_file(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    await update.message.reply_text(  # type: ignore[union-attr]
+        "Please send the cards as a file, or /cancel."
+    )
+    return IMPORT_FILE
+
+
+async def import_cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    await update.message.reply_text("\u274c Import cancelled.")  # type: ignore[union-attr]
+    return ConversationHandler.END
+
+
+def build_import_conversation() -> ConversationHandler:
+    """Return a ConversationHandler for ``/import`` → file → report."""
+    return ConversationHandler(
+        entry_points=[CommandHandler("import", import_entry)],
+        states={
+            IMPORT_FILE: [
+                MessageHandler(filters.Document.ALL, import_received_file),
+                MessageHandler(filters.TEXT & ~filters.COMMAND, import_not_a_file),
+            ],
+        },
+        fallbacks=[CommandHandler("cancel", import_cancel)],
+        conversation_timeout=CONVERSATION_TIMEOUT_SECONDS,
+        per_user=True,
+        per_chat=True,
+    )
+
+
+# =====================================================================
+#  Export
+# =====================================================================
+
+async def export_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """``/export [csv|json]`` — send all cards as a file."""
+    fmt = (context.args[0].lower() if context.args else "csv")
+    if fmt not in EXPORT_FORMATS:
+        await update.message.reply_text(  # type: ignore[union-attr]
+            f"Usage: /export [{'|'.join(EXPORT_FORMATS)}]"
+        )
+        return
+
+    owner = _owner_id(update)
+
+    def write(spool: tempfile.SpooledTemporaryFile) -> int:
+        text = io.TextIOWrapper(spool, encoding="utf-8", newline="")
+        count = export_cards(_os(context), owner, text, fmt)
+        text.flush()
+        text.detach()
+        return count
+
+    with tempfile.SpooledTemporaryFile(max_size=_SPOOL_BYTES) as spool:
+        try:
+            count = await asyncio.to_thread(write, spool)
+        except Exception:
+            logger.exception("Export failed")
+            await update.message.reply_text("\u274c Export failed. Please try again.")  # type: ignore[union-attr]
+            return
+
+        if not count:
+            await update.message.reply_text("\U0001f4cb Nothing to export.")  # type: ignore[union-attr]
+            return
+
+        spool.seek(0)
+        await update.message.reply_document(  # type: ignore[union-attr]
+            document=spool,
+            filename=f"cards.{'csv' if fmt == 'csv' else 'jsonl'}",
+            caption=f"\U0001f4e4 {count} card(s) exported.",
+        )
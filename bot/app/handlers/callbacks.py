@@ -0,0 +1,214 @@
+"""Compact ``callback_data`` codec and the single callback-query router.
+
+Every button carries ``<tag><payload>``: *tag* is one character naming the
+action and *payload* is unpadded base64url of a version byte followed by
+typed fields:
+
+* ``0x01`` — a 20-character card id, stored as its 15 raw bytes
+* ``0x02`` — an integer (zig-zag varint), e.g. a pagination cursor
+* ``0x03`` — a short UTF-8 string (one length byte)
+
+A card button therefore costs 24 bytes of Telegram's 64-byte budget
+instead of 30, and buttons from an older ``CALLBACK_VERSION`` are rejected
+instead of being misread.  ``CallbackRouter`` dispatches on the tag with a
+single dict lookup.
+"""
+
+from __future__ import annotations
+
+import base64
+import binascii
+import logging
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from telegram import Update
+from telegram.ext import ContextTypes
+
+from app.services.tracing import span
+
+logger = logging.getLogger(__name__)
+
+CALLBACK_VERSION = 1
+
+# Action tags
+MY_CARDS = "L"
+ADD_CARD = "A"
+MENU = "M"
+SHOW_CARD = "S"
+DELETE_CARD = "D"
+CARD_STYLE = "Y"
+RENAME_CARD = "R"
+RENDER_PROFILE = "P"
+ALBUM_SAVE = "G"
+PICK_FORMAT = "F"
+CONFIRM = "C"
+
+_ID = 0x01
+_INT = 0x02
+_STR = 0x03
+
+_ID_CHARS = 20
+_ID_BYTES = 15
+
+Field = str | int
+CallbackHandler = Callable[..., Awaitable[Any]]
+
+
+# ── codec ────────────────────────────────────────────────────────────
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def _as_id_bytes(value: str) -> bytes | None:
+    """Return the 15 raw bytes behind a 20-char base64url id, if it is one."""
+    if len(value) != _ID_CHARS:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(value)
+    except (binascii.Error, ValueError):
+        return None
+    return raw if _b64encode(raw) == value else None
+
+
+def _varint(value: int) -> bytes:
+    value = value * 2 if value >= 0 else -value * 2 - 1  # zig-zag
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def encode(tag: str, *fields: Field) -> str:
+    """Build the ``callback_data`` for action *tag* with *fields*."""
+    raw = bytearray([CALLBACK_VERSION])
+    for value in fields:
+        if isinstance(value, int):
+            raw.append(_INT)
+            raw += _varint(value)
+            continue
+        id_bytes = _as_id_bytes(value)
+        if id_bytes is not None:
+            raw.append(_ID)
+            raw += id_bytes
+        else:
+            data = value.encode()
+            if len(data) > 255:
+                raise ValueError("callback string field too long")
+            raw.append(_STR)
+            raw.append(len(data))
+            raw += data
+    out = tag + _b64encode(bytes(raw))
+    if len(out.encode()) > 64:
+        raise ValueError("callback_data exceeds 64 bytes")
+    return out
+
+
+def decode(data: str) -> tuple[str, list[Field]]:
+    """Split ``callback_data`` into ``(tag, fields)``.
+
+    Raises ``ValueError`` for malformed data or another codec version.
+    """
+    if not data:
+        raise ValueError("empty callback_data")
+    try:
+        raw = _b64decode(data[1:])
+    except (binascii.Error, ValueError) as exc:
+        raise ValueError("malformed callback_data") from exc
+    if not raw or raw[0] != CALLBACK_VERSION:
+        raise ValueError("unsupported callback_data version")
+
+    fields: list[Field] = []
+    pos = 1
+    try:
+        while pos < len(raw):
+            kind = raw[pos]
+            pos += 1
+            if kind == _ID:
+                fields.append(_b64encode(raw[pos:pos + _ID_BYTES]))
+                pos += _ID_BYTES
+            elif kind == _INT:
+                value = shift = 0
+                while True:
+                    byte = raw[pos]
+                    pos += 1
+                    value |= (byte & 0x7F) << shift
+                    shift += 7
+                    if not byte & 0x80:
+                        break
+                fields.append((value >> 1) ^ -(value & 1))
+            elif kind == _STR:
+                length = raw[pos]
+                fields.append(raw[pos + 1:pos + 1 + length].decode())
+                pos += 1 + length
+            else:
+                raise ValueError(f"unknown field type {kind}")
+    except (IndexError, UnicodeDecodeError) as exc:
+        raise ValueError("truncated callback_data") from exc
+    return data[0], fields
+
+
+def tag_pattern(tag: str) -> Callable[[object], bool]:
+    """``CallbackQueryHandler`` pattern matching one tag without a regex."""
+    return lambda data: isinstance(data, str) and data[:1] == tag
+
+
+# ── router ───────────────────────────────────────────────────────────
+
+class CallbackRouter:
+    """Dispatch callback queries to ``handler(update, context, *fields)``.
+
+    Plain ``ns:action:arg`` strings from buttons sent before the compact
+    codec are still understood through ``legacy`` routes.
+    """
+
+    def __init__(self) -> None:
+        self._routes: dict[str, CallbackHandler] = {}
+        self._legacy: dict[str, CallbackHandler] = {}
+
+    def route(self, tag: str, handler: CallbackHandler) -> None:
+        self._routes[tag] = handler
+
+    def legacy(self, prefix: str, handler: CallbackHandler) -> None:
+        """Route old ``prefix:…`` data; *prefix* is ``ns`` or ``ns:action``."""
+        self._legacy[prefix] = handler
+
+    async def dispatch(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        query = update.callback_query
+        assert query is not None
+        data = query.data or ""
+
+        if ":" in data:
+            parts = data.split(":")
+            handler = self._legacy.get(":".join(parts[:2]))
+            args = parts[2:]
+            if handler is None:
+                handler = self._legacy.get(parts[0])
+                args = parts[1:]
+            if handler is not None:
+                with span(f"callback.{handler.__qualname__}", legacy=True):
+                    await handler(update, context, *args)
+                return
+        else:
+            handler = self._routes.get(data[:1])
+            if handler is not None:
+                try:
+                    _, fields = decode(data)
+                except ValueError:
+                    logger.debug("Rejected callback_data %r", data)
+                else:
+                    with span(f"callback.{handler.__qualname__}"):
+                        await handler(update, context, *fields)
+                    return
+
+        await query.answer("\u26a0\ufe0f This button has expired.")
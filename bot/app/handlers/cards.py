@@ -2,36 +2,51 @@
 
 from __future__ import annotations
 
+import asyncio
 import logging
 
-from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
+from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup, Update
 from telegram.ext import (
     CallbackQueryHandler,
     CommandHandler,
     ContextTypes,
     ConversationHandler,
     MessageHandler,
+    TypeHandler,
     filters,
 )
 
-from app.services.barcode_decoder import decode_barcode
+from app.config import CONVERSATION_TIMEOUT_SECONDS, RENDER_CACHE_CHAT_ID
+from app.handlers import callbacks as cb
+from app.services.barcode_decoder import decode_barcode_async
 from app.services.barcode_generator import (
+    DEFAULT_PROFILE,
+    RENDER_PROFILES,
     SUPPORTED_FORMATS,
-    generate_barcode_image,
+    render_barcode,
     validate_code,
 )
-from app.services.opensearch_client import OpenSearchClient
+from app.services.models import Card
+from app.services.opensearch_client import CARD_SORTS, OpenSearchClient
+from app.services.usage import UsageTracker
 
 logger = logging.getLogger(__name__)
 
 # Conversation states
 NAME, CODE, FORMAT, CONFIRM = range(4)
 
+# How many unanswered "rename?" prompts per user are remembered.
+_MAX_PENDING_RENAMES = 5
+
 
 def _os(context: ContextTypes.DEFAULT_TYPE) -> OpenSearchClient:
     return context.bot_data["os_client"]
 
 
+def _usage(context: ContextTypes.DEFAULT_TYPE) -> UsageTracker | None:
+    return context.bot_data.get("usage")
+
+
 def _owner_id(update: Update) -> int:
     """Return the card owner: user_id in private chats, chat_id in groups."""
     chat = update.effective_chat
@@ -41,9 +56,12 @@ def _owner_id(update: Update) -> int:
 
 
 # ── format selection keyboard ────────────────────────────────────────
-_FORMAT_KB = InlineKeyboardMarkup([
-    [InlineKeyboardButton(label, callback_data=f"fmt:{key}")]
+_FORMAT_BUTTONS = [
+    InlineKeyboardButton(label, callback_data=cb.encode(cb.PICK_FORMAT, key))
     for key, label in SUPPORTED_FORMATS.items()
+]
+_FORMAT_KB = InlineKeyboardMarkup([
+    _FORMAT_BUTTONS[i:i + 2] for i in range(0, len(_FORMAT_BUTTONS), 2)
 ])
 
 
@@ -91,7 +109,7 @@ async def received_code_photo(update: Update, context: ContextTypes.DEFAULT_TYPE
     tg_file = await photo.get_file()
     image_bytes = await tg_file.download_as_bytearray()
 
-    results = decode_barcode(bytes(image_bytes))
+    results = await decode_barcode_async(bytes(image_bytes))
     if not results:
         await update.message.reply_text(  # type: ignore[union-attr]
             "\u274c Could not decode any barcode.\n"
@@ -109,10 +127,12 @@ async def received_code_photo(update: Update, context: ContextTypes.DEFAULT_TYPE
         f"Suggested format: *{fmt_label}*\n\nSave this card?",
         reply_markup=InlineKeyboardMarkup([
             [
-                InlineKeyboardButton("\u2705 Save", callback_data="cfm:yes"),
-                InlineKeyboardButton("\U0001f504 Change format", callback_data="cfm:chfmt"),
+                InlineKeyboardButton("\u2705 Save", callback_data=cb.encode(cb.CONFIRM, "yes")),
+                InlineKeyboardButton(
+                    "\U0001f504 Change format", callback_data=cb.encode(cb.CONFIRM, "chfmt")
+                ),
             ],
-            [InlineKeyboardButton("\u274c Cancel", callback_data="cfm:cancel")],
+            [InlineKeyboardButton("\u274c Cancel", callback_data=cb.encode(cb.CONFIRM, "cancel"))],
         ]),
         parse_mode="Markdown",
     )
@@ -125,8 +145,10 @@ async def received_format(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     assert query is not None
     await query.answer()
 
-    barcode_format = query.data.split(":")[1]  # type: ignore[union-attr]
+    barcode_format = _single_field(query.data)
     code = context.user_data["new_card_code"]
+    if barcode_format not in SUPPORTED_FORMATS:
+        return FORMAT
 
     ok, err = validate_code(code, barcode_format)
     if not ok:
@@ -144,8 +166,8 @@ async def received_format(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         "Save this card?",
         reply_markup=InlineKeyboardMarkup([
             [
-                InlineKeyboardButton("\u2705 Save", callback_data="cfm:yes"),
-                InlineKeyboardButton("\u274c Cancel", callback_data="cfm:cancel"),
+                InlineKeyboardButton("\u2705 Save", callback_data=cb.encode(cb.CONFIRM, "yes")),
+                InlineKeyboardButton("\u274c Cancel", callback_data=cb.encode(cb.CONFIRM, "cancel")),
             ],
         ]),
         parse_mode="Markdown",
@@ -159,7 +181,7 @@ async def confirm_save(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
     assert query is not None
     await query.answer()
 
-    action = query.data.split(":")[1]  # type: ignore[union-attr]
+    action = _single_field(query.data)
 
     if action == "cancel":
         await query.edit_message_text("\u274c Card creation cancelled.")
@@ -179,11 +201,21 @@ async def confirm_save(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
     barcode_format = context.user_data["new_card_format"]
 
     try:
-        _os(context).add_card(owner, card_name, card_code, barcode_format)
-        await query.edit_message_text(
-            f"\u2705 Card *{card_name}* saved!\n\nUse /mycards to view your barcodes.",
-            parse_mode="Markdown",
+        card_id, existing = await asyncio.to_thread(
+            _os(context).add_card, owner, card_name, card_code, barcode_format
         )
+        if existing and existing.card_name != card_name:
+            text, kb = duplicate_prompt(context, card_id, owner, existing, card_name)
+            await query.edit_message_text(text, reply_markup=kb, parse_mode="Markdown")
+        else:
+            headline = f"\u2705 Card *{card_name}* saved!"
+            if existing is None:
+                schedule_prerender(context, card_id, owner, card_code, barcode_format)
+                headline = save_headline(context, owner, card_name)
+            await query.edit_message_text(
+                f"{headline}\n\nUse /mycards to view your barcodes.",
+                parse_mode="Markdown",
+            )
     except Exception:
         logger.exception("Failed to save card")
         await query.edit_message_text("\u274c Failed to save card. Please try again.")
@@ -199,19 +231,124 @@ async def cancel_conversation(update: Update, context: ContextTypes.DEFAULT_TYPE
     return ConversationHandler.END
 
 
+async def conversation_timeout(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Drop the scratch data of an add-card flow left idle too long."""
+    _clear_temp(context)
+
+
+def save_headline(
+    context: ContextTypes.DEFAULT_TYPE, owner_id: int, card_name: str, where: str = "",
+) -> str:
+    """Confirm a new card, or say it is queued until storage is back."""
+    if _os(context).has_pending_writes(owner_id):
+        return f"\u23f3 Card *{card_name}* will be saved{where} as soon as storage is back."
+    return f"\u2705 Card *{card_name}* saved{where}!"
+
+
+def _single_field(data: str | None) -> str:
+    """Return the one string argument of a format / confirm button."""
+    try:
+        _, fields = cb.decode(data or "")
+    except ValueError:
+        return ""
+    return str(fields[0]) if fields else ""
+
+
 def _clear_temp(context: ContextTypes.DEFAULT_TYPE) -> None:
     for key in ("new_card_name", "new_card_code", "new_card_format"):
         context.user_data.pop(key, None)
 
 
+# =====================================================================
+#  Duplicate cards
+# =====================================================================
+
+def duplicate_prompt(
+    context: ContextTypes.DEFAULT_TYPE,
+    card_id: str,
+    owner_id: int,
+    existing: Card,
+    new_name: str,
+) -> tuple[str, InlineKeyboardMarkup]:
+    """Build the "card already exists, rename?" message for a re-saved card.
+
+    The requested name is parked in ``user_data`` until ``rename_card_cb``.
+    """
+    pending: dict[str, dict] = context.user_data.setdefault("rename_pending", {})
+    pending.pop(card_id, None)
+    pending[card_id] = {"owner_id": owner_id, "card_name": new_name}
+    while len(pending) > _MAX_PENDING_RENAMES:
+        pending.pop(next(iter(pending)))
+    text = (
+        f"\u2139\ufe0f This card already exists as *{existing.card_name}*.\n\n"
+        f"Rename it to *{new_name}*?"
+    )
+    kb = InlineKeyboardMarkup([[
+        InlineKeyboardButton(
+            "\u270f\ufe0f Rename", callback_data=cb.encode(cb.RENAME_CARD, card_id)
+        ),
+        InlineKeyboardButton(
+            "\u274c Keep", callback_data=cb.encode(cb.RENAME_CARD, card_id, "keep")
+        ),
+    ]])
+    return text, kb
+
+
+async def rename_card_cb(
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    card_id: str,
+    keep: str | None = None,
+) -> None:
+    """Answer the duplicate prompt: rename the card unless *keep* is given."""
+    query = update.callback_query
+    assert query is not None
+    await query.answer()
+
+    pending = context.user_data.get("rename_pending", {}).pop(card_id, None)
+
+    if pending is None:
+        await query.edit_message_text("\u274c Nothing to rename.")
+    elif keep:
+        await query.edit_message_text("\u2705 Kept the existing card.")
+    elif await asyncio.to_thread(
+        _os(context).rename_card, card_id, pending["owner_id"], pending["card_name"]
+    ):
+        await query.edit_message_text(
+            f"\u2705 Card renamed to *{pending['card_name']}*.", parse_mode="Markdown"
+        )
+    else:
+        await query.edit_message_text("\u274c Could not rename card.")
+
+
 # =====================================================================
 #  My Cards
 # =====================================================================
 
-async def mycards(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """List saved cards (per-user in private, per-group in groups)."""
+_SORT_LABELS = {
+    "added": "\U0001f5d3\ufe0f Added",
+    "frequent": "\U0001f525 Most used",
+    "recent": "\U0001f552 Recent",
+}
+
+
+async def mycards(
+    update: Update, context: ContextTypes.DEFAULT_TYPE, sort: str | None = None, *_: object,
+) -> None:
+    """List saved cards (per-user in private, per-group in groups).
+
+    ``/mycards frequent|recent|added`` or the sort buttons change the
+    order, which is remembered per owner.
+    """
     owner = _owner_id(update)
-    cards = _os(context).get_cards(owner)
+    if sort is None and update.callback_query is None and context.args:
+        sort = context.args[0].lower()
+    if sort in CARD_SORTS:
+        await asyncio.to_thread(_os(context).set_card_sort, owner, sort)
+    else:
+        sort = await asyncio.to_thread(_os(context).get_card_sort, owner)
+    # Off the loop, so group members opening /mycards together share one query
+    cards = await asyncio.to_thread(_os(context).get_cards, owner, sort)
 
     is_cb = update.callback_query is not None
     if is_cb:
@@ -232,14 +369,24 @@ async def mycards(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
 
     rows: list[list[InlineKeyboardButton]] = []
     for card in cards:
-        fmt = SUPPORTED_FORMATS.get(card["barcode_format"], card["barcode_format"])
+        fmt = SUPPORTED_FORMATS.get(card.barcode_format, card.barcode_format)
         rows.append([
             InlineKeyboardButton(
-                f"\U0001f3f7\ufe0f {card['card_name']} ({fmt})",
-                callback_data=f"card:show:{card['id']}",
+                f"\U0001f3f7\ufe0f {card.card_name} ({fmt})",
+                callback_data=cb.encode(cb.SHOW_CARD, card.id),
             )
         ])
-    rows.append([InlineKeyboardButton("\u2b05\ufe0f Back", callback_data="menu:back")])
+    if len(cards) > 1:
+        rows.append([
+            InlineKeyboardButton(
+                f"\u2022 {label}" if key == sort else label,
+                callback_data=cb.encode(cb.MY_CARDS, key),
+            )
+            for key, label in _SORT_LABELS.items()
+        ])
+    rows.append([
+        InlineKeyboardButton("\u2b05\ufe0f Back", callback_data=cb.encode(cb.MENU, "back"))
+    ])
 
     text = f"\U0001f4cb *Your cards* ({len(cards)}):\n\nTap a card to generate its barcode."
     kb = InlineKeyboardMarkup(rows)
@@ -253,37 +400,67 @@ async def mycards(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
 #  Show card (generate barcode image on the fly)
 # =====================================================================
 
-async def show_card(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+async def show_card(
+    update: Update, context: ContextTypes.DEFAULT_TYPE, card_id: str,
+) -> None:
     """Generate a barcode image for the selected card and send it."""
     query = update.callback_query
     assert query is not None
     await query.answer()
 
-    card_id = query.data.split(":")[2]  # type: ignore[union-attr]
-    card = _os(context).get_card(card_id)
+    card = await asyncio.to_thread(_os(context).get_card, card_id)
 
     if not card:
         await query.edit_message_text("\u274c Card not found.")
         return
-    if card["owner_id"] != _owner_id(update):
+    if card.owner_id != _owner_id(update):
         await query.edit_message_text("\u274c This card doesn\u2019t belong to you.")
         return
 
+    if (usage := _usage(context)) is not None:
+        usage.record(card.id)
+    await _send_card(update, context, card)
+
+
+async def _send_card(update: Update, context: ContextTypes.DEFAULT_TYPE, card: Card) -> None:
+    """Send the card image, re-using a previously uploaded file when possible."""
+    profile = await asyncio.to_thread(
+        resolve_profile, _os(context), card.owner_id, card.render_profile
+    )
+    file_id = card.file_ids.get(profile)
+    fmt_label = SUPPORTED_FORMATS.get(card.barcode_format, card.barcode_format)
+    kwargs = {
+        "chat_id": update.effective_chat.id,  # type: ignore[union-attr]
+        "caption": (
+            f"\U0001f3f7\ufe0f *{card.card_name}*\n"
+            f"Code: `{card.card_code}`\n"
+            f"Format: {fmt_label}"
+        ),
+        "parse_mode": "Markdown",
+        "reply_markup": InlineKeyboardMarkup([
+            [InlineKeyboardButton(
+                "\U0001f3a8 Style", callback_data=cb.encode(cb.CARD_STYLE, card.id)
+            )],
+            [InlineKeyboardButton(
+                "\U0001f4cb My Cards", callback_data=cb.encode(cb.MY_CARDS)
+            )],
+        ]),
+    }
+
+    if file_id:
+        try:
+            await context.bot.send_photo(photo=file_id, **kwargs)
+            return
+        except Exception:
+            logger.warning("Cached file_id for card %s rejected, re-rendering", card.id)
+
     try:
-        img = generate_barcode_image(card["card_code"], card["barcode_format"])
-        fmt_label = SUPPORTED_FORMATS.get(card["barcode_format"], card["barcode_format"])
-        await context.bot.send_photo(
-            chat_id=update.effective_chat.id,  # type: ignore[union-attr]
-            photo=img,
-            caption=(
-                f"\U0001f3f7\ufe0f *{card['card_name']}*\n"
-                f"Code: `{card['card_code']}`\n"
-                f"Format: {fmt_label}"
-            ),
-            parse_mode="Markdown",
-            reply_markup=InlineKeyboardMarkup([
-                [InlineKeyboardButton("\U0001f4cb My Cards", callback_data="menu:mycards")],
-            ]),
+        img = await asyncio.to_thread(
+            render_barcode, card.card_code, card.barcode_format, "png", profile
+        )
+        msg = await context.bot.send_photo(photo=img, **kwargs)
+        await asyncio.to_thread(
+            _os(context).set_card_file_id, card.id, profile, msg.photo[-1].file_id
         )
     except Exception:
         logger.exception("Barcode generation failed")
@@ -293,6 +470,141 @@ async def show_card(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         )
 
 
+# =====================================================================
+#  Render profiles and pre-rendering
+# =====================================================================
+
+def resolve_profile(
+    os_client: OpenSearchClient, owner_id: int, override: str | None = None,
+) -> str:
+    """Resolve a render profile: card override, owner default, global default."""
+    profile = override or os_client.get_render_profile(owner_id)
+    return profile if profile in RENDER_PROFILES else DEFAULT_PROFILE
+
+
+async def prerender_card(
+    bot: Bot,
+    os_client: OpenSearchClient,
+    card_id: str,
+    owner_id: int,
+    card_code: str,
+    barcode_format: str,
+) -> None:
+    """Render a freshly saved card ahead of its first use.
+
+    The image always lands in the in-process render cache.  With
+    ``RENDER_CACHE_CHAT_ID`` set it is also uploaded once, and the resulting
+    file_id is stored on the card so ``show_card`` can skip the upload.
+    """
+    try:
+        profile = await asyncio.to_thread(resolve_profile, os_client, owner_id)
+        img = await asyncio.to_thread(
+            render_barcode, card_code, barcode_format, "png", profile
+        )
+        if not RENDER_CACHE_CHAT_ID:
+            return
+        msg = await bot.send_photo(
+            chat_id=RENDER_CACHE_CHAT_ID, photo=img, disable_notification=True
+        )
+        await asyncio.to_thread(
+            os_client.set_card_file_id, card_id, profile, msg.photo[-1].file_id
+        )
+        await bot.delete_message(chat_id=RENDER_CACHE_CHAT_ID, message_id=msg.message_id)
+    except Exception:
+        logger.warning("Pre-rendering card %s failed", card_id, exc_info=True)
+
+
+def schedule_prerender(
+    context: ContextTypes.DEFAULT_TYPE,
+    card_id: str,
+    owner_id: int,
+    card_code: str,
+    barcode_format: str,
+) -> None:
+    """Run ``prerender_card`` in the background without delaying the reply."""
+    context.application.create_task(
+        prerender_card(context.bot, _os(context), card_id, owner_id, card_code, barcode_format)
+    )
+
+
+def _profile_keyboard(
+    tag: str, current: str | None, *fields: str,
+) -> InlineKeyboardMarkup:
+    """One button per profile; each carries *fields* followed by the profile."""
+    rows = [
+        [InlineKeyboardButton(
+            ("\u2705 " if key == current else "") + spec["label"],
+            callback_data=cb.encode(tag, *fields, key),
+        )]
+        for key, spec in RENDER_PROFILES.items()
+    ]
+    return InlineKeyboardMarkup(rows)
+
+
+async def render_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """``/render`` — pick the default render profile for this user / group."""
+    current = (
+        await asyncio.to_thread(_os(context).get_render_profile, _owner_id(update))
+        or DEFAULT_PROFILE
+    )
+    await update.message.reply_text(  # type: ignore[union-attr]
+        "\U0001f3a8 *Barcode style*\n\nChoose how your barcodes are rendered:",
+        reply_markup=_profile_keyboard(cb.RENDER_PROFILE, current),
+        parse_mode="Markdown",
+    )
+
+
+async def render_profile_cb(
+    update: Update, context: ContextTypes.DEFAULT_TYPE, profile: str,
+) -> None:
+    """Store the default render profile picked from ``/render``."""
+    query = update.callback_query
+    assert query is not None
+    await query.answer()
+
+    if profile not in RENDER_PROFILES:
+        return
+    await asyncio.to_thread(_os(context).set_render_profile, _owner_id(update), profile)
+    await query.edit_message_text(
+        f"\u2705 Default style set to *{RENDER_PROFILES[profile]['label']}*.",
+        parse_mode="Markdown",
+    )
+
+
+async def card_style_cb(
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    card_id: str,
+    profile: str | None = None,
+) -> None:
+    """Per-card style: without *profile* list the profiles, with it set one."""
+    query = update.callback_query
+    assert query is not None
+
+    card = await asyncio.to_thread(_os(context).get_card, card_id)
+    if not card or card.owner_id != _owner_id(update):
+        await query.answer("\u274c Card not found.")
+        return
+
+    if profile is None:
+        await query.answer()
+        current = await asyncio.to_thread(
+            resolve_profile, _os(context), card.owner_id, card.render_profile
+        )
+        await query.edit_message_reply_markup(
+            reply_markup=_profile_keyboard(cb.CARD_STYLE, current, card_id)
+        )
+        return
+
+    if profile not in RENDER_PROFILES:
+        await query.answer()
+        return
+    await asyncio.to_thread(_os(context).set_card_render_profile, card_id, profile)
+    await query.answer(f"Style: {RENDER_PROFILES[profile]['label']}")
+    card.render_profile = profile
+    await _send_card(update, context, card)
+
+
 # =====================================================================
 #  Delete card
 # =====================================================================
@@ -300,7 +612,7 @@ async def show_card(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
 async def deletecard_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """List cards with delete buttons."""
     owner = _owner_id(update)
-    cards = _os(context).get_cards(owner)
+    cards = await asyncio.to_thread(_os(context).get_cards, owner)
 
     if not cards:
         await update.message.reply_text("\U0001f4cb Nothing to delete.")  # type: ignore[union-attr]
@@ -308,12 +620,14 @@ async def deletecard_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
     rows = [
         [InlineKeyboardButton(
-            f"\U0001f5d1\ufe0f {c['card_name']}",
-            callback_data=f"card:del:{c['id']}",
+            f"\U0001f5d1\ufe0f {c.card_name}",
+            callback_data=cb.encode(cb.DELETE_CARD, c.id),
         )]
         for c in cards
     ]
-    rows.append([InlineKeyboardButton("\u274c Cancel", callback_data="menu:back")])
+    rows.append([
+        InlineKeyboardButton("\u274c Cancel", callback_data=cb.encode(cb.MENU, "back"))
+    ])
 
     await update.message.reply_text(  # type: ignore[union-attr]
         "\U0001f5d1\ufe0f *Select a card to delete:*",
@@ -322,19 +636,20 @@ async def deletecard_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
     )
 
 
-async def delete_card_cb(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+async def delete_card_cb(
+    update: Update, context: ContextTypes.DEFAULT_TYPE, card_id: str,
+) -> None:
     """Actually delete when the button is pressed."""
     query = update.callback_query
     assert query is not None
     await query.answer()
 
-    card_id = query.data.split(":")[2]  # type: ignore[union-attr]
     owner = _owner_id(update)
-    card = _os(context).get_card(card_id)
+    card = await asyncio.to_thread(_os(context).get_card, card_id)
 
-    if card and _os(context).delete_card(card_id, owner):
+    if card and await asyncio.to_thread(_os(context).delete_card, card_id, owner):
         await query.edit_message_text(
-            f"\u2705 Card *{card['card_name']}* deleted.", parse_mode="Markdown"
+            f"\u2705 Card *{card.card_name}* deleted.", parse_mode="Markdown"
         )
     else:
         await query.edit_message_text("\u274c Could not delete card.")
@@ -349,6 +664,8 @@ def build_addcard_conversation() -> ConversationHandler:
     return ConversationHandler(
         entry_points=[
             CommandHandler("addcard", addcard_entry),
+            CallbackQueryHandler(addcard_entry, pattern=cb.tag_pattern(cb.ADD_CARD)),
+            # Buttons sent before the compact callback_data codec.
             CallbackQueryHandler(addcard_entry, pattern=r"^menu:addcard$"),
         ],
         states={
@@ -357,10 +674,16 @@ def build_addcard_conversation() -> ConversationHandler:
                 MessageHandler(filters.TEXT & ~filters.COMMAND, received_code_text),
                 MessageHandler(filters.PHOTO, received_code_photo),
             ],
-            FORMAT: [CallbackQueryHandler(received_format, pattern=r"^fmt:")],
-            CONFIRM: [CallbackQueryHandler(confirm_save, pattern=r"^cfm:")],
+            FORMAT: [
+                CallbackQueryHandler(received_format, pattern=cb.tag_pattern(cb.PICK_FORMAT))
+            ],
+            CONFIRM: [
+                CallbackQueryHandler(confirm_save, pattern=cb.tag_pattern(cb.CONFIRM))
+            ],
+            ConversationHandler.TIMEOUT: [TypeHandler(Update, conversation_timeout)],
         },
         fallbacks=[CommandHandler("cancel", cancel_conversation)],
+        conversation_timeout=CONVERSATION_TIMEOUT_SECONDS,
         per_user=True,
         per_chat=True,
     )
@@ -0,0 +1,33 @@
+"""Application-wide error handler."""
+
+from __future__ import annotations
+
+import logging
+
+from telegram import Update
+from telegram.error import TelegramError
+from telegram.ext import ContextTypes
+
+from app.services.resilience import StorageUnavailable
+
+logger = logging.getLogger(__name__)
+
+
+async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Log handler errors; tell the user when storage is temporarily down."""
+    if not isinstance(context.error, StorageUnavailable):
+        logger.error("Unhandled error while processing an update", exc_info=context.error)
+        return
+
+    logger.warning("Storage unavailable: %s", context.error)
+    if not isinstance(update, Update):
+        return
+    text = "\u26a0\ufe0f Your cards are temporarily unavailable. Please try again in a minute."
+    if update.callback_query:
+        try:
+            await update.callback_query.answer(text, show_alert=True)
+            return
+        except TelegramError:
+            pass  # the handler already answered the query
+    if update.effective_message:
+        await update.effective_message.reply_text(text)
@@ -2,41 +2,46 @@
 
 from __future__ import annotations
 
+import asyncio
 import json
 import logging
 
-from telegram import Update
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Message, Update
 from telegram.ext import (
     CommandHandler,
     ContextTypes,
     ConversationHandler,
     MessageHandler,
+    TypeHandler,
     filters,
 )
 
-from app.services.barcode_decoder import decode_barcode
-from app.services.barcode_generator import SUPPORTED_FORMATS
-from app.services.opensearch_client import OpenSearchClient
+from app.handlers import callbacks as cb
+from app.handlers.cards import duplicate_prompt, save_headline, schedule_prerender
+from app.config import ALBUM_WINDOW_SECONDS, CONVERSATION_TIMEOUT_SECONDS
+from app.notifications import AddedCard, GroupDigest
+from app.services.barcode_decoder import decode_barcode_async
+from app.services.barcode_generator import SUPPORTED_FORMATS, validate_code
+from app.services.formats import from_webapp_name
+from app.services.opensearch_client import DUPLICATE_CARD, OpenSearchClient
 
 logger = logging.getLogger(__name__)
 
 # State for the webapp-scan conversation
 SCAN_CARD_NAME = 0
 
-_FMT_MAP = {
-    "QR_CODE": "qrcode",
-    "QRCODE": "qrcode",
-    "EAN_13": "ean13",
-    "EAN_8": "ean13",
-    "CODE_128": "code128",
-    "CODE_39": "code128",
-}
+# How many decoded albums per chat are kept for the "Import all" button.
+_MAX_PENDING_ALBUMS = 5
 
 
 def _os(context: ContextTypes.DEFAULT_TYPE) -> OpenSearchClient:
     return context.bot_data["os_client"]
 
 
+def _digest(context: ContextTypes.DEFAULT_TYPE) -> GroupDigest:
+    return context.bot_data["group_digest"]
+
+
 def _owner_id(update: Update) -> int:
     """Return the card owner: user_id in private chats, chat_id in groups."""
     chat = update.effective_chat
@@ -52,20 +57,36 @@ def _owner_id(update: Update) -> int:
 async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Decode barcodes from an incoming photo.
 
-    In group chats the bot stays silent when nothing is found so it
-    doesn't spam the conversation.
+    Photos that are part of an album are buffered and handled together by
+    ``_process_album``.  In group chats the bot stays silent when nothing is
+    found so it doesn't spam the conversation.
     """
+    message = update.message
+    assert message is not None
+
+    if message.media_group_id:
+        albums: dict[str, list[Message]] = context.bot_data.setdefault("albums", {})
+        pending = albums.get(message.media_group_id)
+        if pending is None:
+            albums[message.media_group_id] = [message]
+            context.application.create_task(
+                _process_album(update, context, message.media_group_id), update=update
+            )
+        else:
+            pending.append(message)
+        return
+
     is_private = update.effective_chat.type == "private"  # type: ignore[union-attr]
 
-    photo = update.message.photo[-1]  # type: ignore[union-attr]
+    photo = message.photo[-1]
     tg_file = await photo.get_file()
     image_bytes = await tg_file.download_as_bytearray()
 
-    results = decode_barcode(bytes(image_bytes))
+    results = await decode_barcode_async(bytes(image_bytes))
 
     if not results:
         if is_private:
-            await update.message.reply_text(  # type: ignore[union-attr]
+            await message.reply_text(
                 "\u274c Could not decode any barcode from this photo.\n"
                 "Try a clearer photo with good lighting."
             )
@@ -73,7 +94,7 @@ async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
 
     for i, res in enumerate(results):
         fmt_label = SUPPORTED_FORMATS.get(res["format"], res["format"])
-        await update.message.reply_text(  # type: ignore[union-attr]
+        await message.reply_text(
             f"\u2705 *Decoded barcode"
             + (f" #{i + 1}" if len(results) > 1 else "")
             + f"*\n\n"
@@ -86,6 +107,115 @@ async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
         )
 
 
+async def _download_photo(message: Message) -> bytes:
+    tg_file = await message.photo[-1].get_file()
+    return bytes(await tg_file.download_as_bytearray())
+
+
+async def _process_album(
+    update: Update, context: ContextTypes.DEFAULT_TYPE, media_group_id: str,
+) -> None:
+    """Decode every photo of an album and send one consolidated reply.
+
+    Waits ``ALBUM_WINDOW_SECONDS`` for the remaining updates of the album,
+    then downloads and decodes all photos concurrently.  Identical codes
+    are reported once.
+    """
+    await asyncio.sleep(ALBUM_WINDOW_SECONDS)
+    messages: list[Message] = context.bot_data["albums"].pop(media_group_id, [])
+    if not messages:
+        return
+    is_private = update.effective_chat.type == "private"  # type: ignore[union-attr]
+
+    try:
+        images = await asyncio.gather(*(_download_photo(m) for m in messages))
+        decoded = await asyncio.gather(*(decode_barcode_async(img) for img in images))
+    except Exception:
+        logger.exception("Failed to process album %s", media_group_id)
+        if is_private:
+            await messages[0].reply_text("\u274c Could not process these photos.")
+        return
+
+    results: list[dict] = []
+    seen: set[tuple[str, str]] = set()
+    for per_photo in decoded:
+        for res in per_photo:
+            key = (res["data"], res["format"])
+            if key not in seen:
+                seen.add(key)
+                results.append(res)
+
+    if not results:
+        if is_private:
+            await messages[0].reply_text(
+                f"\u274c Could not decode any barcode from these {len(messages)} photos."
+            )
+        return
+
+    # Per chat, so any group member can tap "Import all".
+    pending: dict[str, list[dict]] = context.chat_data.setdefault("album_scans", {})
+    pending[media_group_id] = results
+    while len(pending) > _MAX_PENDING_ALBUMS:
+        pending.pop(next(iter(pending)))
+
+    lines = [
+        f"\u2705 *Decoded {len(results)} barcode(s) from {len(messages)} photo(s)*\n"
+    ]
+    for i, res in enumerate(results, start=1):
+        fmt_label = SUPPORTED_FORMATS.get(res["format"], res["format"])
+        lines.append(f"{i}. `{res['data']}` ({fmt_label})")
+    await messages[0].reply_text(
+        "\n".join(lines),
+        reply_markup=InlineKeyboardMarkup([
+            [InlineKeyboardButton(
+                "\U0001f4e5 Import all", callback_data=cb.encode(cb.ALBUM_SAVE, media_group_id)
+            )],
+        ]),
+        parse_mode="Markdown",
+    )
+
+
+async def album_save_cb(
+    update: Update, context: ContextTypes.DEFAULT_TYPE, media_group_id: str,
+) -> None:
+    """Save every barcode of a decoded album as a card."""
+    query = update.callback_query
+    assert query is not None
+    await query.answer()
+
+    results = context.chat_data.get("album_scans", {}).pop(media_group_id, None)
+    if not results:
+        await query.edit_message_text("\u274c These scans have expired. Send the photos again.")
+        return
+
+    cards = []
+    for res in results:
+        ok, _ = validate_code(res["data"], res["format"])
+        if ok:
+            fmt_label = SUPPORTED_FORMATS.get(res["format"], res["format"])
+            cards.append({
+                "card_name": f"{fmt_label} \u2026{res['data'][-6:]}",
+                "card_code": res["data"],
+                "barcode_format": res["format"],
+            })
+
+    try:
+        errors = await asyncio.to_thread(_os(context).bulk_add_cards, _owner_id(update), cards)
+        await asyncio.to_thread(_os(context).refresh_cards)
+    except Exception:
+        logger.exception("Failed to import album")
+        await query.edit_message_text("\u274c Failed to save the cards. Please try again.")
+        return
+
+    saved = sum(1 for err in errors if err is None)
+    duplicates = sum(1 for err in errors if err == DUPLICATE_CARD)
+    await query.edit_message_text(
+        f"\u2705 Saved {saved} of {len(results)} card(s)"
+        + (f" ({duplicates} already saved)" if duplicates else "")
+        + ".\n\nUse /mycards to view your barcodes."
+    )
+
+
 # =====================================================================
 #  WebApp scan → ask name → save card  (dedicated ConversationHandler)
 # =====================================================================
@@ -104,9 +234,14 @@ async def _webapp_scan_entry(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
     code = payload.get("code", "")
     fmt_raw = payload.get("format", "")
-    barcode_format = _FMT_MAP.get(fmt_raw, "code128")
+    barcode_format = from_webapp_name(fmt_raw)
     fmt_label = SUPPORTED_FORMATS.get(barcode_format, barcode_format)
 
+    ok, err = validate_code(code, barcode_format)
+    if not ok:
+        await update.message.reply_text(f"\u274c {err}")  # type: ignore[union-attr]
+        return ConversationHandler.END
+
     context.user_data["scan_card_code"] = code
     context.user_data["scan_card_format"] = barcode_format
     # Preserve target-chat from deep-link (may be a group chat_id)
@@ -132,33 +267,39 @@ async def _webapp_received_name(update: Update, context: ContextTypes.DEFAULT_TY
     fmt_label = SUPPORTED_FORMATS.get(barcode_format, barcode_format)
 
     try:
-        _os(context).add_card(owner, card_name, card_code, barcode_format)
+        card_id, existing = await asyncio.to_thread(
+            _os(context).add_card, owner, card_name, card_code, barcode_format
+        )
+        if existing:
+            if existing.card_name == card_name:
+                text = f"\u2705 Card *{card_name}* is already saved."
+                kb = None
+            else:
+                text, kb = duplicate_prompt(context, card_id, owner, existing, card_name)
+            await update.message.reply_text(  # type: ignore[union-attr]
+                text, reply_markup=kb, parse_mode="Markdown"
+            )
+            return ConversationHandler.END
+
+        schedule_prerender(context, card_id, owner, card_code, barcode_format)
         if group_chat_id:
             await update.message.reply_text(  # type: ignore[union-attr]
-                f"\u2705 Card *{card_name}* saved to the group!\n\n"
+                f"{save_headline(context, owner, card_name, ' to the group')}\n\n"
                 f"Code: `{card_code}`\n"
                 f"Format: {fmt_label}\n\n"
                 "Head back to the group to use /mycards.",
                 parse_mode="Markdown",
             )
-            # Notify the group
-            user_name = update.effective_user.first_name  # type: ignore[union-attr]
-            try:
-                await context.bot.send_message(
-                    chat_id=group_chat_id,
-                    text=(
-                        f"\U0001f4e5 *{user_name}* added a new card via scanner:\n\n"
-                        f"\U0001f4b3 *{card_name}*\n"
-                        f"Code: `{card_code}` ({fmt_label})\n\n"
-                        "Use /mycards to see all cards."
-                    ),
-                    parse_mode="Markdown",
-                )
-            except Exception:
-                logger.warning("Could not send confirmation to group %s", group_chat_id)
+            # Notify the group (one digest per window, not one message per card)
+            _digest(context).add(group_chat_id, AddedCard(
+                user_name=update.effective_user.first_name,  # type: ignore[union-attr]
+                card_name=card_name,
+                card_code=card_code,
+                format_label=fmt_label,
+            ))
         else:
             await update.message.reply_text(  # type: ignore[union-attr]
-                f"\u2705 Card *{card_name}* saved!\n\n"
+                f"{save_headline(context, owner, card_name)}\n\n"
                 f"Code: `{card_code}`\n"
                 f"Format: {fmt_label}\n\n"
                 "Use /mycards to view your barcodes.",
@@ -172,11 +313,19 @@ async def _webapp_received_name(update: Update, context: ContextTypes.DEFAULT_TY
     return ConversationHandler.END
 
 
+def _clear_scan_temp(context: ContextTypes.DEFAULT_TYPE) -> None:
+    for key in ("scan_card_code", "scan_card_format", "scan_target_chat"):
+        context.user_data.pop(key, None)
+
+
+async def _webapp_timeout(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Drop the scanned code when the user never sends a card name."""
+    _clear_scan_temp(context)
+
+
 async def _webapp_cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Cancel the webapp-scan card creation."""
-    context.user_data.pop("scan_card_code", None)
-    context.user_data.pop("scan_card_format", None)
-    context.user_data.pop("scan_target_chat", None)
+    _clear_scan_temp(context)
     await update.message.reply_text("\u274c Cancelled.")  # type: ignore[union-attr]
     return ConversationHandler.END
 
@@ -191,8 +340,10 @@ def build_webapp_scan_conversation() -> ConversationHandler:
             SCAN_CARD_NAME: [
                 MessageHandler(filters.TEXT & ~filters.COMMAND, _webapp_received_name),
             ],
+            ConversationHandler.TIMEOUT: [TypeHandler(Update, _webapp_timeout)],
         },
         fallbacks=[CommandHandler("cancel", _webapp_cancel)],
+        conversation_timeout=CONVERSATION_TIMEOUT_SECONDS,
         per_user=True,
         per_chat=True,
     )
@@ -13,6 +13,7 @@ from telegram import (
 from telegram.ext import ContextTypes
 
 from app.config import WEBAPP_URL
+from app.handlers import callbacks as cb
 
 
 def main_menu_keyboard(
@@ -24,8 +25,8 @@ def main_menu_keyboard(
     because Telegram only supports webapp buttons in private chats.
     """
     rows: list[list[InlineKeyboardButton]] = [
-        [InlineKeyboardButton("\U0001f4cb My Cards", callback_data="menu:mycards")],
-        [InlineKeyboardButton("\u2795 Add Card", callback_data="menu:addcard")],
+        [InlineKeyboardButton("\U0001f4cb My Cards", callback_data=cb.encode(cb.MY_CARDS))],
+        [InlineKeyboardButton("\u2795 Add Card", callback_data=cb.encode(cb.ADD_CARD))],
     ]
     if WEBAPP_URL and not is_private and bot_username:
         rows.append([
@@ -38,11 +39,11 @@ def main_menu_keyboard(
         rows.append([
             InlineKeyboardButton(
                 "\U0001f4f7 Scan Barcode (send photo)",
-                callback_data="menu:scan_info",
+                callback_data=cb.encode(cb.MENU, "scan_info"),
             )
         ])
     rows.append([
-        InlineKeyboardButton("\u2753 Help", callback_data="menu:help"),
+        InlineKeyboardButton("\u2753 Help", callback_data=cb.encode(cb.MENU, "help")),
     ])
     return InlineKeyboardMarkup(rows)
 
@@ -109,14 +110,14 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
             )
 
 
-async def menu_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Handle generic ``menu:*`` callbacks (help, back, scan_info)."""
+async def menu_callback(
+    update: Update, context: ContextTypes.DEFAULT_TYPE, action: str,
+) -> None:
+    """Handle generic menu callbacks (help, back, scan_info)."""
     query = update.callback_query
     assert query is not None
     await query.answer()
 
-    action = query.data.split(":")[1]  # type: ignore[union-attr]
-
     if action == "help":
         await query.edit_message_text(
             "\U0001f4d6 *How to use Barcode Bot:*\n\n"
@@ -124,11 +125,15 @@ async def menu_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
             "2\ufe0f\u20e3 *View cards* \u2014 /mycards to see your saved cards\n"
             "3\ufe0f\u20e3 *Scan a barcode* \u2014 Send me a photo of a barcode\n"
             "4\ufe0f\u20e3 *Get a barcode* \u2014 Tap any card from your list\n"
-            "5\ufe0f\u20e3 *Delete a card* \u2014 /deletecard\n\n"
+            "5\ufe0f\u20e3 *Delete a card* \u2014 /deletecard\n"
+            "6\ufe0f\u20e3 *Barcode style* \u2014 /render\n"
+            "7\ufe0f\u20e3 *Import / export* \u2014 /import, /export\n\n"
             "Cards are private and tied to your Telegram account.\n"
             "The bot works in private chats and groups.",
             reply_markup=InlineKeyboardMarkup([
-                [InlineKeyboardButton("\u2b05\ufe0f Back", callback_data="menu:back")],
+                [InlineKeyboardButton(
+                    "\u2b05\ufe0f Back", callback_data=cb.encode(cb.MENU, "back")
+                )],
             ]),
             parse_mode="Markdown",
         )
@@ -138,7 +143,9 @@ async def menu_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
             "Send me a photo containing a barcode and I\u2019ll decode it.\n"
             "You can then save it as a card.",
             reply_markup=InlineKeyboardMarkup([
-                [InlineKeyboardButton("\u2b05\ufe0f Back", callback_data="menu:back")],
+                [InlineKeyboardButton(
+                    "\u2b05\ufe0f Back", callback_data=cb.encode(cb.MENU, "back")
+                )],
             ]),
             parse_mode="Markdown",
         )
@@ -2,27 +2,90 @@
 
 from __future__ import annotations
 
+import asyncio
 import logging
 
+from telegram import Update
 from telegram.ext import (
+    Application,
     ApplicationBuilder,
+    ContextTypes,
     CallbackQueryHandler,
     CommandHandler,
     MessageHandler,
+    TypeHandler,
     filters,
 )
 
-from app.config import LOG_LEVEL, OPENSEARCH_HOST, OPENSEARCH_PORT, TELEGRAM_BOT_TOKEN
+from app.api import start_api, stop_api
+from app.config import (
+    CONCURRENT_UPDATES,
+    GROUP_DIGEST_SECONDS,
+    LOG_LEVEL,
+    BREAKER_FAILURE_THRESHOLD,
+    BREAKER_RESET_SECONDS,
+    CONVERSATION_TIMEOUT_SECONDS,
+    OPENSEARCH_HOST,
+    OPENSEARCH_PORT,
+    OPENSEARCH_READ_TIMEOUT,
+    OPENSEARCH_WRITE_TIMEOUT,
+    SLOW_UPDATE_SECONDS,
+    STALL_THRESHOLD_SECONDS,
+    TELEGRAM_BOT_TOKEN,
+    TRACE_EXPORTER,
+    TRACE_JSONL_PATH,
+    TRACE_OTLP_ENDPOINT,
+    TRACE_SAMPLE_RATIO,
+    USAGE_FLUSH_SECONDS,
+    USER_DATA_MAX_USERS,
+    WRITE_QUEUE_PATH,
+)
+from app.handlers import callbacks as cb
+from app.handlers.admin import memory_command, profile_command
+from app.handlers.bulk import build_import_conversation, export_command
+from app.handlers.callbacks import CallbackRouter
+from app.handlers.errors import error_handler
 from app.handlers.cards import (
     build_addcard_conversation,
+    card_style_cb,
     delete_card_cb,
     deletecard_command,
     mycards,
+    rename_card_cb,
+    render_command,
+    render_profile_cb,
     show_card,
 )
-from app.handlers.scan import build_webapp_scan_conversation, handle_photo
+from app.handlers.scan import album_save_cb, build_webapp_scan_conversation, handle_photo
 from app.handlers.start import menu_callback, start_command
-from app.services.opensearch_client import OpenSearchClient
+from app.memory import UserDataLRU
+from app.notifications import GroupDigest
+from app.profiling import StallWatchdog
+from app.services import tracing
+from app.services.resilience import ResilientOpenSearchClient
+from app.services.usage import UsageTracker
+from app.telemetry import TracedRequest, instrument_handlers
+from app.update_processor import KeyedUpdateProcessor
+
+
+async def _flush_usage(context: ContextTypes.DEFAULT_TYPE) -> None:
+    await asyncio.to_thread(context.bot_data["usage"].flush)
+
+
+async def _post_init(application: Application) -> None:
+    await start_api(application)
+    if STALL_THRESHOLD_SECONDS > 0:
+        watchdog = StallWatchdog(STALL_THRESHOLD_SECONDS)
+        watchdog.start()
+        application.bot_data["stall_watchdog"] = watchdog
+
+
+async def _post_shutdown(application: Application) -> None:
+    if (watchdog := application.bot_data.pop("stall_watchdog", None)) is not None:
+        await watchdog.stop()
+    await stop_api(application)
+    await asyncio.to_thread(application.bot_data["usage"].flush)
+    await asyncio.to_thread(tracing.tracer.shutdown)
 
 
 def main() -> None:
@@ -32,38 +95,103 @@ def main() -> None:
     )
     logger = logging.getLogger(__name__)
 
+    tracing.configure(
+        TRACE_EXPORTER,
+        jsonl_path=TRACE_JSONL_PATH,
+        otlp_endpoint=TRACE_OTLP_ENDPOINT,
+        sample_ratio=TRACE_SAMPLE_RATIO,
+        slow_seconds=SLOW_UPDATE_SECONDS,
+    )
+
     # ── OpenSearch ────────────────────────────────────────────────────
-    os_client = OpenSearchClient(OPENSEARCH_HOST, OPENSEARCH_PORT)
+    os_client = ResilientOpenSearchClient(
+        OPENSEARCH_HOST,
+        OPENSEARCH_PORT,
+        queue_path=WRITE_QUEUE_PATH,
+        failure_threshold=BREAKER_FAILURE_THRESHOLD,
+        reset_timeout=BREAKER_RESET_SECONDS,
+        read_timeout=OPENSEARCH_READ_TIMEOUT,
+        write_timeout=OPENSEARCH_WRITE_TIMEOUT,
+    )
     os_client.wait_for_cluster()
     os_client.init_index()
+    os_client.replay_async()  # writes queued before the last shutdown
     logger.info("OpenSearch ready")
 
     # ── Telegram application ──────────────────────────────────────────
-    app = ApplicationBuilder().token(TELEGRAM_BOT_TOKEN).build()
+    # Updates run concurrently across users/chats but strictly in order
+    # within one (chat, user), which keeps ConversationHandler state safe.
+    app = (
+        ApplicationBuilder()
+        .token(TELEGRAM_BOT_TOKEN)
+        .request(TracedRequest(connection_pool_size=256))
+        .concurrent_updates(KeyedUpdateProcessor(CONCURRENT_UPDATES))
+        .post_init(_post_init)
+        .post_shutdown(_post_shutdown)
+        .build()
+    )
     app.bot_data["os_client"] = os_client
 
+    app.bot_data["group_digest"] = GroupDigest(app, GROUP_DIGEST_SECONDS)
+
+    # Card opens are batched and written periodically, never per tap
+    app.bot_data["usage"] = UsageTracker(os_client)
+    app.job_queue.run_repeating(  # type: ignore[union-attr]
+        _flush_usage, interval=USAGE_FLUSH_SECONDS, first=USAGE_FLUSH_SECONDS,
+        name="usage-flush",
+    )
+
+    # 0. Track user activity first so idle users' user_data can be evicted
+    lru = UserDataLRU(app, USER_DATA_MAX_USERS, CONVERSATION_TIMEOUT_SECONDS)
+    app.bot_data["user_data_lru"] = lru
+    app.add_handler(TypeHandler(Update, lru.touch), group=-1)
+
     # 1. WebApp scan conversation (must be first — catches WEB_APP_DATA
     #    and then the follow-up text message for the card name)
     app.add_handler(build_webapp_scan_conversation())
 
-    # 2. Add-card conversation handler (/addcard + menu:addcard callback)
+    # 2. Add-card conversation handler (/addcard + Add Card button)
     app.add_handler(build_addcard_conversation())
 
+    # 2b. Bulk import conversation (/import → document)
+    app.add_handler(build_import_conversation())
+
     # 2. Slash commands
     app.add_handler(CommandHandler("start", start_command))
     app.add_handler(CommandHandler("help", start_command))
     app.add_handler(CommandHandler("mycards", mycards))
     app.add_handler(CommandHandler("deletecard", deletecard_command))
-
-    # 3. Callback-query handlers (more-specific patterns first)
-    app.add_handler(CallbackQueryHandler(mycards, pattern=r"^menu:mycards$"))
-    app.add_handler(CallbackQueryHandler(show_card, pattern=r"^card:show:"))
-    app.add_handler(CallbackQueryHandler(delete_card_cb, pattern=r"^card:del:"))
-    app.add_handler(CallbackQueryHandler(menu_callback, pattern=r"^menu:"))
+    app.add_handler(CommandHandler("render", render_command))
+    app.add_handler(CommandHandler("export", export_command))
+    app.add_handler(CommandHandler("memory", memory_command))
+    app.add_handler(CommandHandler("profile", profile_command))
+
+    # 3. Every other callback query goes through one router that
+    #    dispatches on the callback_data tag.
+    router = CallbackRouter()
+    router.route(cb.MY_CARDS, mycards)
+    router.route(cb.MENU, menu_callback)
+    router.route(cb.SHOW_CARD, show_card)
+    router.route(cb.DELETE_CARD, delete_card_cb)
+    router.route(cb.CARD_STYLE, card_style_cb)
+    router.route(cb.RENAME_CARD, rename_card_cb)
+    router.route(cb.RENDER_PROFILE, render_profile_cb)
+    router.route(cb.ALBUM_SAVE, album_save_cb)
+    # Plain-text callback_data on buttons sent by earlier versions
+    router.legacy("menu:mycards", mycards)
+    router.legacy("menu", menu_callback)
+    router.legacy("card:show", show_card)
+    router.legacy("card:del", delete_card_cb)
+    app.add_handler(CallbackQueryHandler(router.dispatch))
 
     # 4. Standalone photo handler (scan outside the add-card flow)
     app.add_handler(MessageHandler(filters.PHOTO, handle_photo))
 
+    app.add_error_handler(error_handler)
+
+    # Every handler callback above becomes a span of its update's trace
+    instrument_handlers(app)
+
     logger.info("Starting polling …")
     app.run_polling(drop_pending_updates=True)
 
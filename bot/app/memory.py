@@ -0,0 +1,145 @@
+"""Bounded ``user_data`` and a report of what it holds."""
+
+from __future__ import annotations
+
+import sys
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from typing import Any
+
+from telegram import Update
+from telegram.ext import Application, ContextTypes
+
+
+class UserDataLRU:
+    """Keep ``user_data`` for at most *max_users* users.
+
+    ``touch`` runs (as a ``TypeHandler`` in an early group) for every
+    update and marks its user as most recently active.  Once more than
+    *max_users* users are tracked, the least recently active one has its
+    ``user_data`` dropped, so scratch keys such as ``scan_target_chat``
+    can no longer pile up for every user who ever talked to the bot.
+
+    Users active within the last *idle_seconds* are never dropped: they
+    may be in the middle of a conversation whose state lives in
+    ``user_data``.  Pass the conversation timeout here; during a burst of
+    more than *max_users* active users the store briefly grows past the
+    limit and shrinks back as they go idle.
+    """
+
+    __slots__ = ("_application", "_max_users", "_idle_seconds", "_clock", "_recent", "evicted")
+
+    def __init__(
+        self,
+        application: Application,
+        max_users: int,
+        idle_seconds: float = 0.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._application = application
+        self._max_users = max(1, max_users)
+        self._idle_seconds = idle_seconds
+        self._clock = clock
+        # user id -> last activity, least recently active first
+        self._recent: OrderedDict[int, float] = OrderedDict()
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._recent)
+
+    async def touch(self, update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
+        if self._application.persistence is None:
+            self._forget_persistence_marks()
+        if not isinstance(update, Update) or update.effective_user is None:
+            return
+        self.mark(update.effective_user.id)
+
+    def mark(self, user_id: int) -> None:
+        """Record activity of *user_id*, evicting idle users beyond the limit."""
+        recent = self._recent
+        now = self._clock()
+        recent[user_id] = now
+        recent.move_to_end(user_id)
+        while len(recent) > self._max_users:
+            oldest, seen = next(iter(recent.items()))
+            if now - seen < self._idle_seconds:
+                break  # everyone left is newer still
+            del recent[oldest]
+            self._drop(oldest)
+            self.evicted += 1
+
+    def _drop(self, user_id: int) -> None:
+        app = self._application
+        app.drop_user_data(user_id)
+        if app.persistence is None:
+            # ``drop_user_data`` queues the id for the next persistence
+            # flush; without persistence nothing ever empties that set.
+            pending = _private_set(app, "_user_ids_to_be_deleted_in_persistence")
+            pending.discard(user_id)
+
+    def _forget_persistence_marks(self) -> None:
+        # Every processed update also marks its user and chat for the next
+        # persistence flush, which never comes without persistence: one
+        # id per user and chat ever seen, for the life of the process.
+        app = self._application
+        _private_set(app, "_user_ids_to_be_updated_in_persistence").clear()
+        _private_set(app, "_chat_ids_to_be_updated_in_persistence").clear()
+
+
+def _private_set(app: Application, name: str) -> set[int]:
+    # Private PTB attributes, checked against python-telegram-bot 21.11;
+    # an empty stand-in if a later release renames them.
+    pending = getattr(app, name, None)
+    return pending if isinstance(pending, set) else set()
+
+
+# =====================================================================
+#  Memory report
+# =====================================================================
+
+@dataclass
+class MemoryReport:
+    """Size of the in-process ``user_data`` / ``chat_data`` stores."""
+
+    users: int = 0
+    chats: int = 0
+    entries: int = 0
+    bytes: int = 0
+    # (user_id, bytes) of the largest ``user_data`` dicts, largest first
+    top_users: list[tuple[int, int]] = field(default_factory=list)
+
+
+def deep_size(obj: Any, _seen: set[int] | None = None) -> int:
+    """Approximate bytes held by *obj* and the containers / strings inside it."""
+    seen = set() if _seen is None else _seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(k, seen) + deep_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_size(item, seen) for item in obj)
+    return size
+
+
+def memory_report(application: Application, top: int = 5) -> MemoryReport:
+    """Measure ``application.user_data`` and ``chat_data``."""
+    report = MemoryReport()
+    sizes: list[tuple[int, int]] = []
+    for user_id, data in list(application.user_data.items()):
+        size = deep_size(data)
+        sizes.append((user_id, size))
+        report.entries += len(data)
+        report.bytes += size
+    for data in list(application.chat_data.values()):
+        report.entries += len(data)
+        report.bytes += deep_size(data)
+
+    report.users = len(sizes)
+    report.chats = len(application.chat_data)
+    sizes.sort(key=lambda item: item[1], reverse=True)
+    report.top_users = sizes[:top]
+    return report
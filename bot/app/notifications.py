@@ -0,0 +1,102 @@
+"""Coalesced "card added" notifications for group chats."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from dataclasses import dataclass
+
+from telegram.ext import Application
+from telegram.helpers import escape_markdown
+
+logger = logging.getLogger(__name__)
+
+# Cards listed in one digest; the rest are only counted.
+MAX_DIGEST_LINES = 20
+
+
+@dataclass(frozen=True, slots=True)
+class AddedCard:
+    user_name: str
+    card_name: str
+    card_code: str
+    format_label: str
+
+
+class GroupDigest:
+    """Tell a group about new cards without one message per card.
+
+    The first ``add`` for a chat is sent right away and opens a window of
+    *window* seconds; cards added before it closes go into one digest at
+    its end, which opens the next window.  A household saving 30 cards in
+    a row gets a handful of messages instead of 30 notifications, and a
+    single card is announced without delay.
+    """
+
+    __slots__ = ("_application", "window", "_pending")
+
+    def __init__(self, application: Application, window: float) -> None:
+        self._application = application
+        self.window = window
+        # chat_id -> cards waiting for the end of the open window
+        self._pending: dict[int, list[AddedCard]] = {}
+
+    def add(self, chat_id: int, card: AddedCard) -> None:
+        pending = self._pending.get(chat_id)
+        if pending is not None:
+            pending.append(card)
+            return
+        self._pending[chat_id] = []
+        self._application.create_task(self._run(chat_id, card), name=f"digest:{chat_id}")
+
+    async def _run(self, chat_id: int, first: AddedCard) -> None:
+        cards = [first]
+        try:
+            while cards:
+                await self._send(chat_id, cards)
+                await asyncio.sleep(self.window)
+                cards, self._pending[chat_id] = self._pending[chat_id], []
+        finally:
+            del self._pending[chat_id]
+
+    async def _send(self, chat_id: int, cards: list[AddedCard]) -> None:
+        try:
+            await self._application.bot.send_message(
+                chat_id=chat_id, text=format_digest(cards), parse_mode="Markdown"
+            )
+        except Exception:
+            logger.warning("Could not send card digest to group %s", chat_id)
+
+
+def format_digest(cards: list[AddedCard]) -> str:
+    if len(cards) == 1:
+        card = cards[0]
+        return (
+            f"\U0001f4e5 *{_md(card.user_name)}* added a new card via scanner:\n\n"
+            f"\U0001f4b3 *{_md(card.card_name)}*\n"
+            f"Code: `{_code(card.card_code)}` ({_md(card.format_label)})\n\n"
+            "Use /mycards to see all cards."
+        )
+
+    users = list(dict.fromkeys(_md(card.user_name) for card in cards))
+    lines = [
+        f"\U0001f4e5 *{len(cards)} new cards* added via scanner by {', '.join(users)}:\n"
+    ]
+    lines += [
+        f"\U0001f4b3 *{_md(card.card_name)}* \u2014 "
+        f"`{_code(card.card_code)}` ({_md(card.format_label)})"
+        for card in cards[:MAX_DIGEST_LINES]
+    ]
+    if len(cards) > MAX_DIGEST_LINES:
+        lines.append(f"\u2026and {len(cards) - MAX_DIGEST_LINES} more.")
+    lines.append("\nUse /mycards to see all cards.")
+    return "\n".join(lines)
+
+
+def _md(text: str) -> str:
+    return escape_markdown(text, version=1)
+
+
+def _code(code: str) -> str:
+    # Nothing can be escaped inside a Markdown code span.
+    return code.replace("`", "'")
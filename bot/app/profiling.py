@@ -0,0 +1,131 @@
+"""Event-loop stall watchdog and a sampling profiler for ``/profile``."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from types import FrameType
+
+logger = logging.getLogger(__name__)
+
+
+# =====================================================================
+#  Stall watchdog
+# =====================================================================
+
+class StallWatchdog:
+    """Log the event loop's stack whenever it is blocked for too long.
+
+    A task on the loop records a heartbeat every *threshold* / 4 seconds.
+    A daemon thread checks it; once the heartbeat is *threshold* seconds
+    old, the loop thread is stuck in synchronous code and its current
+    stack (the blocking call) is logged.  When the loop recovers, the
+    total stall time is logged too.
+    """
+
+    def __init__(self, threshold: float) -> None:
+        self.threshold = threshold
+        self.interval = threshold / 4
+        self.stalls = 0
+        self._beat = time.monotonic()
+        self._loop_thread = 0
+        self._task: asyncio.Task | None = None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        """Start watching the running loop; call from a coroutine on it."""
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name="stall-watchdog", daemon=True)
+        self._thread.start()
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+
+    async def _heartbeat(self) -> None:
+        while True:
+            self._beat = time.monotonic()
+            await asyncio.sleep(self.interval)
+
+    def _watch(self) -> None:
+        stalled_since: float | None = None
+        while not self._stop.wait(self.interval):
+            beat = self._beat
+            lag = time.monotonic() - beat
+            if lag >= self.threshold + self.interval:
+                if stalled_since != beat:
+                    stalled_since = beat
+                    self.stalls += 1
+                    self._report(lag)
+            elif stalled_since is not None:
+                logger.warning(
+                    "Event loop was blocked for %.2f s", beat - stalled_since
+                )
+                stalled_since = None
+
+    def _report(self, lag: float) -> None:
+        frame = sys._current_frames().get(self._loop_thread)
+        stack = "".join(traceback.format_stack(frame)) if frame else "  (no frame)\n"
+        logger.warning(
+            "Event loop blocked for %.2f s so far; blocking stack:\n%s", lag, stack.rstrip()
+        )
+
+
+# =====================================================================
+#  Sampling profiler
+# =====================================================================
+
+_profile_lock = threading.Lock()
+
+
+def _frame_names(frame: FrameType | None) -> list[str]:
+    names: list[str] = []
+    while frame is not None:
+        code = frame.f_code
+        module = frame.f_globals.get("__name__", "?")
+        names.append(f"{module}:{code.co_qualname}")
+        frame = frame.f_back
+    names.reverse()
+    return names
+
+
+def sample_stacks(seconds: float, interval: float = 0.005) -> Counter[str]:
+    """Sample every thread's stack for *seconds*; return collapsed-stack counts.
+
+    Keys are ``thread;outer;…;inner`` lines in the format read by
+    ``flamegraph.pl`` and speedscope.  Only one profile runs at a time;
+    raises ``RuntimeError`` if another is in progress.
+    """
+    if not _profile_lock.acquire(blocking=False):
+        raise RuntimeError("A profile is already running")
+    try:
+        me = threading.get_ident()
+        counts: Counter[str] = Counter()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = _frame_names(frame)
+                # Idle pool workers and the loop's selector wait are noise.
+                if stack and not stack[-1].endswith(("Condition.wait", "_worker", "select")):
+                    counts[";".join([names.get(ident, str(ident)), *stack])] += 1
+            time.sleep(interval)
+        return counts
+    finally:
+        _profile_lock.release()
+
+
+def collapsed(counts: Counter[str]) -> str:
+    """Render *counts* as collapsed stacks, heaviest first."""
+    return "".join(f"{stack} {n}\n" for stack, n in counts.most_common())
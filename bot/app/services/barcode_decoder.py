@@ -2,24 +2,23 @@
 
 from __future__ import annotations
 
+import asyncio
+import contextvars
 import io
 import logging
+from concurrent.futures import ThreadPoolExecutor
 
 from PIL import Image
 from pyzbar.pyzbar import decode
 
-logger = logging.getLogger(__name__)
+from app.config import DECODE_WORKERS
+from app.services.formats import from_decoder_name
+from app.services.tracing import traced
 
-# Map pyzbar symbology names → our internal format keys.
-_PYZBAR_TO_FORMAT: dict[str, str] = {
-    "EAN13": "ean13",
-    "EAN8": "ean13",
-    "CODE128": "code128",
-    "CODE39": "code128",
-    "QRCODE": "qrcode",
-}
+logger = logging.getLogger(__name__)
 
 
+@traced("decode_barcode")
 def decode_barcode(image_bytes: bytes) -> list[dict]:
     """Decode all barcodes found in *image_bytes*.
 
@@ -33,10 +32,23 @@ def decode_barcode(image_bytes: bytes) -> list[dict]:
             type_name: str = res.type
             decoded.append({
                 "data": res.data.decode("utf-8", errors="replace"),
-                "format": _PYZBAR_TO_FORMAT.get(type_name, "code128"),
+                "format": from_decoder_name(type_name),
                 "type_name": type_name,
             })
         return decoded
     except Exception:
         logger.exception("Failed to decode barcode")
         return []
+
+
+# zbar releases the GIL while scanning, so decodes run truly in parallel and
+# never block the event loop.
+_DECODE_POOL = ThreadPoolExecutor(max_workers=DECODE_WORKERS, thread_name_prefix="decode")
+
+
+async def decode_barcode_async(image_bytes: bytes) -> list[dict]:
+    """Run ``decode_barcode`` on the shared decode thread pool."""
+    loop = asyncio.get_running_loop()
+    # run_in_executor does not carry context over; the span must see its trace.
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(_DECODE_POOL, ctx.run, decode_barcode, image_bytes)
@@ -2,44 +2,284 @@
 
 from __future__ import annotations
 
+import functools
 import io
 
 import barcode
-from barcode.writer import ImageWriter
+from barcode.writer import ImageWriter, SVGWriter
 import qrcode
+from qrcode.constants import (
+    ERROR_CORRECT_H,
+    ERROR_CORRECT_L,
+    ERROR_CORRECT_M,
+    ERROR_CORRECT_Q,
+)
+from qrcode.exceptions import DataOverflowError
+from PIL import Image
+import aztec_code_generator
+import pdf417gen
+from ppf.datamatrix import DataMatrix
 
-# Formats the bot supports.  Keys are stored in OpenSearch.
-SUPPORTED_FORMATS: dict[str, str] = {
-    "ean13": "EAN-13",
-    "code128": "Code 128",
-    "qrcode": "QR Code",
+from app.services.formats import FORMATS, LABELS
+from app.services.tracing import traced
+
+# Formats the bot supports ({key: label}).  Keys are stored in OpenSearch.
+SUPPORTED_FORMATS: dict[str, str] = LABELS
+
+# Output encodings accepted by ``generate_barcode_image``.
+IMAGE_FORMATS: tuple[str, ...] = ("png", "svg", "webp")
+
+# Quiet zones in modules (the spec minimum for each symbology).
+QR_BORDER = 4
+_MATRIX_BORDERS = {"qrcode": QR_BORDER, "datamatrix": 1, "aztec": 1, "pdf417": 2}
+
+# PDF417 rows are this many modules tall.
+_PDF417_ROW_HEIGHT = 3
+# Preferred PDF417 width / height ratio; the column count is chosen to match.
+_PDF417_ASPECT = 2.0
+
+# Tried strongest first: among the levels that fit in the minimal version,
+# the most robust one wins, so extra error correction never costs size.
+_QR_EC_LEVELS = (ERROR_CORRECT_H, ERROR_CORRECT_Q, ERROR_CORRECT_M)
+
+# Two-entry palette (index 0 = white, 1 = black) for 1-bit PNG output.
+_BW_PALETTE = [255, 255, 255, 0, 0, 0]
+
+# Named render profiles.  ``qr_px`` is the approximate width in pixels of 2D
+# symbols (QR, Data Matrix, PDF417, Aztec), which are scaled by an integer
+# module size; the remaining keys are python-barcode writer options for
+# linear symbologies.
+RENDER_PROFILES: dict[str, dict] = {
+    "compact": {
+        "label": "Compact",
+        "qr_px": 360,
+        "module_width": 0.25,
+        "module_height": 12.0,
+        "font_size": 10,
+        "text_distance": 4.0,
+        "quiet_zone": 4.0,
+        "dpi": 200,
+    },
+    # Large enough for phone and checkout scanners after Telegram
+    # re-compresses the photo, small enough to upload quickly.
+    "checkout": {
+        "label": "Checkout scanner",
+        "qr_px": 600,
+        "module_width": 0.4,
+        "module_height": 20.0,
+        "font_size": 14,
+        "text_distance": 5.0,
+        "quiet_zone": 6.5,
+        "dpi": 300,
+    },
+    "print": {
+        "label": "Print",
+        "qr_px": 1200,
+        "module_width": 0.33,
+        "module_height": 25.0,
+        "font_size": 12,
+        "text_distance": 5.0,
+        "quiet_zone": 6.5,
+        "dpi": 600,
+    },
+}
+DEFAULT_PROFILE = "checkout"
+
+_WRITER_KEYS = (
+    "module_width", "module_height", "font_size", "text_distance", "quiet_zone", "dpi",
+)
+
+
+def generate_barcode_image(
+    code: str,
+    barcode_format: str,
+    image_format: str = "png",
+    profile: str = DEFAULT_PROFILE,
+) -> io.BytesIO:
+    """Return an image of the barcode as a seeked-to-zero BytesIO.
+
+    *image_format* is one of ``IMAGE_FORMATS`` (PNG output is 1-bit) and
+    *profile* a key of ``RENDER_PROFILES``.
+    """
+    return io.BytesIO(render_barcode(code, barcode_format, image_format, profile))
+
+
+@traced("render_barcode")
+@functools.lru_cache(maxsize=256)
+def render_barcode(
+    code: str,
+    barcode_format: str,
+    image_format: str = "png",
+    profile: str = DEFAULT_PROFILE,
+) -> bytes:
+    """Like ``generate_barcode_image`` but return (cached) raw bytes.
+
+    Calling this ahead of time pre-warms the cache for a later request.
+    """
+    if image_format not in IMAGE_FORMATS:
+        raise ValueError(f"Unknown image format: {image_format}")
+    if profile not in RENDER_PROFILES:
+        raise ValueError(f"Unknown render profile: {profile}")
+
+    fmt = FORMATS.get(barcode_format)
+    if fmt is None:
+        raise ValueError(f"Unknown format: {barcode_format}")
+
+    settings = RENDER_PROFILES[profile]
+    if fmt.renderer == "linear":
+        options = {key: settings[key] for key in _WRITER_KEYS}
+        buf = _render_linear(code, fmt.writer_name, image_format, options)
+    else:
+        rows, row_height = _MATRIX_BUILDERS[fmt.renderer](code)
+        buf = _render_matrix(
+            rows, image_format, settings["qr_px"], _MATRIX_BORDERS[fmt.renderer], row_height
+        )
+    return buf.getvalue()
+
+
+@functools.lru_cache(maxsize=1024)
+def _qr_matrix(code: str) -> tuple[bytes, ...]:
+    """Return the QR module rows for *code* (one byte per module, 1 = dark).
+
+    The version is the smallest that holds *code* at error-correction
+    level L; the error-correction level is then raised as far as it can go
+    without growing past that version.
+    """
+    qr = qrcode.QRCode(version=None, error_correction=ERROR_CORRECT_L, border=0)
+    qr.add_data(code)
+    qr.make(fit=True)
+    version = qr.version
+
+    for level in _QR_EC_LEVELS:
+        candidate = qrcode.QRCode(version=version, error_correction=level, border=0)
+        candidate.add_data(code)
+        try:
+            candidate.make(fit=False)
+        except DataOverflowError:
+            continue
+        qr = candidate
+        break
+
+    return tuple(bytes(row) for row in qr.get_matrix())
+
+
+def _datamatrix_rows(code: str) -> tuple[bytes, ...]:
+    return tuple(bytes(row) for row in DataMatrix(code).matrix)
+
+
+def _aztec_rows(code: str) -> tuple[bytes, ...]:
+    return tuple(bytes(row) for row in aztec_code_generator.AztecCode(code).matrix)
+
+
+def _pdf417_rows(code: str) -> tuple[bytes, ...]:
+    """Encode *code* as PDF417 with the column count giving the best aspect."""
+    best: tuple[bytes, ...] = ()
+    best_score = float("inf")
+    for columns in range(1, 31):
+        try:
+            codes = pdf417gen.encode(code, columns=columns)
+        except ValueError:
+            continue  # too few or too many rows for this column count
+        rows = tuple(
+            bytes(int(bit) for value in row for bit in format(value, "b")) for row in codes
+        )
+        aspect = len(rows[0]) / (len(rows) * _PDF417_ROW_HEIGHT)
+        score = abs(aspect - _PDF417_ASPECT)
+        if score < best_score:
+            best, best_score = rows, score
+    if not best:
+        raise ValueError("Data too long for PDF417")
+    return best
+
+
+# renderer name → (rows builder, module height in module widths)
+_MATRIX_BUILDERS = {
+    "qrcode": lambda code: (_qr_matrix(code), 1),
+    "datamatrix": lambda code: (_datamatrix_rows(code), 1),
+    "aztec": lambda code: (_aztec_rows(code), 1),
+    "pdf417": lambda code: (_pdf417_rows(code), _PDF417_ROW_HEIGHT),
 }
 
 
-def generate_barcode_image(code: str, barcode_format: str) -> io.BytesIO:
-    """Return a PNG image of the barcode as a seeked-to-zero BytesIO."""
+def _render_matrix(
+    rows: tuple[bytes, ...],
+    image_format: str,
+    target_px: int,
+    border: int,
+    row_height: int = 1,
+) -> io.BytesIO:
+    """Render module *rows* (1 = dark) with an integer module size."""
+    width = len(rows[0]) + 2 * border
+    height = len(rows) * row_height + 2 * border
     buf = io.BytesIO()
 
-    if barcode_format == "qrcode":
-        qr = qrcode.QRCode(version=1, box_size=10, border=5)
-        qr.add_data(code)
-        qr.make(fit=True)
-        img = qr.make_image(fill_color="black", back_color="white")
-        img.save(buf, format="PNG")
+    if image_format == "svg":
+        buf.write(_matrix_svg(rows, width, height, border, row_height).encode())
+        return buf
+
+    pad = bytes(border)
+    blank = bytes(width)
+    lines = [blank] * border
+    for row in rows:
+        lines += [pad + row + pad] * row_height
+    lines += [blank] * border
+    img = Image.frombytes("P", (width, height), b"".join(lines))
+    img.putpalette(_BW_PALETTE)
+
+    scale = max(1, target_px // width)
+    img = img.resize((width * scale, height * scale), Image.NEAREST)
+
+    if image_format == "webp":
+        img.convert("L").save(buf, format="WEBP", lossless=True)
     else:
-        bc_class = barcode.get_barcode_class(barcode_format)
-        writer = ImageWriter()
-        bc = bc_class(code, writer=writer)
-        bc.write(buf, options={
-            "module_width": 0.4,
-            "module_height": 20.0,
-            "font_size": 14,
-            "text_distance": 5.0,
-            "quiet_zone": 6.5,
-            "dpi": 300,
-        })
-
-    buf.seek(0)
+        img.save(buf, format="PNG", bits=1, optimize=True)
+    return buf
+
+
+def _matrix_svg(
+    rows: tuple[bytes, ...], width: int, height: int, border: int, row_height: int,
+) -> str:
+    """Build a compact SVG with one path segment per horizontal dark run."""
+    parts: list[str] = []
+    for y, row in enumerate(rows):
+        top = y * row_height + border
+        x = 0
+        while x < len(row):
+            if not row[x]:
+                x += 1
+                continue
+            start = x
+            while x < len(row) and row[x]:
+                x += 1
+            run = x - start
+            parts.append(f"M{start + border} {top}h{run}v{row_height}h-{run}z")
+    return (
+        '<svg xmlns="http://www.w3.org/2000/svg" '
+        f'viewBox="0 0 {width} {height}" shape-rendering="crispEdges">'
+        f'<rect width="{width}" height="{height}" fill="#fff"/>'
+        f'<path d="{"".join(parts)}" fill="#000"/></svg>'
+    )
+
+
+def _render_linear(
+    code: str, writer_name: str, image_format: str, options: dict,
+) -> io.BytesIO:
+    bc_class = barcode.get_barcode_class(writer_name)
+    # Code 39's optional check character would change the encoded data.
+    extra = {"add_checksum": False} if writer_name == "code39" else {}
+    buf = io.BytesIO()
+
+    if image_format == "svg":
+        bc_class(code, writer=SVGWriter(), **extra).write(buf, options=options)
+        return buf
+
+    # Mode "1" keeps the PNG at 1 bit per pixel.
+    bc_class(code, writer=ImageWriter(mode="1"), **extra).write(buf, options=options)
+    if image_format == "webp":
+        buf.seek(0)
+        img = Image.open(buf).convert("L")
+        buf = io.BytesIO()
+        img.save(buf, format="WEBP", lossless=True)
     return buf
 
 
@@ -51,16 +291,9 @@ def validate_code(code: str, barcode_format: str) -> tuple[bool, str]:
     if not code:
         return False, "Code cannot be empty."
 
-    if barcode_format == "ean13":
-        if not code.isdigit():
-            return False, "EAN-13 codes must contain only digits."
-        if len(code) not in (12, 13):
-            return False, "EAN-13 codes must be 12 or 13 digits long."
-    elif barcode_format == "code128":
-        pass  # Code 128 accepts any ASCII string
-    elif barcode_format == "qrcode":
-        pass  # QR codes accept arbitrary data
-    else:
+    fmt = FORMATS.get(barcode_format)
+    if fmt is None:
         return False, f"Unknown format: {barcode_format}"
 
-    return True, ""
+    err = fmt.validator(code)
+    return not err, err
@@ -0,0 +1,208 @@
+"""Streaming import / export of cards as CSV or JSON."""
+
+from __future__ import annotations
+
+import csv
+import io
+import json
+import logging
+from collections.abc import Callable, Iterable, Iterator
+from dataclasses import dataclass, field
+from typing import BinaryIO, TextIO
+
+from app.services.barcode_generator import validate_code
+from app.services.opensearch_client import OpenSearchClient
+
+logger = logging.getLogger(__name__)
+
+# Columns written by ``export_cards`` and understood by ``iter_rows``.
+FIELDS = ("card_name", "card_code", "barcode_format", "created_at")
+
+EXPORT_FORMATS = ("csv", "json")
+
+CHUNK_SIZE = 500
+MAX_REPORTED_ERRORS = 20
+
+_READ_SIZE = 64 * 1024
+# A JSON array element that is still undecodable after this many buffered
+# characters is malformed (or absurdly large); give up instead of reading on.
+_MAX_ELEMENT_CHARS = 1024 * 1024
+
+
+@dataclass
+class ImportReport:
+    """Running totals of an import; only the first few errors are kept."""
+
+    imported: int = 0
+    failed: int = 0
+    errors: list[tuple[int, str]] = field(default_factory=list)
+
+    def add_error(self, row_no: int, message: str) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((row_no, message))
+
+
+@dataclass(frozen=True, slots=True)
+class BadRow:
+    """Stands in for a row that could not be parsed; reported as an error."""
+
+    message: str
+
+
+# ── reading ──────────────────────────────────────────────────────────
+
+def iter_rows(stream: BinaryIO) -> Iterator[dict | BadRow]:
+    """Yield card dicts from a CSV, JSON-array or JSON-Lines byte stream.
+
+    The format is sniffed from the first non-blank character, and the
+    stream is consumed incrementally so memory does not grow with its size.
+    A malformed JSON line is yielded as a ``BadRow`` and reading goes on.
+    """
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    head = text.read(1)
+    while head and head.isspace():
+        head = text.read(1)
+
+    if head == "[":
+        yield from _iter_json_array(text)
+    elif head == "{":
+        yield from _iter_json_lines(text, head)
+    else:
+        yield from csv.DictReader(_prepend(head, text))
+
+
+def _prepend(first: str, rest: TextIO) -> Iterator[str]:
+    lines = iter(rest)
+    yield first + next(lines, "")
+    yield from lines
+
+
+def _iter_json_lines(text: TextIO, first: str) -> Iterator[dict | BadRow]:
+    for line in _prepend(first, text):
+        line = line.strip()
+        if line:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as exc:
+                yield BadRow(f"Invalid JSON: {exc.msg}.")
+
+
+def _iter_json_array(text: TextIO) -> Iterator[dict]:
+    """Decode the elements of a top-level JSON array one at a time."""
+    decoder = json.JSONDecoder()
+    buf = ""
+    while True:
+        buf = buf.lstrip(" \t\r\n,")
+        if buf.startswith("]"):
+            return
+        try:
+            obj, end = decoder.raw_decode(buf)
+        except json.JSONDecodeError:
+            if len(buf) > _MAX_ELEMENT_CHARS:
+                raise ValueError("Malformed JSON array element") from None
+            more = text.read(_READ_SIZE)
+            if not more:
+                raise ValueError("Truncated JSON array") from None
+            buf += more
+            continue
+        yield obj
+        buf = buf[end:]
+
+
+# ── import ───────────────────────────────────────────────────────────
+
+def _normalise(row: dict) -> dict:
+    return {
+        "card_name": str(row.get("card_name") or "").strip(),
+        "card_code": str(row.get("card_code") or "").strip(),
+        "barcode_format": str(row.get("barcode_format") or "code128").strip().lower(),
+    }
+
+
+def import_cards(
+    os_client: OpenSearchClient,
+    owner_id: int,
+    rows: Iterable[dict | BadRow],
+    chunk_size: int = CHUNK_SIZE,
+    on_progress: Callable[[ImportReport], None] | None = None,
+) -> ImportReport:
+    """Validate *rows* and index them for *owner_id* in ``_bulk`` chunks.
+
+    Rows are numbered from 1.  *on_progress* is called after every chunk.
+    """
+    report = ImportReport()
+    chunk: list[dict] = []
+    row_nos: list[int] = []
+
+    def flush() -> None:
+        try:
+            results = os_client.bulk_add_cards(owner_id, chunk)
+        except Exception as exc:
+            logger.exception("Bulk import chunk failed")
+            results = [str(exc)] * len(chunk)
+        for row_no, error in zip(row_nos, results):
+            if error:
+                report.add_error(row_no, error)
+            else:
+                report.imported += 1
+        chunk.clear()
+        row_nos.clear()
+        if on_progress:
+            on_progress(report)
+
+    row_no = 0
+    try:
+        for row_no, raw in enumerate(rows, start=1):
+            if isinstance(raw, BadRow):
+                report.add_error(row_no, raw.message)
+                continue
+            if not isinstance(raw, dict):
+                report.add_error(row_no, "Not an object.")
+                continue
+            card = _normalise(raw)
+            if not card["card_name"]:
+                report.add_error(row_no, "Card name cannot be empty.")
+                continue
+            ok, err = validate_code(card["card_code"], card["barcode_format"])
+            if not ok:
+                report.add_error(row_no, err)
+                continue
+            chunk.append(card)
+            row_nos.append(row_no)
+            if len(chunk) >= chunk_size:
+                flush()
+    except (ValueError, csv.Error) as exc:
+        report.add_error(row_no + 1, f"Unreadable file: {exc}")
+
+    if chunk:
+        flush()
+    if report.imported:
+        os_client.refresh_cards()
+    return report
+
+
+# ── export ───────────────────────────────────────────────────────────
+
+def export_cards(
+    os_client: OpenSearchClient, owner_id: int, out: TextIO, fmt: str = "csv",
+) -> int:
+    """Stream all cards of *owner_id* into *out*; return how many were written.
+
+    ``csv`` writes a header row; ``json`` writes JSON Lines.  Both can be
+    fed back to ``iter_rows``.
+    """
+    count = 0
+    if fmt == "csv":
+        writer = csv.DictWriter(out, fieldnames=FIELDS)
+        writer.writeheader()
+        for card in os_client.iter_cards(owner_id):
+            writer.writerow({key: getattr(card, key) for key in FIELDS})
+            count += 1
+    elif fmt == "json":
+        for card in os_client.iter_cards(owner_id):
+            out.write(json.dumps({key: getattr(card, key) for key in FIELDS}) + "\n")
+            count += 1
+    else:
+        raise ValueError(f"Unknown export format: {fmt}")
+    return count
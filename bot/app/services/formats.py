@@ -0,0 +1,164 @@
+"""Barcode format registry.
+
+One table describes every symbology the bot knows: the key stored in
+OpenSearch, its label, the names the photo decoder (zbar) and the WebApp
+scanner (html5-qrcode / ZXing) use for it, how codes are validated and how
+``barcode_generator`` renders it.  Lookup dicts are built once at import.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+from dataclasses import dataclass
+
+# Format used when a decoder / WebApp name is not in the registry.
+FALLBACK_FORMAT = "code128"
+
+# Characters allowed in (non-extended) Code 39.
+_CODE39_CHARS = frozenset("0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ-. $/+%")
+
+
+@dataclass(frozen=True)
+class BarcodeFormat:
+    """Everything the bot needs to know about one symbology.
+
+    *renderer* is ``"linear"`` (python-barcode, class *writer_name*) or the
+    name of a 2D matrix renderer in ``barcode_generator``.  *validator*
+    returns an error message, or an empty string when the code is valid.
+    """
+
+    key: str
+    label: str
+    renderer: str
+    validator: Callable[[str], str]
+    writer_name: str = ""
+    decoder_names: tuple[str, ...] = ()
+    webapp_names: tuple[str, ...] = ()
+
+
+# ── validators ───────────────────────────────────────────────────────
+
+def _gtin_check_digit(digits: str) -> int:
+    """Mod-10 check digit shared by EAN-8, EAN-13 and UPC-A."""
+    total = sum(
+        int(d) * (3 if i % 2 == 0 else 1) for i, d in enumerate(reversed(digits))
+    )
+    return (10 - total % 10) % 10
+
+
+def _gtin_validator(label: str, length: int) -> Callable[[str], str]:
+    def validate(code: str) -> str:
+        if not code.isdigit():
+            return f"{label} codes must contain only digits."
+        if len(code) not in (length - 1, length):
+            return f"{label} codes must be {length - 1} or {length} digits long."
+        if len(code) == length and _gtin_check_digit(code[:-1]) != int(code[-1]):
+            return f"{label} check digit is wrong."
+        return ""
+    return validate
+
+
+def _validate_code128(code: str) -> str:
+    return "" if code.isascii() else "Code 128 codes must be plain ASCII."
+
+
+def _validate_code39(code: str) -> str:
+    if not set(code) <= _CODE39_CHARS:
+        return "Code 39 codes may only use A-Z, 0-9, space and - . $ / + %."
+    return ""
+
+
+def _validate_itf(code: str) -> str:
+    if not code.isdigit():
+        return "ITF codes must contain only digits."
+    if len(code) % 2:
+        return "ITF codes must have an even number of digits."
+    return ""
+
+
+def _validate_any(code: str) -> str:
+    return ""
+
+
+# ── the registry ─────────────────────────────────────────────────────
+
+FORMATS: dict[str, BarcodeFormat] = {
+    fmt.key: fmt
+    for fmt in (
+        BarcodeFormat(
+            "ean13", "EAN-13", "linear", _gtin_validator("EAN-13", 13),
+            writer_name="ean13",
+            decoder_names=("EAN13", "ISBN13"),
+            webapp_names=("EAN_13",),
+        ),
+        BarcodeFormat(
+            "ean8", "EAN-8", "linear", _gtin_validator("EAN-8", 8),
+            writer_name="ean8",
+            decoder_names=("EAN8",),
+            webapp_names=("EAN_8",),
+        ),
+        BarcodeFormat(
+            "upca", "UPC-A", "linear", _gtin_validator("UPC-A", 12),
+            writer_name="upca",
+            decoder_names=("UPCA",),
+            webapp_names=("UPC_A",),
+        ),
+        BarcodeFormat(
+            "code128", "Code 128", "linear", _validate_code128,
+            writer_name="code128",
+            decoder_names=("CODE128",),
+            webapp_names=("CODE_128",),
+        ),
+        BarcodeFormat(
+            "code39", "Code 39", "linear", _validate_code39,
+            writer_name="code39",
+            decoder_names=("CODE39",),
+            webapp_names=("CODE_39",),
+        ),
+        BarcodeFormat(
+            "itf", "ITF", "linear", _validate_itf,
+            writer_name="itf",
+            decoder_names=("I25",),
+            webapp_names=("ITF",),
+        ),
+        BarcodeFormat(
+            "qrcode", "QR Code", "qrcode", _validate_any,
+            decoder_names=("QRCODE",),
+            webapp_names=("QR_CODE", "QRCODE"),
+        ),
+        BarcodeFormat(
+            "datamatrix", "Data Matrix", "datamatrix", _validate_any,
+            decoder_names=("DATAMATRIX",),
+            webapp_names=("DATA_MATRIX",),
+        ),
+        BarcodeFormat(
+            "pdf417", "PDF417", "pdf417", _validate_any,
+            decoder_names=("PDF417",),
+            webapp_names=("PDF_417",),
+        ),
+        BarcodeFormat(
+            "aztec", "Aztec", "aztec", _validate_any,
+            decoder_names=("AZTEC",),
+            webapp_names=("AZTEC",),
+        ),
+    )
+}
+
+# Precomputed lookups.
+LABELS: dict[str, str] = {key: fmt.label for key, fmt in FORMATS.items()}
+_BY_DECODER_NAME: dict[str, str] = {
+    name: fmt.key for fmt in FORMATS.values() for name in fmt.decoder_names
+}
+_BY_WEBAPP_NAME: dict[str, str] = {
+    name: fmt.key for fmt in FORMATS.values() for name in fmt.webapp_names
+}
+
+
+def from_decoder_name(type_name: str) -> str:
+    """Map a zbar symbology name (e.g. ``EAN8``) to a format key."""
+    return _BY_DECODER_NAME.get(type_name, FALLBACK_FORMAT)
+
+
+def from_webapp_name(name: str) -> str:
+    """Map an html5-qrcode format name (e.g. ``EAN_8``) to a format key."""
+    return _BY_WEBAPP_NAME.get(name, FALLBACK_FORMAT)
@@ -0,0 +1,43 @@
+"""Typed records returned by the storage layer."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+
+
+@dataclass(slots=True)
+class Card:
+    """A stored loyalty card.
+
+    List queries (``get_cards``, ``search_cards``) only fetch the fields a
+    card keyboard needs — ``id``, ``card_name`` and ``barcode_format`` —
+    so the other fields keep their defaults there.  Use ``get_card`` for
+    the complete record.
+    """
+
+    id: str
+    owner_id: int
+    card_name: str
+    barcode_format: str
+    card_code: str = ""
+    created_at: str | None = None
+    render_profile: str | None = None
+    file_ids: dict[str, str] = field(default_factory=dict)
+
+    @classmethod
+    def from_hit(cls, hit: dict, owner_id: int | None = None) -> Card:
+        """Build a card from an OpenSearch hit / get response.
+
+        *owner_id* fills in the owner when the query did not fetch it.
+        """
+        src = hit["_source"]
+        return cls(
+            id=hit["_id"],
+            owner_id=src.get("owner_id", owner_id),
+            card_name=src.get("card_name", ""),
+            barcode_format=src.get("barcode_format", ""),
+            card_code=src.get("card_code", ""),
+            created_at=src.get("created_at"),
+            render_profile=src.get("render_profile"),
+            file_ids=src.get("file_ids") or {},
+        )
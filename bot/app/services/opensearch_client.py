@@ -2,15 +2,25 @@
 
 from __future__ import annotations
 
+import base64
+import hashlib
 import logging
 import time
+from collections.abc import Iterator
 from datetime import datetime, timezone
 
-from opensearchpy import OpenSearch, NotFoundError
+import orjson
+from opensearchpy import ConflictError, OpenSearch, NotFoundError, helpers
+from opensearchpy.exceptions import SerializationError
+from opensearchpy.serializer import JSONSerializer
+
+from app.services.models import Card
+from app.services.tracing import traced_methods
 
 logger = logging.getLogger(__name__)
 
 INDEX_NAME = "barcode_cards"
+SETTINGS_INDEX = "barcode_settings"
 
 INDEX_BODY = {
     "settings": {
@@ -27,21 +37,125 @@ INDEX_BODY = {
             "card_code": {"type": "keyword"},
             "barcode_format": {"type": "keyword"},
             "created_at": {"type": "date"},
+            "render_profile": {"type": "keyword"},
+            # Telegram file_ids of already-uploaded images, keyed by profile.
+            "file_ids": {"type": "object", "enabled": False},
+            # How often and when (epoch millis) the card was last shown.
+            "use_count": {"type": "integer"},
+            "last_used": {"type": "date", "format": "epoch_millis"},
+        }
+    },
+}
+
+SETTINGS_BODY = {
+    "settings": {
+        "number_of_shards": 1,
+        "number_of_replicas": 0,
+    },
+    "mappings": {
+        "properties": {
+            "render_profile": {"type": "keyword"},
+            "card_sort": {"type": "keyword"},
         }
     },
 }
 
 
+DUPLICATE_CARD = "Card already exists."
+
+# Fields fetched by list queries — all a card keyboard needs.
+LIST_FIELDS = ["card_name", "barcode_format"]
+_LIST_FILTER_PATH = "hits.hits._id,hits.hits._source"
+
+# Orders offered by ``get_cards``: by creation, most used, most recently used.
+CARD_SORTS: dict[str, list[dict]] = {
+    "added": [{"created_at": {"order": "asc"}}],
+    "frequent": [
+        {"use_count": {"order": "desc", "missing": "_last"}},
+        {"last_used": {"order": "desc", "missing": "_last"}},
+        {"created_at": {"order": "asc"}},
+    ],
+    "recent": [
+        {"last_used": {"order": "desc", "missing": "_last"}},
+        {"created_at": {"order": "asc"}},
+    ],
+}
+DEFAULT_CARD_SORT = "added"
+
+# Adds a batch of uses to a card; last_used only moves forward.
+_USAGE_SCRIPT = (
+    "ctx._source.use_count = (ctx._source.use_count == null ? 0 : ctx._source.use_count)"
+    " + params.n; "
+    "if (ctx._source.last_used == null || ctx._source.last_used < params.t) "
+    "{ ctx._source.last_used = params.t }"
+)
+
+# Create attempts of ``add_card`` while the card keeps being deleted and
+# recreated under it.
+ADD_CARD_ATTEMPTS = 3
+
+# Server-side retries of a usage update that races another write to the card.
+USAGE_RETRY_ON_CONFLICT = 3
+
+# Per-request deadlines (seconds) for interactive reads and writes.
+READ_TIMEOUT = 2.0
+WRITE_TIMEOUT = 5.0
+
+
+class OrjsonSerializer(JSONSerializer):
+    """JSON (de)serializer backed by orjson, plugged into the transport."""
+
+    def loads(self, s: str | bytes) -> object:
+        try:
+            return orjson.loads(s)
+        except orjson.JSONDecodeError as e:
+            raise SerializationError(s, e)
+
+    def dumps(self, data: object) -> str:
+        if isinstance(data, str):
+            return data
+        try:
+            return orjson.dumps(data, default=self.default).decode()
+        except TypeError as e:
+            raise SerializationError(data, e)
+
+
+def card_doc_id(owner_id: int, card_code: str, barcode_format: str) -> str:
+    """Deterministic document id for a card.
+
+    The same (owner, code, format) always maps to the same 20-character id,
+    so saving a card twice cannot create a duplicate.
+    """
+    key = f"{owner_id}\x1f{barcode_format}\x1f{card_code}".encode()
+    digest = hashlib.blake2b(key, digest_size=15).digest()
+    return base64.urlsafe_b64encode(digest).decode()
+
+
+@traced_methods("opensearch")
 class OpenSearchClient:
-    """Thin wrapper around the OpenSearch Python client."""
+    """Thin wrapper around the OpenSearch Python client.
 
-    def __init__(self, host: str, port: int) -> None:
+    Single-document reads and writes use the short *read_timeout* /
+    *write_timeout* deadlines; bulk requests and scrolls keep the 30 s
+    client default.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        read_timeout: float = READ_TIMEOUT,
+        write_timeout: float = WRITE_TIMEOUT,
+    ) -> None:
+        self.read_timeout = read_timeout
+        self.write_timeout = write_timeout
         self.client = OpenSearch(
             hosts=[{"host": host, "port": port}],
             http_compress=True,
             use_ssl=False,
             verify_certs=False,
             timeout=30,
+            serializer=OrjsonSerializer(),
         )
 
     # ------------------------------------------------------------------
@@ -83,11 +197,39 @@ class OpenSearchClient:
                 self.client.indices.create(INDEX_NAME, body=INDEX_BODY)
                 logger.info("Recreated index '%s' with owner_id schema", INDEX_NAME)
             else:
+                missing = {
+                    name: spec
+                    for name, spec in INDEX_BODY["mappings"]["properties"].items()
+                    if name not in props
+                }
+                if missing:
+                    self.client.indices.put_mapping(
+                        index=INDEX_NAME, body={"properties": missing}
+                    )
+                    logger.info(
+                        "Added fields %s to index '%s'", ", ".join(missing), INDEX_NAME
+                    )
                 logger.info("Index '%s' already exists", INDEX_NAME)
         else:
             self.client.indices.create(INDEX_NAME, body=INDEX_BODY)
             logger.info("Created index '%s'", INDEX_NAME)
 
+        if not self.client.indices.exists(SETTINGS_INDEX):
+            self.client.indices.create(SETTINGS_INDEX, body=SETTINGS_BODY)
+            logger.info("Created index '%s'", SETTINGS_INDEX)
+        else:
+            mapping = self.client.indices.get_mapping(SETTINGS_INDEX)
+            props = mapping[SETTINGS_INDEX]["mappings"].get("properties", {})
+            missing = {
+                name: spec
+                for name, spec in SETTINGS_BODY["mappings"]["properties"].items()
+                if name not in props
+            }
+            if missing:
+                self.client.indices.put_mapping(
+                    index=SETTINGS_INDEX, body={"properties": missing}
+                )
+
     # ------------------------------------------------------------------
     # CRUD
     # ------------------------------------------------------------------
@@ -98,11 +240,16 @@ class OpenSearchClient:
         card_name: str,
         card_code: str,
         barcode_format: str,
-    ) -> str:
-        """Store a card and return its document id.
+    ) -> tuple[str, Card | None]:
+        """Store a card unless it already exists.
 
         *owner_id* is the user id in private chats or the chat id in groups.
+        Returns ``(card_id, existing)``: *existing* is *None* when the card
+        was created, otherwise the card already stored for the same owner,
+        code and format (possibly under another name).  Retrying a save is
+        therefore harmless.
         """
+        card_id = card_doc_id(owner_id, card_code, barcode_format)
         doc = {
             "owner_id": owner_id,
             "card_name": card_name,
@@ -110,37 +257,212 @@ class OpenSearchClient:
             "barcode_format": barcode_format,
             "created_at": datetime.now(timezone.utc).isoformat(),
         }
-        resp = self.client.index(index=INDEX_NAME, body=doc, refresh="wait_for")
-        return resp["_id"]
+        attempts = ADD_CARD_ATTEMPTS
+        while True:
+            try:
+                self.client.create(
+                    index=INDEX_NAME, id=card_id, body=doc, refresh="wait_for",
+                    request_timeout=self.write_timeout,
+                )
+                return card_id, None
+            except ConflictError:
+                existing = self._fetch_card(card_id)
+                if existing is not None:
+                    return card_id, existing
+                attempts -= 1
+                if not attempts:
+                    raise
+                # Deleted in between: try again, and if another save wins
+                # the race this time, return its card.
+
+    def rename_card(self, card_id: str, owner_id: int, card_name: str) -> bool:
+        """Rename a card only if it belongs to *owner_id*."""
+        card = self._fetch_card(card_id)
+        if not card or card.owner_id != owner_id:
+            return False
+        self.client.update(
+            index=INDEX_NAME,
+            id=card_id,
+            body={"doc": {"card_name": card_name}},
+            refresh="wait_for",
+            request_timeout=self.write_timeout,
+        )
+        return True
 
-    def get_cards(self, owner_id: int) -> list[dict]:
-        """Return all cards belonging to *owner_id*, sorted by creation date."""
+    def get_cards(self, owner_id: int, sort: str = DEFAULT_CARD_SORT) -> list[Card]:
+        """Return all cards belonging to *owner_id* in *sort* order.
+
+        *sort* is a key of ``CARD_SORTS``.  Only ``LIST_FIELDS`` are
+        fetched; see ``Card``.
+        """
         body = {
             "query": {"term": {"owner_id": owner_id}},
-            "sort": [{"created_at": {"order": "asc"}}],
+            "sort": CARD_SORTS.get(sort, CARD_SORTS[DEFAULT_CARD_SORT]),
             "size": 100,
+            "_source": LIST_FIELDS,
+            "track_total_hits": False,
         }
-        resp = self.client.search(index=INDEX_NAME, body=body)
-        return [{"id": h["_id"], **h["_source"]} for h in resp["hits"]["hits"]]
+        resp = self.client.search(
+            index=INDEX_NAME, body=body, filter_path=_LIST_FILTER_PATH,
+            request_timeout=self.read_timeout,
+        )
+        return [Card.from_hit(h, owner_id) for h in resp.get("hits", {}).get("hits", [])]
 
-    def get_card(self, card_id: str) -> dict | None:
+    def get_card(self, card_id: str) -> Card | None:
         """Fetch a single card by id, or *None* if missing."""
+        return self._fetch_card(card_id)
+
+    def _fetch_card(self, card_id: str) -> Card | None:
+        # Used by the write methods so subclasses overriding ``get_card``
+        # (e.g. with caching or a circuit breaker) are not re-entered.
         try:
-            resp = self.client.get(index=INDEX_NAME, id=card_id)
-            return {"id": resp["_id"], **resp["_source"]}
+            return Card.from_hit(self.client.get(
+                index=INDEX_NAME, id=card_id, request_timeout=self.read_timeout
+            ))
         except NotFoundError:
             return None
 
     def delete_card(self, card_id: str, owner_id: int) -> bool:
         """Delete a card only if it belongs to *owner_id*."""
-        card = self.get_card(card_id)
-        if card and card["owner_id"] == owner_id:
-            self.client.delete(index=INDEX_NAME, id=card_id, refresh="wait_for")
+        card = self._fetch_card(card_id)
+        if card and card.owner_id == owner_id:
+            self.client.delete(
+                index=INDEX_NAME, id=card_id, refresh="wait_for",
+                request_timeout=self.write_timeout,
+            )
             return True
         return False
 
-    def search_cards(self, owner_id: int, query_text: str) -> list[dict]:
-        """Full-text search over card names for a given owner."""
+    def has_pending_writes(self, owner_id: int) -> bool:
+        """True if writes of *owner_id* were accepted but not yet applied.
+
+        Always False here: every write is applied before it returns.
+        """
+        return False
+
+    def bulk_add_cards(self, owner_id: int, cards: list[dict]) -> list[str | None]:
+        """Store *cards* with a single ``_bulk`` request.
+
+        Each card dict needs ``card_name``, ``card_code`` and
+        ``barcode_format``.  Returns one entry per card: *None* on success,
+        ``DUPLICATE_CARD`` if the card already exists, otherwise the error
+        reason.  The index is not refreshed — call ``refresh_cards`` once
+        the last chunk is in.
+        """
+        if not cards:
+            return []
+        now = datetime.now(timezone.utc).isoformat()
+        body: list[dict] = []
+        for card in cards:
+            doc_id = card_doc_id(owner_id, card["card_code"], card["barcode_format"])
+            body.append({"create": {"_index": INDEX_NAME, "_id": doc_id}})
+            body.append({
+                "owner_id": owner_id,
+                "card_name": card["card_name"],
+                "card_code": card["card_code"],
+                "barcode_format": card["barcode_format"],
+                "created_at": now,
+            })
+        resp = self.client.bulk(body=body)
+        errors: list[str | None] = []
+        for item in resp["items"]:
+            result = next(iter(item.values()))
+            error = result.get("error")
+            if not error:
+                errors.append(None)
+            elif result.get("status") == 409:
+                errors.append(DUPLICATE_CARD)
+            else:
+                errors.append(error.get("reason", str(error)))
+        return errors
+
+    def bulk_record_usage(
+        self, usage: dict[str, tuple[int, int]],
+    ) -> tuple[int, dict[str, tuple[int, int]]]:
+        """Add batched uses with one ``_bulk`` request of scripted updates.
+
+        *usage* maps card ids to ``(count, last_used_epoch_millis)``.  Each
+        update retries version conflicts with concurrent writes (a rename,
+        a file_id) server-side.  Cards deleted in the meantime are skipped.
+        Returns how many cards were updated, and the usage of cards that
+        failed transiently (still conflicting, rejected, shard errors) for
+        the caller to retry; other failures are logged and dropped.
+        """
+        if not usage:
+            return 0, {}
+        body: list[dict] = []
+        for card_id, (count, last_used) in usage.items():
+            body.append({"update": {
+                "_index": INDEX_NAME, "_id": card_id,
+                "retry_on_conflict": USAGE_RETRY_ON_CONFLICT,
+            }})
+            body.append({
+                "script": {
+                    "source": _USAGE_SCRIPT,
+                    "lang": "painless",
+                    "params": {"n": count, "t": last_used},
+                }
+            })
+        resp = self.client.bulk(
+            body=body, request_timeout=self.write_timeout,
+            filter_path="items.*._id,items.*.status,items.*.error.type",
+        )
+        updated = 0
+        retry: dict[str, tuple[int, int]] = {}
+        for item in resp.get("items", []):
+            result = next(iter(item.values()))
+            status = result["status"]
+            if status < 300:
+                updated += 1
+            elif status in (409, 429) or status >= 500:
+                retry[result["_id"]] = usage[result["_id"]]
+            elif status != 404:
+                logger.warning(
+                    "Dropping usage of card %s: %s (%d)",
+                    result["_id"], result.get("error", {}).get("type"), status,
+                )
+        return updated, retry
+
+    def refresh_cards(self) -> None:
+        """Make recent bulk writes visible to searches."""
+        self.client.indices.refresh(index=INDEX_NAME, request_timeout=self.write_timeout)
+
+    def iter_cards(self, owner_id: int, page_size: int = 500) -> Iterator[Card]:
+        """Yield every card of *owner_id* using a scroll, *page_size* at a time.
+
+        Unlike ``get_cards`` there is no upper bound on the number of cards
+        and only one page is held in memory.  Order is unspecified.
+        """
+        query = {"query": {"term": {"owner_id": owner_id}}}
+        for hit in helpers.scan(
+            self.client, query=query, index=INDEX_NAME, size=page_size, scroll="2m"
+        ):
+            yield Card.from_hit(hit)
+
+    def set_card_render_profile(self, card_id: str, profile: str | None) -> None:
+        """Override the render profile of one card (*None* = owner default)."""
+        self.client.update(
+            index=INDEX_NAME,
+            id=card_id,
+            body={"doc": {"render_profile": profile}},
+            refresh="wait_for",
+            request_timeout=self.write_timeout,
+        )
+
+    def set_card_file_id(self, card_id: str, profile: str, file_id: str) -> None:
+        """Remember the Telegram file_id of the card image for *profile*."""
+        try:
+            self.client.update(
+                index=INDEX_NAME,
+                id=card_id,
+                body={"doc": {"file_ids": {profile: file_id}}},
+                request_timeout=self.write_timeout,
+            )
+        except NotFoundError:
+            pass  # Card was deleted in the meantime
+
+    def search_cards(self, owner_id: int, query_text: str) -> list[Card]:
+        """Full-text search over card names for a given owner (``LIST_FIELDS`` only)."""
         body = {
             "query": {
                 "bool": {
@@ -151,6 +473,54 @@ class OpenSearchClient:
                 }
             },
             "size": 20,
+            "_source": LIST_FIELDS,
+            "track_total_hits": False,
         }
-        resp = self.client.search(index=INDEX_NAME, body=body)
-        return [{"id": h["_id"], **h["_source"]} for h in resp["hits"]["hits"]]
+        resp = self.client.search(
+            index=INDEX_NAME, body=body, filter_path=_LIST_FILTER_PATH,
+            request_timeout=self.read_timeout,
+        )
+        return [Card.from_hit(h, owner_id) for h in resp.get("hits", {}).get("hits", [])]
+
+    # ------------------------------------------------------------------
+    # Per-owner settings
+    # ------------------------------------------------------------------
+
+    def get_render_profile(self, owner_id: int) -> str | None:
+        """Return the owner's default render profile, or *None* if unset."""
+        try:
+            resp = self.client.get(
+                index=SETTINGS_INDEX, id=str(owner_id), request_timeout=self.read_timeout
+            )
+            return resp["_source"].get("render_profile")
+        except NotFoundError:
+            return None
+
+    def set_render_profile(self, owner_id: int, profile: str) -> None:
+        """Set the owner's default render profile."""
+        self._set_setting(owner_id, "render_profile", profile)
+
+    def get_card_sort(self, owner_id: int) -> str:
+        """Return the owner's ``/mycards`` order (a ``CARD_SORTS`` key)."""
+        try:
+            resp = self.client.get(
+                index=SETTINGS_INDEX, id=str(owner_id), request_timeout=self.read_timeout
+            )
+        except NotFoundError:
+            return DEFAULT_CARD_SORT
+        sort = resp["_source"].get("card_sort")
+        return sort if sort in CARD_SORTS else DEFAULT_CARD_SORT
+
+    def set_card_sort(self, owner_id: int, sort: str) -> None:
+        """Set the owner's ``/mycards`` order."""
+        self._set_setting(owner_id, "card_sort", sort)
+
+    def _set_setting(self, owner_id: int, name: str, value: str) -> None:
+        # Partial update so the owner's other settings are kept.  No
+        # refresh: settings are only read back by id, which is real-time.
+        self.client.update(
+            index=SETTINGS_INDEX,
+            id=str(owner_id),
+            body={"doc": {name: value}, "doc_as_upsert": True},
+            request_timeout=self.write_timeout,
+        )
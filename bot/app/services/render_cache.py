@@ -0,0 +1,120 @@
+"""Disk-backed cache of rendered barcode images, addressed by content key."""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from app.services.barcode_generator import IMAGE_FORMATS, generate_barcode_image
+from app.services.resilience import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+KEY_BYTES = 16
+
+
+class RenderCache:
+    """Rendered images stored as ``<key>.<image_format>`` under *directory*.
+
+    The key is a keyed BLAKE2b hash of (code, format, profile, image
+    format), so an image's URL never changes and cannot be derived from a
+    guessed code without *secret*.  Once the files exceed *max_bytes*, the
+    least recently used ones are deleted.
+    """
+
+    def __init__(self, directory: str | os.PathLike, max_bytes: int, secret: bytes) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._secret = hashlib.blake2b(secret, digest_size=32).digest()
+        self._lock = threading.Lock()
+        self._files: OrderedDict[str, int] = OrderedDict()
+        self._renders = SingleFlight()
+        self.total_bytes = 0
+        self._load()
+
+    def _load(self) -> None:
+        """Index existing files, oldest modification first."""
+        entries = []
+        for path in self.directory.iterdir():
+            if path.suffix == ".tmp":
+                path.unlink(missing_ok=True)  # left by an interrupted write
+            elif path.suffix.lstrip(".") in IMAGE_FORMATS and path.is_file():
+                stat = path.stat()
+                entries.append((stat.st_mtime, path.name, stat.st_size))
+        for _, name, size in sorted(entries):
+            self._files[name] = size
+            self.total_bytes += size
+        self._evict()
+
+    def key(self, code: str, barcode_format: str, profile: str, image_format: str) -> str:
+        h = hashlib.blake2b(key=self._secret, digest_size=KEY_BYTES)
+        for part in (code, barcode_format, profile, image_format):
+            h.update(part.encode())
+            h.update(b"\0")
+        return h.hexdigest()
+
+    def ensure(
+        self, code: str, barcode_format: str, profile: str, image_format: str = "png",
+    ) -> str:
+        """Render the image unless it is cached; return its key."""
+        key = self.key(code, barcode_format, profile, image_format)
+        name = f"{key}.{image_format}"
+        if not self._touch(name):
+            # Concurrent first requests for one image render it once.
+            self._renders.do(name, self._render, name, code, barcode_format, profile, image_format)
+        return key
+
+    def _touch(self, name: str) -> bool:
+        with self._lock:
+            if name in self._files:
+                self._files.move_to_end(name)
+                return True
+        return False
+
+    def _render(
+        self, name: str, code: str, barcode_format: str, profile: str, image_format: str,
+    ) -> None:
+        if self._touch(name):
+            return  # finished by a flight that ended just before this one began
+        data = generate_barcode_image(code, barcode_format, image_format, profile).getvalue()
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(data)
+        os.replace(tmp, self.directory / name)
+
+        with self._lock:
+            if name not in self._files:
+                self._files[name] = len(data)
+                self.total_bytes += len(data)
+                self._evict()
+
+    def read(self, key: str, image_format: str) -> bytes | None:
+        """Return the cached image, or *None* if it was never rendered or evicted."""
+        name = f"{key}.{image_format}"
+        with self._lock:
+            if name not in self._files:
+                return None
+            self._files.move_to_end(name)
+        try:
+            return (self.directory / name).read_bytes()
+        except FileNotFoundError:
+            with self._lock:
+                self.total_bytes -= self._files.pop(name, 0)
+            return None
+
+    def _evict(self) -> None:
+        """Delete least recently used files until under ``max_bytes``; hold the lock."""
+        while self.total_bytes > self.max_bytes and self._files:
+            name, size = self._files.popitem(last=False)
+            self.total_bytes -= size
+            try:
+                (self.directory / name).unlink()
+            except FileNotFoundError:
+                pass
+            logger.debug("Evicted %s from the render cache", name)
@@ -0,0 +1,587 @@
+"""Circuit breaker, stale reads and a durable write queue for OpenSearch."""
+
+from __future__ import annotations
+
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from collections.abc import Callable, Hashable
+from pathlib import Path
+from typing import Any, TypeVar
+
+import orjson
+from opensearchpy.exceptions import ConnectionError as OSConnectionError, TransportError
+
+from app.services.models import Card
+from app.services.opensearch_client import (
+    CARD_SORTS,
+    DEFAULT_CARD_SORT,
+    OpenSearchClient,
+    card_doc_id,
+)
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# HTTP statuses that mean "the cluster is struggling", not "bad request".
+_OUTAGE_STATUSES = {429, 500, 502, 503, 504}
+
+# Owners / cards whose last-known reads are remembered for the fallback.
+_CACHE_SIZE = 10_000
+
+
+class StorageUnavailable(Exception):
+    """OpenSearch is unreachable and there is no cached answer."""
+
+
+def is_outage(exc: BaseException) -> bool:
+    """True if *exc* means OpenSearch is down or overloaded."""
+    if isinstance(exc, OSConnectionError):  # includes ConnectionTimeout
+        return True
+    return isinstance(exc, TransportError) and exc.status_code in _OUTAGE_STATUSES
+
+
+# =====================================================================
+#  Circuit breaker
+# =====================================================================
+
+class CircuitBreaker:
+    """Classic closed → open → half-open breaker.
+
+    After *failure_threshold* consecutive outages the circuit opens and
+    calls fail fast.  Once *reset_timeout* seconds have passed a single
+    probe call is let through (half-open); its success closes the circuit,
+    its failure opens it for another period.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(
+        self,
+        failure_threshold: int,
+        reset_timeout: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def allow(self) -> bool:
+        """Return whether a call may go to OpenSearch now."""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+                self._state = self.HALF_OPEN
+                return True  # this caller is the probe
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            reopened = self._state != self.CLOSED
+            self._state = self.CLOSED
+            self._failures = 0
+        if reopened:
+            logger.info("OpenSearch circuit closed")
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning("OpenSearch circuit opened")
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+
+    def call(self, fn: Callable[..., T], *args: Any) -> T:
+        """Run *fn* through the breaker; raise ``StorageUnavailable`` if open."""
+        if not self.allow():
+            raise StorageUnavailable("OpenSearch circuit is open")
+        try:
+            result = fn(*args)
+        except StorageUnavailable:
+            raise  # a nested call already recorded the outcome
+        except Exception as exc:
+            if is_outage(exc):
+                self.record_failure()
+                raise StorageUnavailable(str(exc)) from exc
+            self.record_success()  # the cluster answered, just not with a 2xx
+            raise
+        self.record_success()
+        return result
+
+
+# =====================================================================
+#  Durable write queue
+# =====================================================================
+
+class WriteQueue:
+    """Append-only JSON Lines file of ``[method, args, owner]`` writes.
+
+    Each append is fsynced, so queued writes survive a restart.  Entries
+    are removed from the head only after they were applied.  *owner* is
+    the card owner the write belongs to, or *None* when unknown (entries
+    written before owners were recorded have none).
+    """
+
+    def __init__(self, path: str | os.PathLike) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._entries: deque[list] = deque()
+        self._owners: Counter[int | None] = Counter()
+        if self.path.exists():
+            for line in self.path.read_bytes().splitlines():
+                if line.strip():
+                    entry = orjson.loads(line)
+                    if len(entry) < 3:
+                        entry.append(None)
+                    self._entries.append(entry)
+                    self._owners[entry[2]] += 1
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def pending(self, owner: int | None) -> bool:
+        """True if a write by *owner* must queue behind earlier ones.
+
+        Writes of other owners touch other documents, so they do not need
+        to wait; entries of unknown owner hold back everybody.
+        """
+        with self._lock:
+            if not self._entries:
+                return False
+            return owner is None or bool(self._owners[None] or self._owners[owner])
+
+    def append(self, method: str, *args: Any, owner: int | None = None) -> None:
+        entry = [method, list(args), owner]
+        with self._lock:
+            with open(self.path, "ab") as fh:
+                fh.write(orjson.dumps(entry) + b"\n")
+                fh.flush()
+                os.fsync(fh.fileno())
+            self._entries.append(entry)
+            self._owners[owner] += 1
+
+    def peek(self) -> list | None:
+        with self._lock:
+            return self._entries[0] if self._entries else None
+
+    def pop(self) -> None:
+        """Drop the head entry and persist the rest."""
+        with self._lock:
+            entry = self._entries.popleft()
+            self._owners[entry[2]] -= 1
+            if not self._owners[entry[2]]:
+                del self._owners[entry[2]]
+            fd, tmp = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+            with os.fdopen(fd, "wb") as fh:
+                fh.writelines(orjson.dumps(entry) + b"\n" for entry in self._entries)
+                fh.flush()
+                os.fsync(fh.fileno())
+            os.replace(tmp, self.path)
+
+
+# =====================================================================
+#  Request coalescing
+# =====================================================================
+
+class _Flight:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight:
+    """Collapse concurrent identical calls into one.
+
+    The first caller for a key runs the call; callers arriving while it is
+    in flight wait for it and get the same result (or exception).  Nothing
+    is cached afterwards.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._flights: dict[Hashable, _Flight] = {}
+        self.shared = 0
+
+    def do(self, key: Hashable, fn: Callable[..., T], *args: Any) -> T:
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = _Flight()
+                leader = True
+            else:
+                self.shared += 1
+                leader = False
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = fn(*args)
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        finally:
+            self.forget(key, flight)
+            flight.done.set()
+        return flight.result
+
+    def forget(self, key: Hashable, flight: _Flight | None = None) -> None:
+        """Let later callers for *key* start a new call instead of joining."""
+        with self._lock:
+            if flight is None or self._flights.get(key) is flight:
+                self._flights.pop(key, None)
+
+
+class _LRU(OrderedDict):
+    def __init__(self, maxsize: int) -> None:
+        super().__init__()
+        self.maxsize = maxsize
+
+    def put(self, key: Any, value: Any) -> None:
+        self[key] = value
+        self.move_to_end(key)
+        while len(self) > self.maxsize:
+            self.popitem(last=False)
+
+
+# =====================================================================
+#  Guarded client
+# =====================================================================
+
+class ResilientOpenSearchClient(OpenSearchClient):
+    """``OpenSearchClient`` that degrades instead of hanging when the cluster is down.
+
+    * Every call goes through a ``CircuitBreaker``.
+    * ``get_cards``, ``get_card``, ``search_cards``,
+      ``get_render_profile`` and ``get_card_sort`` fall back to the last answer seen for the
+      same owner / card while the circuit is open.
+    * Card writes made while it is open are appended to a ``WriteQueue``
+      and replayed in order from a background thread as soon as
+      OpenSearch answers again.  Until then the cached lists reflect
+      them, so users see their own changes.
+    * Concurrent ``get_cards`` calls for the same owner and order (every
+      member of a group opening ``/mycards``) share one request.  Writes
+      to an owner's cards detach the in-flight request, so nobody joins a
+      list that predates their own change.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        queue_path: str | os.PathLike,
+        failure_threshold: int = 5,
+        reset_timeout: float = 10.0,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(host, port, **kwargs)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.queue = WriteQueue(queue_path)
+        self._cache_lock = threading.Lock()
+        self._lists: _LRU = _LRU(_CACHE_SIZE)
+        self._cards: _LRU = _LRU(_CACHE_SIZE)
+        self._profiles: _LRU = _LRU(_CACHE_SIZE)
+        self._sorts: _LRU = _LRU(_CACHE_SIZE)
+        self.list_flights = SingleFlight()
+        self._replaying = threading.Lock()
+
+    # ── plumbing ─────────────────────────────────────────────────────
+
+    def _call(self, fn: Callable[..., T], *args: Any) -> T:
+        """Call through the breaker; once OpenSearch answers, drain the queue."""
+        result = self.breaker.call(fn, *args)
+        if len(self.queue):
+            self.replay_async()
+        return result
+
+    def _write(self, method: str, *args: Any, owner: int | None) -> None:
+        """Apply a write now, or queue it if OpenSearch is unavailable.
+
+        Writes are also queued while older queued writes of the same
+        *owner* are pending, so each owner's writes are applied in order.
+        """
+        if not self.queue.pending(owner):
+            try:
+                self._call(getattr(super(), method), *args)
+                return
+            except StorageUnavailable:
+                pass
+        self._enqueue(method, *args, owner=owner)
+
+    def _enqueue(self, method: str, *args: Any, owner: int | None) -> None:
+        self.queue.append(method, *args, owner=owner)
+        logger.info("Queued %s while OpenSearch is unavailable", method)
+        # Doubles as the half-open probe when only writes are coming in.
+        self.replay_async()
+
+    def replay_async(self) -> None:
+        """Start replaying queued writes in a background thread."""
+        if len(self.queue) and not self._replaying.locked():
+            threading.Thread(target=self.replay, name="os-replay", daemon=True).start()
+
+    def replay(self) -> int:
+        """Apply queued writes in order; stop at the first outage.  Returns the count."""
+        if not self._replaying.acquire(blocking=False):
+            return 0
+        applied = 0
+        try:
+            while (entry := self.queue.peek()) is not None:
+                method, args, _ = entry
+                try:
+                    self.breaker.call(getattr(super(), method), *args)
+                except StorageUnavailable:
+                    break
+                except Exception:
+                    logger.exception("Dropping queued %s that OpenSearch rejected", method)
+                self.queue.pop()
+                applied += 1
+        finally:
+            self._replaying.release()
+        if applied:
+            logger.info("Replayed %d queued write(s)", applied)
+        if self.breaker.state == CircuitBreaker.CLOSED:
+            self.replay_async()  # writes queued while this run was finishing
+        return applied
+
+    def has_pending_writes(self, owner_id: int) -> bool:
+        return self.queue.pending(owner_id)
+
+    # ── reads with fallback ──────────────────────────────────────────
+
+    def _forget_lists(self, owner_id: int) -> None:
+        """Called after a write: later ``get_cards`` calls start afresh."""
+        for sort in CARD_SORTS:
+            self.list_flights.forget((owner_id, sort))
+
+    def get_cards(self, owner_id: int, sort: str = DEFAULT_CARD_SORT) -> list[Card]:
+        # Each caller gets its own list; the cards themselves are shared.
+        return list(self.list_flights.do((owner_id, sort), self._get_cards, owner_id, sort))
+
+    def _get_cards(self, owner_id: int, sort: str) -> list[Card]:
+        try:
+            cards = self._call(super().get_cards, owner_id, sort)
+        except StorageUnavailable:
+            with self._cache_lock:
+                cached = self._lists.get((owner_id, sort))
+            if cached is None:
+                raise
+            logger.debug("Serving stale card list for %s", owner_id)
+            return list(cached)
+        with self._cache_lock:
+            self._lists.put((owner_id, sort), list(cards))
+        return cards
+
+    def _cached_lists(self, owner_id: int) -> list[list[Card]]:
+        """The owner's stale lists, one per order seen; hold ``_cache_lock``."""
+        return [
+            cached for sort in CARD_SORTS
+            if (cached := self._lists.get((owner_id, sort))) is not None
+        ]
+
+    def search_cards(self, owner_id: int, query_text: str) -> list[Card]:
+        try:
+            return self._call(super().search_cards, owner_id, query_text)
+        except StorageUnavailable:
+            with self._cache_lock:
+                cached = next(iter(self._cached_lists(owner_id)), None)
+            if cached is None:
+                raise
+            words = query_text.lower().split()
+            return [c for c in cached if any(w in c.card_name.lower() for w in words)]
+
+    def get_card(self, card_id: str) -> Card | None:
+        try:
+            card = self._call(super().get_card, card_id)
+        except StorageUnavailable:
+            with self._cache_lock:
+                if card_id not in self._cards:
+                    raise
+                return self._cards[card_id]
+        with self._cache_lock:
+            self._cards.put(card_id, card)
+        return card
+
+    def get_render_profile(self, owner_id: int) -> str | None:
+        try:
+            profile = self._call(super().get_render_profile, owner_id)
+        except StorageUnavailable:
+            with self._cache_lock:
+                return self._profiles.get(owner_id)
+        with self._cache_lock:
+            self._profiles.put(owner_id, profile)
+        return profile
+
+    def get_card_sort(self, owner_id: int) -> str:
+        try:
+            sort = self._call(super().get_card_sort, owner_id)
+        except StorageUnavailable:
+            with self._cache_lock:
+                return self._sorts.get(owner_id, DEFAULT_CARD_SORT)
+        with self._cache_lock:
+            self._sorts.put(owner_id, sort)
+        return sort
+
+    # ── writes with queueing ─────────────────────────────────────────
+
+    def add_card(
+        self, owner_id: int, card_name: str, card_code: str, barcode_format: str,
+    ) -> tuple[str, Card | None]:
+        card_id = card_doc_id(owner_id, card_code, barcode_format)
+        try:
+            if not self.queue.pending(owner_id):
+                try:
+                    card_id, existing = self._call(
+                        super().add_card, owner_id, card_name, card_code, barcode_format
+                    )
+                except StorageUnavailable:
+                    pass
+                else:
+                    if existing is None:
+                        self._cache_added(Card(card_id, owner_id, card_name, barcode_format, card_code))
+                    return card_id, existing
+
+            with self._cache_lock:
+                existing = self._cards.get(card_id)
+            if existing is not None:
+                return card_id, existing
+            self._enqueue("add_card", owner_id, card_name, card_code, barcode_format, owner=owner_id)
+            self._cache_added(Card(card_id, owner_id, card_name, barcode_format, card_code))
+            return card_id, None
+        finally:
+            self._forget_lists(owner_id)
+
+    def rename_card(self, card_id: str, owner_id: int, card_name: str) -> bool:
+        try:
+            if not self.queue.pending(owner_id):
+                try:
+                    renamed = self._call(super().rename_card, card_id, owner_id, card_name)
+                except StorageUnavailable:
+                    pass
+                else:
+                    if renamed:
+                        self._cache_renamed(card_id, owner_id, card_name)
+                    return renamed
+            if not self._owns_cached(card_id, owner_id):
+                return False
+            self._enqueue("rename_card", card_id, owner_id, card_name, owner=owner_id)
+            self._cache_renamed(card_id, owner_id, card_name)
+            return True
+        finally:
+            self._forget_lists(owner_id)
+
+    def delete_card(self, card_id: str, owner_id: int) -> bool:
+        try:
+            if not self.queue.pending(owner_id):
+                try:
+                    deleted = self._call(super().delete_card, card_id, owner_id)
+                except StorageUnavailable:
+                    pass
+                else:
+                    if deleted:
+                        self._cache_deleted(card_id, owner_id)
+                    return deleted
+            if not self._owns_cached(card_id, owner_id):
+                return False
+            self._enqueue("delete_card", card_id, owner_id, owner=owner_id)
+            self._cache_deleted(card_id, owner_id)
+            return True
+        finally:
+            self._forget_lists(owner_id)
+
+    def _owns_cached(self, card_id: str, owner_id: int) -> bool:
+        """Check ownership before queueing a write, from the last-known card.
+
+        Raises ``StorageUnavailable`` if the card was never seen, so a
+        write is never accepted for a card nobody can vouch for.
+        """
+        with self._cache_lock:
+            if card_id not in self._cards:
+                raise StorageUnavailable("Card owner unknown while OpenSearch is unavailable")
+            card = self._cards[card_id]
+        return card is not None and card.owner_id == owner_id
+
+    # Applied and queued writes alike update the fallback caches, so a
+    # later outage never serves a card as it was before the write.
+
+    def _cache_added(self, card: Card) -> None:
+        with self._cache_lock:
+            self._cards.put(card.id, card)
+            # Never used yet, so it sorts last in every order.
+            for cached in self._cached_lists(card.owner_id):
+                cached.append(card)
+
+    def _cache_renamed(self, card_id: str, owner_id: int, card_name: str) -> None:
+        with self._cache_lock:
+            cards = [self._cards.get(card_id)]
+            for cached in self._cached_lists(owner_id):
+                cards += cached
+            for card in cards:
+                if card is not None and card.id == card_id:
+                    card.card_name = card_name
+
+    def _cache_deleted(self, card_id: str, owner_id: int) -> None:
+        with self._cache_lock:
+            self._cards.put(card_id, None)  # known to be gone
+            for cached in self._cached_lists(owner_id):
+                cached[:] = [c for c in cached if c.id != card_id]
+
+    def set_card_render_profile(self, card_id: str, profile: str | None) -> None:
+        with self._cache_lock:
+            card = self._cards.get(card_id)
+        owner = card.owner_id if card is not None else None
+        self._write("set_card_render_profile", card_id, profile, owner=owner)
+
+    def set_render_profile(self, owner_id: int, profile: str) -> None:
+        self._write("set_render_profile", owner_id, profile, owner=owner_id)
+        with self._cache_lock:
+            self._profiles.put(owner_id, profile)
+
+    def set_card_sort(self, owner_id: int, sort: str) -> None:
+        self._write("set_card_sort", owner_id, sort, owner=owner_id)
+        with self._cache_lock:
+            self._sorts.put(owner_id, sort)
+
+    def bulk_record_usage(
+        self, usage: dict[str, tuple[int, int]],
+    ) -> tuple[int, dict[str, tuple[int, int]]]:
+        # Not queued: the caller keeps the counts and retries.
+        return self._call(super().bulk_record_usage, usage)
+
+    def bulk_add_cards(self, owner_id: int, cards: list[dict]) -> list[str | None]:
+        # Not queued: imports report failed rows and can be re-run.
+        try:
+            return self._call(super().bulk_add_cards, owner_id, cards)
+        finally:
+            self._forget_lists(owner_id)
+
+    def set_card_file_id(self, card_id: str, profile: str, file_id: str) -> None:
+        # Only a cache hint: not worth queueing.
+        try:
+            self._call(super().set_card_file_id, card_id, profile, file_id)
+        except StorageUnavailable:
+            pass
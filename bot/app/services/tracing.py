@@ -0,0 +1,398 @@
+"""Lightweight span tracing with JSONL and OTLP/HTTP export.
+
+A trace starts at ``Tracer.trace`` (one per Telegram update) and every
+``span`` opened while it is current becomes its child.  The current span
+lives in a ``ContextVar``, so it follows ``await``, ``asyncio`` tasks and
+``asyncio.to_thread``; code that hands work to other executors wraps the
+call in ``contextvars.copy_context().run``.
+
+Spans are only recorded inside a trace, which keeps ``span`` and the
+``traced`` decorators nearly free elsewhere (start-up, background jobs).
+Whether a trace is exported is decided when it ends: sampled traces and
+every trace slower than the slow threshold are exported, and the slow
+ones are also logged as an exemplar with their span tree.
+"""
+
+from __future__ import annotations
+
+import abc
+import contextlib
+import functools
+import inspect
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import urllib.request
+from collections.abc import Callable, Iterator
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, TypeVar
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+SERVICE_NAME = "barcode-bot"
+
+
+@dataclass(slots=True)
+class Span:
+    """One timed operation; times are Unix epoch nanoseconds."""
+
+    name: str
+    trace: _Trace
+    span_id: str
+    parent_id: str | None
+    start_ns: int
+    end_ns: int = 0
+    attributes: dict[str, Any] = field(default_factory=dict)
+    error: str | None = None
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def set(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "traceId": self.trace.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id or "",
+            "name": self.name,
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.end_ns,
+            "attributes": self.attributes,
+            "status": {"code": "ERROR", "message": self.error} if self.error else {"code": "OK"},
+        }
+
+
+@dataclass(slots=True)
+class _Trace:
+    trace_id: str
+    sampled: bool
+    spans: list[Span] = field(default_factory=list)
+    # Set once the root span ended, if the trace was exported to it.
+    exporter: Exporter | None = None
+
+
+_current: ContextVar[Span | None] = ContextVar("current_span", default=None)
+
+
+def current_span() -> Span | None:
+    return _current.get()
+
+
+# =====================================================================
+#  Exporters
+# =====================================================================
+
+class Exporter(abc.ABC):
+    """Writes finished spans from a background thread, in batches.
+
+    Subclasses implement ``write``; it runs on the export thread only.
+    """
+
+    BATCH = 512
+
+    def __init__(self) -> None:
+        self._queue: queue.SimpleQueue[list[Span] | None] = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="trace-export", daemon=True)
+        self._thread.start()
+
+    def export(self, spans: list[Span]) -> None:
+        self._queue.put(spans)
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        """Write what is still queued and stop the thread."""
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self) -> None:
+        stop = False
+        while not stop:
+            batch = self._queue.get()
+            if batch is None:
+                break
+            batch = list(batch)
+            while len(batch) < self.BATCH:
+                try:
+                    more = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if more is None:
+                    stop = True
+                    break
+                batch.extend(more)
+            try:
+                self.write(batch)
+            except Exception:
+                logger.warning("Dropped %d span(s): export failed", len(batch), exc_info=True)
+
+    @abc.abstractmethod
+    def write(self, spans: list[Span]) -> None:
+        """Send one batch of spans; exceptions drop the batch."""
+
+
+class JsonlExporter(Exporter):
+    """Append one JSON object per span to *path*."""
+
+    def __init__(self, path: str | os.PathLike) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        super().__init__()
+
+    def write(self, spans: list[Span]) -> None:
+        with open(self.path, "ab") as fh:
+            fh.writelines(orjson.dumps(span.to_dict()) + b"\n" for span in spans)
+
+
+def _otlp_value(value: Any) -> dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class OtlpHttpExporter(Exporter):
+    """POST spans as OTLP/HTTP JSON to a collector's ``/v1/traces`` endpoint."""
+
+    def __init__(self, endpoint: str, timeout: float = 5.0) -> None:
+        self.endpoint = endpoint
+        self.timeout = timeout
+        super().__init__()
+
+    def write(self, spans: list[Span]) -> None:
+        body = {"resourceSpans": [{
+            "resource": {"attributes": [
+                {"key": "service.name", "value": {"stringValue": SERVICE_NAME}},
+            ]},
+            "scopeSpans": [{
+                "scope": {"name": __name__},
+                "spans": [
+                    {
+                        "traceId": span.trace.trace_id,
+                        "spanId": span.span_id,
+                        "parentSpanId": span.parent_id or "",
+                        "name": span.name,
+                        "kind": 1,  # SPAN_KIND_INTERNAL
+                        "startTimeUnixNano": str(span.start_ns),
+                        "endTimeUnixNano": str(span.end_ns),
+                        "attributes": [
+                            {"key": key, "value": _otlp_value(value)}
+                            for key, value in span.attributes.items()
+                        ],
+                        "status": (
+                            {"code": 2, "message": span.error} if span.error else {"code": 1}
+                        ),
+                    }
+                    for span in spans
+                ],
+            }],
+        }]}
+        request = urllib.request.Request(
+            self.endpoint,
+            data=orjson.dumps(body),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as resp:
+            resp.read()
+
+
+# =====================================================================
+#  Tracer
+# =====================================================================
+
+class Tracer:
+    """Start traces, sample them and export or log the ones worth keeping.
+
+    *sample_ratio* of traces are exported; traces that take at least
+    *slow_seconds* are always exported and logged (0 disables that).
+    With neither an exporter nor a slow threshold, tracing is off.
+    """
+
+    def __init__(
+        self,
+        exporter: Exporter | None = None,
+        sample_ratio: float = 0.0,
+        slow_seconds: float = 0.0,
+    ) -> None:
+        self.exporter = exporter
+        self.sample_ratio = sample_ratio if exporter is not None else 0.0
+        self.slow_ns = int(slow_seconds * 1e9)
+        self.slow_traces = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_ratio > 0 or self.slow_ns > 0
+
+    @contextlib.contextmanager
+    def trace(self, name: str, **attributes: Any) -> Iterator[Span | None]:
+        """Open the root span of a new trace."""
+        if not self.enabled:
+            yield None
+            return
+        trace = _Trace(os.urandom(16).hex(), random.random() < self.sample_ratio)
+        root = _open(name, trace, None, attributes)
+        token = _current.set(root)
+        try:
+            yield root
+        except BaseException as exc:
+            root.error = repr(exc)
+            raise
+        finally:
+            _current.reset(token)
+            _close(root)
+            self._finish(trace, root)
+
+    def _finish(self, trace: _Trace, root: Span) -> None:
+        slow = self.slow_ns > 0 and root.end_ns - root.start_ns >= self.slow_ns
+        if self.exporter is not None and (trace.sampled or slow):
+            trace.exporter = self.exporter
+            # Spans still running are exported by ``_close`` when they end.
+            self.exporter.export([s for s in trace.spans if s.end_ns])
+        if slow:
+            self.slow_traces += 1
+            logger.warning(
+                "Slow update: %s took %.0f ms (trace %s)\n%s",
+                root.name, root.duration_ms, trace.trace_id, format_trace(trace.spans),
+            )
+
+    def shutdown(self) -> None:
+        if self.exporter is not None:
+            self.exporter.shutdown()
+
+
+def _open(name: str, trace: _Trace, parent_id: str | None, attributes: dict) -> Span:
+    span = Span(name, trace, os.urandom(8).hex(), parent_id, time.time_ns(), 0, attributes)
+    trace.spans.append(span)
+    return span
+
+
+def _close(span: Span) -> None:
+    span.end_ns = time.time_ns()
+    exporter = span.trace.exporter
+    if exporter is not None and span.parent_id is not None:
+        # Outlived its root, e.g. a task started by the handler.
+        exporter.export([span])
+
+
+def format_trace(spans: list[Span]) -> str:
+    """Render *spans* as an indented tree with durations."""
+    children: dict[str | None, list[Span]] = {}
+    for span in sorted(spans, key=lambda s: s.start_ns):
+        children.setdefault(span.parent_id, []).append(span)
+    lines: list[str] = []
+
+    def walk(parent_id: str | None, depth: int) -> None:
+        for span in children.get(parent_id, []):
+            duration = f"{span.duration_ms:8.1f} ms" if span.end_ns else "   running"
+            error = f"  !! {span.error}" if span.error else ""
+            lines.append(f"  {duration}  {'  ' * depth}{span.name}{error}")
+            walk(span.span_id, depth + 1)
+
+    walk(None, 0)
+    return "\n".join(lines)
+
+
+# The process-wide tracer; replaced by ``configure``.
+tracer = Tracer()
+
+
+def configure(
+    exporter: str = "",
+    jsonl_path: str = "",
+    otlp_endpoint: str = "",
+    sample_ratio: float = 0.0,
+    slow_seconds: float = 0.0,
+) -> Tracer:
+    """Install the process-wide tracer; *exporter* is ``""``, ``jsonl`` or ``otlp``."""
+    global tracer
+    if exporter == "jsonl":
+        sink: Exporter | None = JsonlExporter(jsonl_path)
+    elif exporter == "otlp":
+        sink = OtlpHttpExporter(otlp_endpoint)
+    elif exporter:
+        raise ValueError(f"Unknown trace exporter: {exporter}")
+    else:
+        sink = None
+    tracer = Tracer(sink, sample_ratio, slow_seconds)
+    return tracer
+
+
+# =====================================================================
+#  Instrumentation helpers
+# =====================================================================
+
+@contextlib.contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Span | None]:
+    """Time the enclosed block as a child of the current span, if any."""
+    parent = _current.get()
+    if parent is None:
+        yield None
+        return
+    child = _open(name, parent.trace, parent.span_id, attributes)
+    token = _current.set(child)
+    try:
+        yield child
+    except BaseException as exc:
+        child.error = repr(exc)
+        raise
+    finally:
+        _current.reset(token)
+        _close(child)
+
+
+def traced(name: str | None = None) -> Callable[[F], F]:
+    """Decorator: run the (sync or async) function inside a span."""
+
+    def decorate(fn: F) -> F:
+        span_name = name or fn.__qualname__
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                if _current.get() is None:
+                    return await fn(*args, **kwargs)
+                with span(span_name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper  # type: ignore[return-value]
+
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if _current.get() is None:
+                return fn(*args, **kwargs)
+            with span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper  # type: ignore[return-value]
+
+    return decorate
+
+
+def traced_methods(prefix: str) -> Callable[[type], type]:
+    """Class decorator: trace every public method as ``<prefix>.<name>``.
+
+    Generator methods are left alone; a span would only time their creation.
+    """
+
+    def decorate(cls: type) -> type:
+        for attr, value in list(vars(cls).items()):
+            if (
+                not attr.startswith("_")
+                and inspect.isfunction(value)
+                and not inspect.isgeneratorfunction(value)
+            ):
+                setattr(cls, attr, traced(f"{prefix}.{attr}")(value))
+        return cls
+
+    return decorate
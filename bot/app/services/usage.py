@@ -0,0 +1,66 @@
+"""Batched per-card usage counters."""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+
+from app.services.opensearch_client import OpenSearchClient
+
+logger = logging.getLogger(__name__)
+
+
+class UsageTracker:
+    """Aggregate card opens in memory and write them in batches.
+
+    ``record`` only bumps an in-memory counter, so showing a card never
+    waits on OpenSearch.  ``flush`` (run periodically and at shutdown)
+    sends every pending card in one ``bulk_record_usage`` call; if that
+    fails, or some cards fail transiently, their counts are merged back
+    and retried on the next flush.
+    """
+
+    __slots__ = ("_os", "_lock", "_pending", "flushed")
+
+    def __init__(self, os_client: OpenSearchClient) -> None:
+        self._os = os_client
+        self._lock = threading.Lock()
+        # card_id -> (uses since the last flush, last use in epoch millis)
+        self._pending: dict[str, tuple[int, int]] = {}
+        self.flushed = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def record(self, card_id: str) -> None:
+        now = int(time.time() * 1000)
+        with self._lock:
+            count, _ = self._pending.get(card_id, (0, 0))
+            self._pending[card_id] = (count + 1, now)
+
+    def flush(self) -> int:
+        """Write pending usage; return the number of cards updated."""
+        with self._lock:
+            batch, self._pending = self._pending, {}
+        if not batch:
+            return 0
+        try:
+            updated, retry = self._os.bulk_record_usage(batch)
+        except Exception:
+            self._merge(batch)
+            logger.warning("Usage flush of %d card(s) failed, will retry", len(batch))
+            return 0
+        if retry:
+            self._merge(retry)
+            logger.warning("Usage of %d card(s) not written, will retry", len(retry))
+        self.flushed += updated
+        logger.debug("Flushed usage of %d card(s)", updated)
+        return updated
+
+    def _merge(self, batch: dict[str, tuple[int, int]]) -> None:
+        with self._lock:
+            for card_id, (count, last_used) in batch.items():
+                newer_count, newer_used = self._pending.get(card_id, (0, 0))
+                self._pending[card_id] = (count + newer_count, max(last_used, newer_used))
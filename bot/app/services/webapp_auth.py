@@ -0,0 +1,67 @@
+"""Validation of Telegram Mini App ``initData``.
+
+See https://core.telegram.org/bots/webapps#validating-data-received-via-the-mini-app
+"""
+
+from __future__ import annotations
+
+import hashlib
+import hmac
+import json
+import time
+from dataclasses import dataclass
+from urllib.parse import parse_qsl
+
+
+class WebAppAuthError(ValueError):
+    """``initData`` is missing, forged or too old."""
+
+
+@dataclass(frozen=True, slots=True)
+class WebAppUser:
+    """The Telegram user a Mini App request was signed for."""
+
+    id: int
+    first_name: str = ""
+    username: str = ""
+
+
+def _secret_key(bot_token: str) -> bytes:
+    return hmac.new(b"WebAppData", bot_token.encode(), hashlib.sha256).digest()
+
+
+def validate_init_data(
+    init_data: str, bot_token: str, max_age: float, now: float | None = None,
+) -> WebAppUser:
+    """Check the HMAC and age of *init_data* and return the signed user.
+
+    Raises ``WebAppAuthError`` if the signature does not match, the data is
+    older than *max_age* seconds, or it carries no user.
+    """
+    if not init_data:
+        raise WebAppAuthError("Missing initData")
+
+    fields = dict(parse_qsl(init_data, keep_blank_values=True, strict_parsing=False))
+    received = fields.pop("hash", "")
+    check_string = "\n".join(f"{key}={fields[key]}" for key in sorted(fields))
+    expected = hmac.new(
+        _secret_key(bot_token), check_string.encode(), hashlib.sha256
+    ).hexdigest()
+    if not hmac.compare_digest(expected, received):
+        raise WebAppAuthError("Bad initData signature")
+
+    try:
+        auth_date = int(fields["auth_date"])
+        user = json.loads(fields["user"])
+        user_id = int(user["id"])
+    except (KeyError, TypeError, ValueError) as exc:
+        raise WebAppAuthError("Incomplete initData") from exc
+
+    if (now if now is not None else time.time()) - auth_date > max_age:
+        raise WebAppAuthError("initData expired")
+
+    return WebAppUser(
+        id=user_id,
+        first_name=str(user.get("first_name", "")),
+        username=str(user.get("username", "")),
+    )
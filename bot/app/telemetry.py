@@ -0,0 +1,79 @@
+"""Telegram-side tracing: one trace per update, spans for handlers and Bot API calls."""
+
+from __future__ import annotations
+
+import contextlib
+from collections.abc import Iterator
+from typing import Any
+
+from telegram import Update
+from telegram.ext import Application, BaseHandler, ConversationHandler
+from telegram.request import HTTPXRequest
+
+from app.services import tracing
+
+
+def update_attributes(update: object) -> tuple[str, dict[str, Any]]:
+    """Return the root span name and attributes for *update*."""
+    if not isinstance(update, Update):
+        return f"update.{type(update).__name__}", {}
+    kind = next((t for t in Update.ALL_TYPES if getattr(update, t, None)), "unknown")
+    attributes: dict[str, Any] = {"update.id": update.update_id}
+    if update.effective_chat is not None:
+        attributes["chat.type"] = update.effective_chat.type
+    if update.effective_user is not None:
+        attributes["user.id"] = update.effective_user.id
+    return f"update.{kind}", attributes
+
+
+@contextlib.contextmanager
+def trace_update(update: object) -> Iterator[tracing.Span | None]:
+    """Open the root span of *update*'s trace."""
+    tracer = tracing.tracer
+    if not tracer.enabled:
+        yield None
+        return
+    name, attributes = update_attributes(update)
+    with tracer.trace(name, **attributes) as root:
+        yield root
+
+
+class TracedRequest(HTTPXRequest):
+    """``HTTPXRequest`` that times every Bot API call and file download."""
+
+    async def do_request(self, url: str, method: str, *args: Any, **kwargs: Any) -> tuple[int, bytes]:
+        if tracing.current_span() is None:
+            return await super().do_request(url, method, *args, **kwargs)
+        # Never put the URL in the span: it contains the bot token.
+        name = "telegram.download" if "/file/bot" in url else f"telegram.{url.rsplit('/', 1)[-1]}"
+        with tracing.span(name) as span:
+            code, payload = await super().do_request(url, method, *args, **kwargs)
+            span.set("http.status_code", code)  # type: ignore[union-attr]
+            span.set("bytes", len(payload))  # type: ignore[union-attr]
+            return code, payload
+
+
+def _handlers(handlers: list[BaseHandler]) -> Iterator[BaseHandler]:
+    for handler in handlers:
+        if isinstance(handler, ConversationHandler):
+            yield from _handlers(handler.entry_points)
+            for state in handler.states.values():
+                yield from _handlers(state)
+            yield from _handlers(handler.fallbacks)
+        else:
+            yield handler
+
+
+def instrument_handlers(application: Application) -> int:
+    """Wrap every registered handler callback in a span; return how many.
+
+    Call after all handlers are added.  Conversation handlers are walked
+    into, so each entry point, state and fallback callback is covered.
+    """
+    count = 0
+    for group in application.handlers.values():
+        for handler in _handlers(group):
+            callback = handler.callback
+            handler.callback = tracing.traced(f"handler.{callback.__qualname__}")(callback)
+            count += 1
+    return count
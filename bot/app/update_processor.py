@@ -0,0 +1,88 @@
+"""Concurrent update processing with per-conversation ordering."""
+
+from __future__ import annotations
+
+import logging
+from collections import deque
+from collections.abc import Awaitable
+from typing import Any
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+from app.telemetry import trace_update
+
+logger = logging.getLogger(__name__)
+
+UpdateKey = tuple[int | None, int | None]
+
+
+class KeyedUpdateProcessor(BaseUpdateProcessor):
+    """Process updates in parallel across (chat, user) keys, in order within one.
+
+    ``ConversationHandler`` keys its state by chat and user, so two updates
+    with the same key must never run at the same time: the second would
+    read the state before the first has written it.  Updates for a key that
+    is already being processed are queued behind it and run by the same
+    task, so every key occupies at most one of the *max_concurrent_updates*
+    slots and one busy user cannot starve everyone else.
+
+    Each update runs inside its own trace (see ``app.telemetry``).
+    """
+
+    __slots__ = ("_queues",)
+
+    def __init__(self, max_concurrent_updates: int) -> None:
+        super().__init__(max_concurrent_updates)
+        self._queues: dict[UpdateKey, deque[tuple[object, Awaitable[Any]]]] = {}
+
+    @staticmethod
+    def key(update: object) -> UpdateKey | None:
+        """Return the ordering key of *update*, or *None* if it has none."""
+        if not isinstance(update, Update):
+            return None
+        chat = update.effective_chat
+        user = update.effective_user
+        if chat is None and user is None:
+            return None
+        return (chat.id if chat else None, user.id if user else None)
+
+    @property
+    def active_keys(self) -> int:
+        """Number of keys with updates currently running or queued."""
+        return len(self._queues)
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        key = self.key(update)
+        if key is None:
+            with trace_update(update):
+                await coroutine
+            return
+
+        queue = self._queues.get(key)
+        if queue is not None:
+            # Runs after the updates already in flight for this key.
+            queue.append((update, coroutine))
+            return
+
+        queue = self._queues[key] = deque([(update, coroutine)])
+        try:
+            while queue:
+                try:
+                    with trace_update(queue[0][0]):
+                        await queue[0][1]
+                except Exception:
+                    logger.exception("Unhandled error while processing update for %s", key)
+                queue.popleft()
+        finally:
+            del self._queues[key]
+            for _, pending in queue:
+                # Only reached on cancellation (shutdown); avoid "never awaited".
+                if hasattr(pending, "close"):
+                    pending.close()
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
@@ -0,0 +1 @@
+"""Reproducible micro- and load benchmarks; run as ``python -m bench.<name>``."""
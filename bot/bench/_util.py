@@ -0,0 +1,32 @@
+"""Timing and allocation helpers shared by the benchmarks."""
+
+from __future__ import annotations
+
+import os
+import statistics
+import time
+import tracemalloc
+from collections.abc import Callable
+
+# app.config requires a token at import time; benchmarks never talk to Telegram.
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "123456:BENCH")
+
+
+def measure(fn: Callable[[], object], repeat: int = 200) -> tuple[float, float]:
+    """Return (median milliseconds, peak KiB allocated) for one call of *fn*."""
+    fn()  # warm-up
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(times), peak / 1024
+
+
+def report(label: str, value: float, kib: float | None = None, unit: str = "ms") -> None:
+    extra = f"  {kib:10.1f} KiB peak" if kib is not None else ""
+    print(f"{label:<40} {value:9.3f} {unit}{extra}")
@@ -0,0 +1,111 @@
+"""Callback-query dispatch: the old regex handler chain vs. ``CallbackRouter``.
+
+The old chain is rebuilt from the handlers ``main()`` used to register
+(first match wins, then the handler re-parses ``data.split(":")``).  The
+new path is one pattern-less ``CallbackQueryHandler`` plus the router's
+tag lookup and codec decode.  Handlers are no-ops, so the numbers are the
+per-callback routing cost only: once through PTB's ``check_update`` and
+the handler call, once for handler selection and argument parsing alone.
+
+    python -m bench.bench_callback_dispatch
+"""
+
+from __future__ import annotations
+
+import timeit
+
+from bench._util import report
+
+from telegram import CallbackQuery, Update, User
+from telegram.ext import CallbackQueryHandler
+
+from app.handlers import callbacks as cb
+
+CARD_ID = "AbCdEfGhIjKlMnOpQrSt"
+ROUNDS = 100_000
+
+
+def _update(data: str) -> Update:
+    query = CallbackQuery("1", User(1, "u", False), "instance", data=data)
+    return Update(1, callback_query=query)
+
+
+def _run(coroutine) -> None:
+    try:
+        coroutine.send(None)
+    except StopIteration:
+        pass
+
+
+async def _handler(update: Update, context: object, *fields: object) -> None:
+    pass
+
+
+async def _legacy_handler(update: Update, context: object) -> None:
+    update.callback_query.data.split(":")  # type: ignore[union-attr]
+
+
+def main() -> None:
+    old_chain = [
+        CallbackQueryHandler(_legacy_handler, pattern=r"^menu:addcard$"),
+        CallbackQueryHandler(_legacy_handler, pattern=r"^menu:mycards$"),
+        CallbackQueryHandler(_legacy_handler, pattern=r"^card:show:"),
+        CallbackQueryHandler(_legacy_handler, pattern=r"^card:del:"),
+        CallbackQueryHandler(_legacy_handler, pattern=r"^menu:"),
+    ]
+    old_updates = [_update(d) for d in (
+        f"card:show:{CARD_ID}", f"card:del:{CARD_ID}", "menu:mycards", "menu:back",
+    )]
+
+    def old_dispatch() -> None:
+        for update in old_updates:
+            for handler in old_chain:
+                if handler.check_update(update):
+                    _run(handler.callback(update, None))
+                    break
+
+    router = cb.CallbackRouter()
+    for tag in (cb.SHOW_CARD, cb.DELETE_CARD, cb.MY_CARDS, cb.MENU, cb.ADD_CARD):
+        router.route(tag, _handler)
+    entry = CallbackQueryHandler(router.dispatch)
+    new_updates = [_update(d) for d in (
+        cb.encode(cb.SHOW_CARD, CARD_ID), cb.encode(cb.DELETE_CARD, CARD_ID),
+        cb.encode(cb.MY_CARDS), cb.encode(cb.MENU, "back"),
+    )]
+
+    def new_dispatch() -> None:
+        for update in new_updates:
+            if entry.check_update(update):
+                _run(router.dispatch(update, None))  # type: ignore[arg-type]
+
+    old_data = [u.callback_query.data for u in old_updates]  # type: ignore[union-attr]
+    new_data = [u.callback_query.data for u in new_updates]  # type: ignore[union-attr]
+
+    def old_lookup() -> None:
+        for data in old_data:
+            for handler in old_chain:
+                if handler.pattern.match(data):  # type: ignore[union-attr]
+                    data.split(":")
+                    break
+
+    def new_lookup() -> None:
+        for data in new_data:
+            if router._routes.get(data[:1]) is not None:
+                cb.decode(data)
+
+    per_call = len(old_updates)
+    for label, fn in (
+        ("regex chain", old_dispatch),
+        ("CallbackRouter", new_dispatch),
+        ("regex chain, selection only", old_lookup),
+        ("CallbackRouter, selection only", new_lookup),
+    ):
+        seconds = min(timeit.repeat(fn, number=ROUNDS // per_call, repeat=5))
+        report(label, seconds / ROUNDS * 1e6, unit="us per callback")
+
+    print(f"\ncallback_data bytes for a card button: "
+          f"old {len(f'card:show:{CARD_ID}')}, new {len(cb.encode(cb.SHOW_CARD, CARD_ID))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Listing a 1,000-card owner: full ``_source`` dicts vs. trimmed ``Card`` records.
+
+Both variants go through the real opensearch-py transport against an
+in-process connection that returns a canned response, so the numbers cover
+deserialisation and record building, not the network.
+
+    python -m bench.bench_list_cards [cards]
+"""
+
+from __future__ import annotations
+
+import json
+import sys
+
+from bench._util import measure, report
+
+from opensearchpy import Connection, OpenSearch
+from opensearchpy.serializer import JSONSerializer
+
+from app.services.opensearch_client import (
+    INDEX_NAME,
+    LIST_FIELDS,
+    OpenSearchClient,
+    OrjsonSerializer,
+)
+
+
+def _hits(count: int, fields: tuple[str, ...] | None) -> bytes:
+    hits = []
+    for i in range(count):
+        source = {
+            "owner_id": 42,
+            "card_name": f"Store number {i}",
+            "card_code": f"{i:013d}",
+            "barcode_format": "ean13",
+            "created_at": "2024-01-01T00:00:00+00:00",
+            "render_profile": "scanner",
+            "file_ids": {"compact": "A" * 80, "scanner": "B" * 80},
+        }
+        if fields is not None:
+            source = {key: source[key] for key in fields}
+        hits.append({"_index": INDEX_NAME, "_id": f"{i:020d}", "_score": None, "_source": source})
+    return json.dumps({
+        "took": 3, "timed_out": False,
+        "hits": {"total": {"value": count, "relation": "eq"}, "max_score": None, "hits": hits},
+    }).encode()
+
+
+def _connection(payload: bytes) -> type[Connection]:
+    class CannedConnection(Connection):
+        def perform_request(self, method, url, params=None, body=None, timeout=None,
+                            ignore=(), headers=None):
+            return 200, {"content-type": "application/json"}, payload.decode()
+
+    return CannedConnection
+
+
+def main(count: int = 1000) -> None:
+    full = _hits(count, None)
+    trimmed = _hits(count, LIST_FIELDS)
+    print(f"{count} cards: full response {len(full) / 1024:.0f} KiB, "
+          f"trimmed {len(trimmed) / 1024:.0f} KiB\n")
+
+    # Before: stdlib JSON, whole _source, one dict per card.
+    old = OpenSearch(connection_class=_connection(full), serializer=JSONSerializer())
+
+    def old_list() -> list[dict]:
+        resp = old.search(index=INDEX_NAME, body={"query": {"term": {"owner_id": 42}}})
+        return [{"id": h["_id"], **h["_source"]} for h in resp["hits"]["hits"]]
+
+    # After: the real get_cards over orjson, _source includes and Card slots.
+    client = OpenSearchClient.__new__(OpenSearchClient)
+    client.read_timeout = client.write_timeout = 2.0
+    client.client = OpenSearch(connection_class=_connection(trimmed), serializer=OrjsonSerializer())
+
+    assert len(old_list()) == len(client.get_cards(42)) == count
+    report("dicts from full _source (json)", *measure(old_list))
+    report("get_cards -> Card (orjson, includes)", *measure(lambda: client.get_cards(42)))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
@@ -0,0 +1,176 @@
+"""Load test of the Mini App image endpoints against a local tornado server.
+
+The real ``make_web_app`` and ``RenderCache`` are served on a random local
+port; only storage is an in-memory card store.  Each simulated client asks
+``/api/cards/<id>/barcode.<fmt>`` for the image URL (303), then fetches
+it: the first time with a plain ``GET`` (200), afterwards with the ETag it
+was given (304), the way a browser or proxy revalidates.
+
+    python -m bench.load_images [requests] [concurrency]
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import hmac
+import json
+import random
+import statistics
+import sys
+import tempfile
+import time
+import urllib.parse
+from collections import defaultdict
+from dataclasses import dataclass, field
+from unittest import mock
+
+from bench._util import report
+
+from tornado.httpclient import AsyncHTTPClient, HTTPClientError, HTTPRequest
+from tornado.httpserver import HTTPServer
+from tornado.netutil import bind_sockets
+
+from app.api import make_web_app
+from app.config import TELEGRAM_BOT_TOKEN
+from app.services import render_cache as render_cache_module
+from app.services.models import Card
+from app.services.opensearch_client import card_doc_id
+from app.services.render_cache import RenderCache
+
+OWNER_ID = 4242
+FORMATS = ("svg", "png")
+
+
+class _CardStore:
+    """The few storage calls the image endpoints make."""
+
+    def __init__(self, cards: list[Card]) -> None:
+        self.cards = {card.id: card for card in cards}
+
+    def get_card(self, card_id: str) -> Card | None:
+        return self.cards.get(card_id)
+
+    def get_render_profile(self, owner_id: int) -> str | None:
+        return None
+
+
+class _BotApp:
+    bot = None
+
+    def __init__(self, os_client: _CardStore) -> None:
+        self.bot_data = {"os_client": os_client}
+
+
+def init_data(user_id: int, bot_token: str = TELEGRAM_BOT_TOKEN) -> str:
+    """Mini App ``initData`` signed the way Telegram signs it."""
+    fields = {
+        "auth_date": str(int(time.time())),
+        "query_id": "load",
+        "user": json.dumps({"id": user_id, "first_name": "Load"}),
+    }
+    check_string = "\n".join(f"{key}={fields[key]}" for key in sorted(fields))
+    secret = hmac.new(b"WebAppData", bot_token.encode(), hashlib.sha256).digest()
+    fields["hash"] = hmac.new(secret, check_string.encode(), hashlib.sha256).hexdigest()
+    return urllib.parse.urlencode(fields)
+
+
+@dataclass
+class LoadResult:
+    seconds: float = 0.0
+    renders: int = 0
+    images: int = 0
+    # status code -> count, and request kind -> latencies in ms
+    statuses: dict[int, int] = field(default_factory=lambda: defaultdict(int))
+    latencies: dict[str, list[float]] = field(default_factory=lambda: defaultdict(list))
+
+    @property
+    def requests(self) -> int:
+        return sum(self.statuses.values())
+
+
+async def run_load(
+    requests: int = 2000, concurrency: int = 50, cards: int = 20, seed: int = 37,
+) -> LoadResult:
+    """Drive *requests* card opens from *concurrency* clients; return the tallies."""
+    store = _CardStore([
+        Card(card_doc_id(OWNER_ID, f"{i:012d}", "ean13"), OWNER_ID, f"Store {i}", "ean13", f"{i:012d}")
+        for i in range(cards)
+    ])
+    result = LoadResult()
+    render = render_cache_module.generate_barcode_image
+
+    def counting_render(*args, **kwargs):
+        result.renders += 1
+        return render(*args, **kwargs)
+
+    with tempfile.TemporaryDirectory() as directory, \
+            mock.patch.object(render_cache_module, "generate_barcode_image", counting_render):
+        cache = RenderCache(directory, 64 * 1024 * 1024, TELEGRAM_BOT_TOKEN.encode())
+        sockets = bind_sockets(0, "127.0.0.1")
+        server = HTTPServer(make_web_app(_BotApp(store), cache))  # type: ignore[arg-type]
+        server.add_sockets(sockets)
+        base = f"http://127.0.0.1:{sockets[0].getsockname()[1]}"
+        client = AsyncHTTPClient(force_instance=True, max_clients=concurrency)
+        auth = {"Authorization": f"tma {init_data(OWNER_ID)}"}
+        rng = random.Random(seed)
+        plan = [(rng.choice(list(store.cards)), rng.choice(FORMATS)) for _ in range(requests)]
+
+        async def fetch(kind: str, url: str, headers: dict[str, str]):
+            start = time.perf_counter()
+            try:
+                response = await client.fetch(
+                    HTTPRequest(base + url, headers=headers, follow_redirects=False)
+                )
+            except HTTPClientError as exc:
+                if exc.response is None:
+                    raise
+                response = exc.response
+            result.latencies[kind].append((time.perf_counter() - start) * 1000)
+            result.statuses[response.code] += 1
+            return response
+
+        async def worker(jobs: list[tuple[str, str]]) -> None:
+            etags: dict[str, str] = {}
+            for card_id, image_format in jobs:
+                redirect = await fetch("redirect", f"/api/cards/{card_id}/barcode.{image_format}", auth)
+                if redirect.code != 303:
+                    continue
+                url = redirect.headers["Location"]
+                if url in etags:
+                    await fetch("revalidate", url, {"If-None-Match": etags[url]})
+                    continue
+                image = await fetch("image", url, {})
+                if image.code == 200:
+                    assert "immutable" in image.headers["Cache-Control"]
+                    etags[url] = image.headers["ETag"]
+
+        start = time.perf_counter()
+        try:
+            await asyncio.gather(*(worker(plan[i::concurrency]) for i in range(concurrency)))
+        finally:
+            result.seconds = time.perf_counter() - start
+            client.close()
+            server.stop()
+            await server.close_all_connections()
+        result.images = len({(card_id, image_format) for card_id, image_format in plan})
+    return result
+
+
+def main() -> None:
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    result = asyncio.run(run_load(requests, concurrency))
+    print(f"{requests} card opens, {concurrency} concurrent clients, "
+          f"{result.requests} HTTP requests in {result.seconds:.2f} s "
+          f"({result.requests / result.seconds:.0f} req/s)\n")
+    for kind, times in result.latencies.items():
+        times.sort()
+        report(f"{kind} p50", statistics.median(times))
+        report(f"{kind} p99", times[int(len(times) * 0.99) - 1])
+    print(f"\nstatuses: {dict(sorted(result.statuses.items()))}")
+    print(f"renders: {result.renders} for {result.images} distinct images")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+"""Shared test setup."""
+
+import os
+
+# app.config requires a token at import time; tests never talk to Telegram.
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "123456:TEST")
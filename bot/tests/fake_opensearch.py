@@ -0,0 +1,158 @@
+"""An in-process OpenSearch stand-in behind the real opensearch-py transport."""
+
+from __future__ import annotations
+
+import json
+import threading
+from typing import Any
+
+from opensearchpy import Connection, OpenSearch
+from opensearchpy.exceptions import ConnectionError as OSConnectionError
+
+from app.services.opensearch_client import OpenSearchClient, OrjsonSerializer
+
+
+class FakeCluster:
+    """Documents per index, an outage switch and a log of every request.
+
+    Supports the requests ``OpenSearchClient`` makes: single-document
+    create / get / update / delete, ``term`` + ``match`` searches with
+    ``sort`` and ``_bulk`` usage updates.  While ``down`` is set every
+    request fails with a connection error, like an unreachable node.
+    ``conflicts[id]`` makes the next bulk updates of that document lose
+    that many races with other writers; an update whose
+    ``retry_on_conflict`` does not cover them fails with a 409.
+    """
+
+    def __init__(self) -> None:
+        self.docs: dict[str, dict[str, dict]] = {}
+        self.down = False
+        self.conflicts: dict[str, int] = {}
+        self.requests: list[tuple[str, str]] = []
+        self._lock = threading.Lock()
+
+    def client(self) -> OpenSearch:
+        """A client whose connection talks to this cluster, without retries."""
+        cluster = self
+
+        class FakeConnection(Connection):
+            def perform_request(self, method, url, params=None, body=None, timeout=None,
+                                ignore=(), headers=None):
+                status, data = cluster.handle(method, url.split("?")[0], body)
+                if not 200 <= status < 300 and status not in ignore:
+                    self._raise_error(status, data)
+                return status, {}, data
+
+        return OpenSearch(
+            connection_class=FakeConnection, serializer=OrjsonSerializer(), max_retries=0,
+        )
+
+    def opensearch_client(self) -> OpenSearchClient:
+        """A plain ``OpenSearchClient`` backed by this cluster."""
+        client = OpenSearchClient("localhost", 9200)
+        client.client = self.client()
+        return client
+
+    def writes(self) -> list[tuple[str, str]]:
+        """The non-read requests received, in order."""
+        return [
+            (method, path) for method, path in self.requests
+            if method != "GET" and not path.endswith("/_search")
+        ]
+
+    # ── request handling ────────────────────────────────────────────
+
+    def handle(self, method: str, path: str, body: bytes | None) -> tuple[int, str]:
+        with self._lock:
+            self.requests.append((method, path))
+            if self.down:
+                raise OSConnectionError("N/A", "cluster is down", None)
+            parts = path.strip("/").split("/")
+            payload = body.decode() if body else ""
+            index = parts[0]
+            if parts[1:] == ["_search"]:
+                return self._search(index, json.loads(payload))
+            if parts[0] == "_bulk":
+                return self._bulk(payload)
+            action, doc_id = parts[1], parts[2]
+            docs = self.docs.setdefault(index, {})
+            if action == "_create":
+                if doc_id in docs:
+                    return 409, json.dumps({"error": "version_conflict_engine_exception"})
+                docs[doc_id] = json.loads(payload)
+                return 201, json.dumps({"_id": doc_id, "result": "created"})
+            if action == "_update":
+                request = json.loads(payload)
+                if doc_id not in docs and not request.get("doc_as_upsert"):
+                    return 404, json.dumps({"error": "document_missing_exception"})
+                _merge(docs.setdefault(doc_id, {}), request.get("doc", {}))
+                return 200, json.dumps({"_id": doc_id, "result": "updated"})
+            if doc_id not in docs:
+                return 404, json.dumps({"_id": doc_id, "found": False})
+            if method == "DELETE":
+                del docs[doc_id]
+                return 200, json.dumps({"_id": doc_id, "result": "deleted"})
+            return 200, json.dumps(
+                {"_index": index, "_id": doc_id, "found": True, "_source": docs[doc_id]}
+            )
+
+    def _search(self, index: str, request: dict[str, Any]) -> tuple[int, str]:
+        query = request["query"]
+        clauses = query["bool"]["must"] if "bool" in query else [query]
+        owner_id = next(c["term"]["owner_id"] for c in clauses if "term" in c)
+        words = [
+            word
+            for c in clauses if "match" in c
+            for word in c["match"]["card_name"].lower().split()
+        ]
+        hits = [
+            (doc_id, doc) for doc_id, doc in self.docs.get(index, {}).items()
+            if doc["owner_id"] == owner_id
+            and (not words or any(w in doc["card_name"].lower().split() for w in words))
+        ]
+        for clause in reversed(request.get("sort", [])):
+            (field, spec), = clause.items()
+            present = [hit for hit in hits if field in hit[1]]
+            present.sort(key=lambda hit: hit[1][field], reverse=spec["order"] == "desc")
+            hits = present + [hit for hit in hits if field not in hit[1]]
+        return 200, json.dumps({"hits": {"hits": [
+            {"_id": doc_id, "_source": doc} for doc_id, doc in hits[: request.get("size", 10)]
+        ]}})
+
+    def _bulk(self, payload: str) -> tuple[int, str]:
+        lines = [json.loads(line) for line in payload.splitlines() if line.strip()]
+        items = []
+        for action, source in zip(lines[::2], lines[1::2]):
+            (op, meta), = action.items()
+            doc_id = meta["_id"]
+            docs = self.docs.setdefault(meta["_index"], {})
+            if op == "create" and doc_id in docs:
+                items.append({op: {"_id": doc_id, "status": 409, "error": {"type": "version_conflict_engine_exception", "reason": "exists"}}})
+                continue
+            if op == "create":
+                docs[doc_id] = source
+            elif doc_id not in docs:
+                items.append({op: {"_id": doc_id, "status": 404, "error": {"type": "document_missing_exception", "reason": "missing"}}})
+                continue
+            elif self.conflicts.get(doc_id, 0) > meta.get("retry_on_conflict", 0):
+                self.conflicts[doc_id] -= meta.get("retry_on_conflict", 0) + 1
+                items.append({op: {
+                    "_id": doc_id, "status": 409,
+                    "error": {"type": "version_conflict_engine_exception"},
+                }})
+                continue
+            else:
+                self.conflicts.pop(doc_id, None)
+                params = source["script"]["params"]
+                doc = docs[doc_id]
+                doc["use_count"] = doc.get("use_count", 0) + params["n"]
+                doc["last_used"] = max(doc.get("last_used", 0), params["t"])
+            items.append({op: {"_id": doc_id, "status": 201 if op == "create" else 200}})
+        return 200, json.dumps({"errors": False, "items": items})
+
+def _merge(target: dict, patch: dict) -> None:
+    for key, value in patch.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            _merge(target[key], value)
+        else:
+            target[key] = value
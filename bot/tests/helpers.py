@@ -0,0 +1,92 @@
+"""Builders for Telegram objects used across tests."""
+
+from __future__ import annotations
+
+import datetime as dt
+import itertools
+import json
+from typing import Any
+
+from telegram import Bot, CallbackQuery, Chat, Message, Update, User
+from telegram.ext import Application, ApplicationBuilder
+from telegram.request import BaseRequest
+
+_ids = itertools.count(1)
+_DATE = dt.datetime(2024, 1, 1, tzinfo=dt.timezone.utc)
+
+
+def chat(chat_id: int) -> Chat:
+    return Chat(chat_id, Chat.PRIVATE if chat_id > 0 else Chat.GROUP)
+
+
+def text_update(chat_id: int, user_id: int, text: str) -> Update:
+    """A text message from *user_id* in *chat_id* (negative ids are groups)."""
+    message = Message(
+        next(_ids), _DATE, chat(chat_id), from_user=User(user_id, f"user{user_id}", False),
+        text=text,
+    )
+    return Update(next(_ids), message=message)
+
+
+def callback_update(chat_id: int, user_id: int, data: str) -> Update:
+    """A button press carrying *data*."""
+    user = User(user_id, f"user{user_id}", False)
+    message = Message(next(_ids), _DATE, chat(chat_id), from_user=user, text="menu")
+    query = CallbackQuery(str(next(_ids)), user, "instance", message=message, data=data)
+    return Update(next(_ids), callback_query=query)
+
+
+def with_bot(update: Update, bot: Bot) -> Update:
+    """*update* with *bot* attached, so shortcuts like ``query.answer()`` work."""
+    return Update.de_json(update.to_dict(), bot)
+
+
+class OfflineRequest(BaseRequest):
+    """Bot API transport that answers locally and records every call."""
+
+    def __init__(self) -> None:
+        self.calls: list[tuple[str, dict[str, Any]]] = []
+
+    @property
+    def read_timeout(self) -> float:
+        return 1.0
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    async def do_request(self, url: str, method: str, request_data=None, **_: Any):
+        endpoint = url.rsplit("/", 1)[-1]
+        params = request_data.parameters if request_data else {}
+        self.calls.append((endpoint, params))
+        if endpoint == "getMe":
+            result: Any = {
+                "id": 123456, "is_bot": True, "first_name": "Test", "username": "test_bot",
+            }
+        elif endpoint in ("sendMessage", "editMessageText", "sendPhoto", "sendDocument"):
+            result = {
+                "message_id": len(self.calls),
+                "date": int(_DATE.timestamp()),
+                "chat": {"id": params.get("chat_id", 1), "type": "private"},
+                "text": params.get("text", ""),
+            }
+            if endpoint == "sendPhoto":
+                n = len(self.calls)
+                result["photo"] = [
+                    {"file_id": f"photo{n}", "file_unique_id": f"u{n}", "width": 1, "height": 1}
+                ]
+        else:
+            result = True
+        return 200, json.dumps({"ok": True, "result": result}).encode()
+
+
+async def offline_application(
+    builder: ApplicationBuilder | None = None, request: OfflineRequest | None = None,
+) -> tuple[Application, OfflineRequest]:
+    """An initialized ``Application`` whose Bot API calls never leave the process."""
+    request = request or OfflineRequest()
+    app = (builder or ApplicationBuilder()).token("123456:TEST").request(request).build()
+    await app.initialize()
+    return app, request
@@ -0,0 +1,282 @@
+"""Mini App API: initData authentication, owners and card endpoints."""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import hashlib
+import hmac
+import json
+import time
+import urllib.parse
+from typing import Any
+
+import orjson
+import pytest
+from tornado.httpclient import AsyncHTTPClient, HTTPRequest, HTTPResponse
+from tornado.httpserver import HTTPServer
+from tornado.netutil import bind_sockets
+
+from app import api
+from app.api import make_web_app
+from app.config import TELEGRAM_BOT_TOKEN
+from app.services.opensearch_client import INDEX_NAME, card_doc_id
+from app.services.render_cache import RenderCache
+from app.services.resilience import StorageUnavailable
+from bench.load_images import init_data
+from fake_opensearch import FakeCluster
+from helpers import OfflineRequest, offline_application
+
+OWNER = 42
+STRANGER = 43
+GROUP = -100
+CODE = "4006381333931"
+ORIGIN = "https://cards.example.com"
+
+
+class MembershipRequest(OfflineRequest):
+    """Answers ``getChatMember``: *OWNER* is in *GROUP*, nobody else is."""
+
+    async def do_request(self, url: str, method: str, request_data=None, **kwargs: Any):
+        if url.endswith("/getChatMember"):
+            params = request_data.parameters
+            self.calls.append(("getChatMember", params))
+            if params["chat_id"] != GROUP:
+                return 400, json.dumps({
+                    "ok": False, "error_code": 400, "description": "Bad Request: chat not found",
+                }).encode()
+            status = "member" if params["user_id"] == OWNER else "left"
+            result = {"status": status, "user": {"id": params["user_id"], "is_bot": False,
+                                                 "first_name": "U"}}
+            return 200, json.dumps({"ok": True, "result": result}).encode()
+        return await super().do_request(url, method, request_data, **kwargs)
+
+
+@pytest.fixture
+def cluster():
+    return FakeCluster()
+
+
+@pytest.fixture
+def store(cluster):
+    return cluster.opensearch_client()
+
+
+@pytest.fixture(autouse=True)
+def _allowed_origin(monkeypatch):
+    monkeypatch.setattr(api, "API_ALLOWED_ORIGINS", frozenset({ORIGIN}))
+    monkeypatch.setattr("app.handlers.cards.RENDER_CACHE_CHAT_ID", 0)
+
+
+def auth(user_id: int = OWNER) -> dict[str, str]:
+    return {"Authorization": f"tma {init_data(user_id)}"}
+
+
+@contextlib.asynccontextmanager
+async def serve(store, tmp_path):
+    """Run the API on a local port; yield ``fetch(method, path, ...)``."""
+    app, _ = await offline_application(request=MembershipRequest())
+    app.bot_data["os_client"] = store
+    await app.start()
+    cache = RenderCache(tmp_path, 16 * 1024 * 1024, TELEGRAM_BOT_TOKEN.encode())
+    sockets = bind_sockets(0, "127.0.0.1")
+    server = HTTPServer(make_web_app(app, cache))
+    server.add_sockets(sockets)
+    base = f"http://127.0.0.1:{sockets[0].getsockname()[1]}"
+    client = AsyncHTTPClient(force_instance=True)
+
+    async def fetch(
+        method: str, path: str, body: Any = None, headers: dict[str, str] | None = None,
+    ) -> HTTPResponse:
+        if body is not None and not isinstance(body, bytes):
+            body = orjson.dumps(body)
+        request = HTTPRequest(
+            base + path, method=method, body=body, headers=auth() if headers is None else headers,
+            follow_redirects=False, allow_nonstandard_methods=True,
+        )
+        return await client.fetch(request, raise_error=False)
+
+    try:
+        yield fetch
+    finally:
+        client.close()
+        server.stop()
+        await server.close_all_connections()
+        await app.stop()
+        await app.shutdown()
+
+
+def run(store, tmp_path, scenario) -> None:
+    async def main() -> None:
+        async with serve(store, tmp_path) as fetch:
+            await scenario(fetch)
+
+    asyncio.run(main())
+
+
+def body(response: HTTPResponse) -> Any:
+    return json.loads(response.body)
+
+
+# =====================================================================
+#  Authentication
+# =====================================================================
+
+def signed(fields: dict[str, str]) -> str:
+    """initData with *fields* replaced, signed with the bot token."""
+    data = dict(urllib.parse.parse_qsl(init_data(OWNER)))
+    data.pop("hash")
+    data.update(fields)
+    check = "\n".join(f"{key}={data[key]}" for key in sorted(data))
+    secret = hmac.new(b"WebAppData", TELEGRAM_BOT_TOKEN.encode(), hashlib.sha256).digest()
+    data["hash"] = hmac.new(secret, check.encode(), hashlib.sha256).hexdigest()
+    return urllib.parse.urlencode(data)
+
+
+@pytest.mark.parametrize("headers, error", [
+    ({}, "Missing Mini App initData"),
+    ({"Authorization": "Bearer abc"}, "Missing Mini App initData"),
+    ({"Authorization": "tma " + init_data(OWNER).replace("Load", "Evil")},
+     "Bad initData signature"),
+    ({"Authorization": "tma " + init_data(OWNER, "654321:OTHER")}, "Bad initData signature"),
+    ({"Authorization": "tma " + signed({"auth_date": str(int(time.time()) - 2 * 86400)})},
+     "initData expired"),
+    ({"Authorization": "tma " + signed({"user": "{}"})}, "Incomplete initData"),
+])
+def test_requests_without_valid_init_data_are_rejected(store, tmp_path, headers, error):
+    async def scenario(fetch) -> None:
+        response = await fetch("GET", "/api/cards", headers=headers)
+        assert response.code == 401
+        assert body(response) == {"error": error}
+
+    run(store, tmp_path, scenario)
+
+
+def test_cors_preflight_needs_no_auth_and_echoes_allowed_origins(store, tmp_path):
+    async def scenario(fetch) -> None:
+        preflight = await fetch("OPTIONS", "/api/cards", headers={"Origin": ORIGIN})
+        assert preflight.code == 204
+        assert preflight.headers["Access-Control-Allow-Origin"] == ORIGIN
+        assert "Authorization" in preflight.headers["Access-Control-Allow-Headers"]
+
+        other = await fetch("GET", "/api/cards", headers={**auth(), "Origin": "https://evil"})
+        assert other.code == 200
+        assert "Access-Control-Allow-Origin" not in other.headers
+
+    run(store, tmp_path, scenario)
+
+
+# =====================================================================
+#  Owners
+# =====================================================================
+
+def test_cards_belong_to_the_signed_user(store, cluster, tmp_path):
+    mine, _ = store.add_card(OWNER, "Shop", CODE, "ean13")
+    theirs, _ = store.add_card(STRANGER, "Bakery", "96385074", "ean8")
+
+    async def scenario(fetch) -> None:
+        listing = body(await fetch("GET", "/api/cards"))
+        assert [card["id"] for card in listing["cards"]] == [mine]
+        for method, path in (
+            ("GET", f"/api/cards/{theirs}"),
+            ("GET", f"/api/cards/{theirs}/barcode.svg"),
+            ("DELETE", f"/api/cards/{theirs}"),
+        ):
+            response = await fetch(method, path)
+            assert response.code == 404, path
+            assert body(response) == {"error": "Card not found"}
+
+    run(store, tmp_path, scenario)
+    assert theirs in cluster.docs[INDEX_NAME]
+
+
+def test_group_cards_need_membership(store, tmp_path):
+    group_card, _ = store.add_card(GROUP, "Family shop", CODE, "ean13")
+
+    async def scenario(fetch) -> None:
+        member = await fetch("GET", f"/api/cards?chat_id={GROUP}")
+        assert [card["id"] for card in body(member)["cards"]] == [group_card]
+
+        outsider = await fetch("GET", f"/api/cards?chat_id={GROUP}", headers=auth(STRANGER))
+        assert outsider.code == 403
+        unknown = await fetch("GET", f"/api/cards?chat_id={GROUP - 1}")
+        assert unknown.code == 403
+        bad = await fetch("GET", "/api/cards?chat_id=family")
+        assert body(bad) == {"error": "Bad chat_id"}
+
+    run(store, tmp_path, scenario)
+
+
+# =====================================================================
+#  Cards
+# =====================================================================
+
+def test_create_read_and_delete_a_card(store, cluster, tmp_path):
+    new = {"card_name": "Shop", "card_code": CODE, "barcode_format": "EAN13"}
+
+    async def scenario(fetch) -> None:
+        created = await fetch("POST", "/api/cards", new)
+        assert created.code == 201
+        card = body(created)["card"]
+        assert card["id"] == card_doc_id(OWNER, CODE, "ean13")
+        assert card["format_label"] == "EAN-13"
+        assert body(created)["pending"] is False
+
+        again = await fetch("POST", "/api/cards", {**new, "card_name": "Other"})
+        assert again.code == 200
+        assert body(again)["created"] is False
+        assert body(again)["card"]["card_name"] == "Shop"
+
+        shown = body(await fetch("GET", f"/api/cards/{card['id']}"))
+        assert shown["card"]["card_name"] == "Shop"
+        image = await fetch("GET", shown["image_url"], headers={})
+        assert image.code == 200
+        assert image.headers["Content-Type"] == "image/svg+xml"
+
+        redirect = await fetch("GET", f"/api/cards/{card['id']}/barcode.png?profile=print")
+        assert redirect.code == 303
+        assert redirect.headers["Location"].endswith(".png")
+        bad_profile = await fetch("GET", f"/api/cards/{card['id']}/barcode.png?profile=poster")
+        assert body(bad_profile) == {"error": "Unknown render profile"}
+
+        assert (await fetch("DELETE", f"/api/cards/{card['id']}")).code == 204
+        assert (await fetch("GET", f"/api/cards/{card['id']}")).code == 404
+
+    run(store, tmp_path, scenario)
+    assert cluster.docs[INDEX_NAME] == {}
+
+
+@pytest.mark.parametrize("payload, error", [
+    (b"not json", "Expected a JSON object"),
+    (b"[1, 2]", "Expected a JSON object"),
+    ({"card_name": "", "card_code": CODE, "barcode_format": "ean13"},
+     "Card name must be 1-100 characters."),
+    ({"card_name": "x" * 101, "card_code": CODE, "barcode_format": "ean13"},
+     "Card name must be 1-100 characters."),
+    ({"card_name": "Shop", "card_code": "4006381333932", "barcode_format": "ean13"},
+     "EAN-13 check digit is wrong."),
+    ({"card_name": "Shop", "card_code": CODE, "barcode_format": "maxicode"},
+     "Unknown format: maxicode"),
+])
+def test_invalid_cards_are_rejected(store, cluster, tmp_path, payload, error):
+    async def scenario(fetch) -> None:
+        response = await fetch("POST", "/api/cards", payload)
+        assert response.code == 400
+        assert body(response) == {"error": error}
+
+    run(store, tmp_path, scenario)
+    assert cluster.writes() == []
+
+
+def test_storage_outage_is_a_503_with_retry_after(store, tmp_path, monkeypatch):
+    def unavailable(*args):
+        raise StorageUnavailable("OpenSearch is unavailable")
+
+    monkeypatch.setattr(store, "get_cards", unavailable)
+
+    async def scenario(fetch) -> None:
+        response = await fetch("GET", "/api/cards")
+        assert response.code == 503
+        assert response.headers["Retry-After"] == "10"
+
+    run(store, tmp_path, scenario)
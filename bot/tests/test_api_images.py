@@ -0,0 +1,16 @@
+"""Image endpoints under concurrent load (a small run of ``bench.load_images``)."""
+
+from __future__ import annotations
+
+import asyncio
+
+from bench.load_images import run_load
+
+
+def test_concurrent_card_opens_render_each_image_once():
+    result = asyncio.run(run_load(requests=300, concurrency=30, cards=5))
+
+    assert set(result.statuses) <= {200, 303, 304}
+    assert result.statuses[303] == 300
+    assert result.statuses[304] > 0
+    assert result.renders == result.images
@@ -0,0 +1,89 @@
+"""QR version / error-correction choice and 1-bit image output."""
+
+from __future__ import annotations
+
+import io
+
+import pytest
+import qrcode
+from PIL import Image
+from qrcode.constants import ERROR_CORRECT_H, ERROR_CORRECT_L, ERROR_CORRECT_M
+
+from app.services.barcode_generator import (
+    QR_BORDER,
+    RENDER_PROFILES,
+    _qr_matrix,
+    render_barcode,
+)
+
+
+def qr_rows(code: str, version: int, level: int) -> tuple[bytes, ...]:
+    qr = qrcode.QRCode(version=version, error_correction=level, border=0)
+    qr.add_data(code)
+    qr.make(fit=False)
+    return tuple(bytes(row) for row in qr.get_matrix())
+
+
+def png_bit_depth(data: bytes) -> int:
+    assert data[:8] == b"\x89PNG\r\n\x1a\n"
+    return data[24]  # IHDR bit depth
+
+
+def test_short_code_gets_the_smallest_version_and_highest_level():
+    # Ten digits fit version 1 even at level H.
+    rows = _qr_matrix("4006381333")
+    assert len(rows) == 21
+    assert rows == qr_rows("4006381333", 1, ERROR_CORRECT_H)
+
+
+def test_level_is_lowered_rather_than_growing_the_symbol():
+    # 20 alphanumerics fit version 1 at L and M, not at Q or H.
+    code = "ABCDEFGHIJKLMNOPQRST"
+    rows = _qr_matrix(code)
+    assert len(rows) == 21
+    assert rows == qr_rows(code, 1, ERROR_CORRECT_M)
+
+
+def test_version_is_chosen_at_level_l():
+    code = "https://example.com/loyalty/0123456789"
+    fit = qrcode.QRCode(error_correction=ERROR_CORRECT_L, border=0)
+    fit.add_data(code)
+    fit.make(fit=True)
+    assert len(_qr_matrix(code)) == 17 + 4 * fit.version
+
+
+@pytest.mark.parametrize("code, barcode_format", [
+    ("4006381333931", "ean13"),
+    ("LOYALTY-42", "code128"),
+    ("4006381333931", "qrcode"),
+])
+def test_png_is_one_bit(code, barcode_format):
+    data = render_barcode(code, barcode_format, "png")
+    assert png_bit_depth(data) == 1
+    assert set(Image.open(io.BytesIO(data)).convert("L").getdata()) <= {0, 255}
+
+
+def test_qr_modules_are_whole_pixels_with_a_quiet_zone():
+    modules = 21 + 2 * QR_BORDER
+    for profile, settings in RENDER_PROFILES.items():
+        img = Image.open(io.BytesIO(render_barcode("4006381333", "qrcode", "png", profile)))
+        scale = settings["qr_px"] // modules
+        assert img.size == (modules * scale, modules * scale)
+        pixels = img.convert("L").load()
+        # The quiet zone is white, the finder pattern's corner dark.
+        assert pixels[QR_BORDER * scale - 1, QR_BORDER * scale - 1] == 255
+        assert pixels[QR_BORDER * scale, QR_BORDER * scale] == 0
+
+
+def test_svg_and_webp_outputs():
+    svg = render_barcode("4006381333", "qrcode", "svg").decode()
+    assert svg.startswith("<svg") and f'viewBox="0 0 {21 + 2 * QR_BORDER} ' in svg
+    webp = Image.open(io.BytesIO(render_barcode("4006381333", "qrcode", "webp")))
+    assert webp.format == "WEBP"
+
+
+def test_unknown_image_format_or_profile_is_rejected():
+    with pytest.raises(ValueError):
+        render_barcode("4006381333", "qrcode", "gif")
+    with pytest.raises(ValueError):
+        render_barcode("4006381333", "qrcode", "png", "poster")
@@ -0,0 +1,60 @@
+"""``callback_data`` codec and router."""
+
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from app.handlers import callbacks as cb
+from helpers import callback_update
+
+CARD_ID = "AbCdEfGhIjKlMnOpQrSt"
+
+
+@pytest.mark.parametrize("fields", [
+    (),
+    (CARD_ID,),
+    (CARD_ID, "scanner"),
+    (0, -1, 300, 2**40),
+    ("back",),
+])
+def test_round_trip(fields):
+    data = cb.encode(cb.SHOW_CARD, *fields)
+    assert len(data.encode()) <= 64
+    assert cb.decode(data) == (cb.SHOW_CARD, list(fields))
+
+
+def test_card_button_is_shorter_than_the_plain_format():
+    assert len(cb.encode(cb.SHOW_CARD, CARD_ID)) < len(f"card:show:{CARD_ID}")
+
+
+def test_rejects_oversized_and_foreign_data():
+    with pytest.raises(ValueError):
+        cb.encode(cb.MENU, "x" * 60)
+    with pytest.raises(ValueError):
+        cb.decode("S!!!")
+    with pytest.raises(ValueError):
+        cb.decode("S" + cb._b64encode(bytes([cb.CALLBACK_VERSION + 1])))
+
+
+def test_router_dispatches_tags_and_legacy_prefixes():
+    calls = []
+
+    async def show(update, context, *fields):
+        calls.append(("show", fields))
+
+    async def menu(update, context, *fields):
+        calls.append(("menu", fields))
+
+    router = cb.CallbackRouter()
+    router.route(cb.SHOW_CARD, show)
+    router.legacy("card:show", show)
+    router.legacy("menu", menu)
+
+    async def main() -> None:
+        for data in (cb.encode(cb.SHOW_CARD, CARD_ID), f"card:show:{CARD_ID}", "menu:back"):
+            await router.dispatch(callback_update(1, 1, data), None)  # type: ignore[arg-type]
+
+    asyncio.run(main())
+    assert calls == [("show", (CARD_ID,)), ("show", (CARD_ID,)), ("menu", ("back",))]
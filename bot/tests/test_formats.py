@@ -0,0 +1,93 @@
+"""The format registry and the symbologies it covers."""
+
+from __future__ import annotations
+
+import io
+import re
+from collections import Counter
+
+import pytest
+from PIL import Image
+
+from app.services.barcode_generator import SUPPORTED_FORMATS, render_barcode, validate_code
+from app.services.formats import FALLBACK_FORMAT, FORMATS, from_decoder_name, from_webapp_name
+
+# A valid code for every registered format.
+SAMPLES = {
+    "ean13": "4006381333931",
+    "ean8": "96385074",
+    "upca": "036000291452",
+    "code128": "Loyalty-42",
+    "code39": "CARD 42",
+    "itf": "12345678",
+    "qrcode": "https://example.com/card/42",
+    "datamatrix": "CARD-42",
+    "pdf417": "CARD-42 MEMBER 0042",
+    "aztec": "CARD-42",
+}
+
+
+def test_every_format_has_a_sample():
+    assert set(SAMPLES) == set(FORMATS)
+    assert SUPPORTED_FORMATS == {key: fmt.label for key, fmt in FORMATS.items()}
+
+
+@pytest.mark.parametrize("barcode_format", sorted(SAMPLES))
+def test_every_format_validates_and_renders(barcode_format):
+    code = SAMPLES[barcode_format]
+    assert validate_code(code, barcode_format) == (True, "")
+    png = Image.open(io.BytesIO(render_barcode(code, barcode_format, "png")))
+    assert png.width > 0 and png.height > 0
+    assert render_barcode(code, barcode_format, "svg").lstrip().startswith(b"<")
+
+
+@pytest.mark.parametrize("names", ["decoder_names", "webapp_names"])
+def test_scanner_names_map_to_one_format_each(names):
+    counts = Counter(name for fmt in FORMATS.values() for name in getattr(fmt, names))
+    assert [name for name, n in counts.items() if n > 1] == []
+
+
+@pytest.mark.parametrize("decoder_name, webapp_name, key", [
+    ("EAN8", "EAN_8", "ean8"),  # no longer folded into EAN-13
+    ("CODE39", "CODE_39", "code39"),  # no longer folded into Code 128
+    ("UPCA", "UPC_A", "upca"),
+    ("I25", "ITF", "itf"),
+    ("DATAMATRIX", "DATA_MATRIX", "datamatrix"),
+    ("PDF417", "PDF_417", "pdf417"),
+    ("AZTEC", "AZTEC", "aztec"),
+])
+def test_scanner_names(decoder_name, webapp_name, key):
+    assert from_decoder_name(decoder_name) == key
+    assert from_webapp_name(webapp_name) == key
+
+
+def test_unknown_scanner_names_fall_back():
+    assert from_decoder_name("CODABAR") == FALLBACK_FORMAT
+    assert from_webapp_name("MAXICODE") == FALLBACK_FORMAT
+
+
+@pytest.mark.parametrize("code, barcode_format, error", [
+    ("4006381333932", "ean13", "EAN-13 check digit is wrong."),
+    ("400638133393", "ean13", ""),  # check digit added when rendering
+    ("9638507", "ean8", ""),
+    ("96385075", "ean8", "EAN-8 check digit is wrong."),
+    ("03600029145A", "upca", "UPC-A codes must contain only digits."),
+    ("card 42", "code39", "Code 39 codes may only use A-Z, 0-9, space and - . $ / + %."),
+    ("1234567", "itf", "ITF codes must have an even number of digits."),
+    ("café", "code128", "Code 128 codes must be plain ASCII."),
+    ("", "qrcode", "Code cannot be empty."),
+])
+def test_validators(code, barcode_format, error):
+    assert validate_code(code, barcode_format) == (not error, error)
+
+
+def test_unknown_format_is_rejected():
+    assert validate_code("123", "maxicode") == (False, "Unknown format: maxicode")
+    with pytest.raises(ValueError):
+        render_barcode("123", "maxicode")
+
+
+def test_code39_is_rendered_without_a_check_character():
+    # With the optional check character the label would read "CARD 42K".
+    svg = render_barcode("CARD 42", "code39", "svg").decode()
+    assert re.findall(r"<text[^>]*>([^<]*)<", svg) == ["CARD 42"]
@@ -0,0 +1,119 @@
+"""``UserDataLRU`` under a long stream of distinct users."""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import random
+import tracemalloc
+
+from telegram import Update
+from telegram.ext import ConversationHandler, MessageHandler, TypeHandler, filters
+
+from app.memory import UserDataLRU, memory_report
+from helpers import offline_application, text_update
+
+USERS = 100_000
+MAX_USERS = 1_000
+IDLE_SECONDS = 900.0
+# Memory is traced over the last TRACED_USERS users, long after the store
+# filled up; keeping their ``user_data`` would take several megabytes.
+TRACED_USERS = 30_000
+MAX_GROWTH_BYTES = 1024 * 1024
+
+
+async def remember(update: Update, context) -> None:
+    context.user_data["scan_target_chat"] = update.effective_chat.id
+    context.user_data["last_text"] = update.effective_message.text
+
+
+def test_soak_100k_users_keeps_user_data_bounded():
+    async def main() -> None:
+        app, _ = await offline_application()
+        # One simulated second per update: users go idle long before the
+        # store is full, as they would in a real stream.
+        clock = itertools.count()
+        lru = UserDataLRU(app, MAX_USERS, IDLE_SECONDS, clock=lambda: next(clock))
+        app.add_handler(TypeHandler(Update, lru.touch), group=-1)
+        app.add_handler(MessageHandler(filters.TEXT, remember))
+
+        rng = random.Random(35)
+        regulars = range(1, 51)
+        returning = 0
+        peak = 0
+        baseline = 0
+        for user_id in range(1, USERS + 1):
+            if user_id == USERS - TRACED_USERS:
+                tracemalloc.start()
+                baseline = tracemalloc.get_traced_memory()[0]
+            await app.process_update(text_update(user_id, user_id, "hi"))
+            if user_id % 10 == 0:
+                returning = rng.choice(regulars)
+                await app.process_update(text_update(returning, returning, "again"))
+            peak = max(peak, len(app.user_data))
+        growth = tracemalloc.get_traced_memory()[0] - baseline
+        tracemalloc.stop()
+
+        assert growth < MAX_GROWTH_BYTES
+        assert peak <= MAX_USERS + 1
+        assert len(app.user_data) <= MAX_USERS
+        assert len(lru) == MAX_USERS
+        # Regulars evicted between visits are counted again when they leave.
+        assert lru.evicted >= USERS - MAX_USERS
+        assert not app._user_ids_to_be_deleted_in_persistence
+        assert len(app._user_ids_to_be_updated_in_persistence) <= 1
+        assert len(app._chat_ids_to_be_updated_in_persistence) <= 1
+        # The most recently active users keep their data.
+        assert app.user_data[USERS]["last_text"] == "hi"
+        assert app.user_data[returning]["last_text"] == "again"
+        report = memory_report(app)
+        assert report.users <= MAX_USERS
+        await app.shutdown()
+
+    asyncio.run(main())
+
+
+ASKING = 0
+
+
+async def start(update: Update, context) -> int:
+    context.user_data["draft"] = "half-entered card"
+    return ASKING
+
+
+async def finish(update: Update, context) -> int:
+    context.user_data["saved"] = context.user_data.pop("draft")
+    return ConversationHandler.END
+
+
+def test_users_within_the_conversation_timeout_are_not_evicted():
+    async def main() -> None:
+        app, _ = await offline_application()
+        now = [0.0]
+        lru = UserDataLRU(app, 2, IDLE_SECONDS, clock=lambda: now[0])
+        app.add_handler(TypeHandler(Update, lru.touch), group=-1)
+        app.add_handler(ConversationHandler(
+            entry_points=[MessageHandler(filters.Text(["add"]), start)],
+            states={ASKING: [MessageHandler(filters.TEXT, finish)]},
+            fallbacks=[],
+        ))
+        app.add_handler(MessageHandler(filters.TEXT, remember), group=1)
+
+        await app.process_update(text_update(1, 1, "add"))
+        for user_id in (2, 3, 4):
+            now[0] += 60
+            await app.process_update(text_update(user_id, user_id, "hi"))
+        # User 1 is the least recently active but still mid-conversation.
+        assert len(lru) == 4
+        assert lru.evicted == 0
+        await app.process_update(text_update(1, 1, "Corner shop"))
+        assert app.user_data[1]["saved"] == "half-entered card"
+
+        # Once everyone has gone idle the store shrinks back to the limit.
+        now[0] += IDLE_SECONDS
+        await app.process_update(text_update(5, 5, "hi"))
+        assert len(lru) == 2
+        assert sorted(app.user_data) == [1, 5]
+        await app.shutdown()
+
+    asyncio.run(main())
@@ -0,0 +1,81 @@
+"""``GroupDigest``: immediate first notice, batching and escaping."""
+
+from __future__ import annotations
+
+import asyncio
+
+from app.notifications import AddedCard, GroupDigest, format_digest
+from helpers import offline_application
+
+GROUP = -100
+WINDOW = 0.2
+
+
+def card(name: str, user: str = "Ann", code: str = "4006381333931") -> AddedCard:
+    return AddedCard(user_name=user, card_name=name, card_code=code, format_label="EAN-13")
+
+
+def sent(request) -> list[str]:
+    return [params["text"] for endpoint, params in request.calls if endpoint == "sendMessage"]
+
+
+def test_first_card_is_sent_at_once_and_the_rest_batched():
+    async def main() -> None:
+        app, request = await offline_application()
+        await app.start()
+        digest = GroupDigest(app, WINDOW)
+
+        digest.add(GROUP, card("Bakery"))
+        await asyncio.sleep(WINDOW / 5)
+        assert len(sent(request)) == 1
+        assert "*Bakery*" in sent(request)[0]
+
+        digest.add(GROUP, card("Shop"))
+        digest.add(GROUP, card("Pharmacy", user="Bob"))
+        await asyncio.sleep(WINDOW / 5)
+        assert len(sent(request)) == 1  # held until the window closes
+
+        await asyncio.sleep(WINDOW * 1.5)
+        assert len(sent(request)) == 2
+        batch = sent(request)[1]
+        assert batch.startswith("\U0001f4e5 *2 new cards* added via scanner by Ann, Bob:")
+        assert "*Shop*" in batch and "*Pharmacy*" in batch
+
+        # A quiet window closes the batch; the next card goes out at once.
+        await asyncio.sleep(WINDOW * 1.5)
+        digest.add(GROUP, card("Cinema"))
+        await asyncio.sleep(WINDOW / 5)
+        assert len(sent(request)) == 3
+        assert "*Cinema*" in sent(request)[2]
+        await app.stop()
+        await app.shutdown()
+
+    asyncio.run(main())
+
+
+def test_groups_are_batched_separately():
+    async def main() -> None:
+        app, request = await offline_application()
+        await app.start()
+        digest = GroupDigest(app, WINDOW)
+        digest.add(GROUP, card("Bakery"))
+        digest.add(GROUP - 1, card("Shop"))
+        await asyncio.sleep(WINDOW / 5)
+        chats = [params["chat_id"] for endpoint, params in request.calls
+                 if endpoint == "sendMessage"]
+        assert sorted(chats) == [GROUP - 1, GROUP]
+        await app.stop()
+        await app.shutdown()
+
+    asyncio.run(main())
+
+
+def test_names_are_escaped():
+    text = format_digest([card("my_shop*", user="[admin]", code="A`1")])
+    assert "\\[admin]" in text
+    assert "*my\\_shop\\**" in text
+    assert "`A'1`" in text
+
+    text = format_digest([card("a_b"), card("c", user="x_y")])
+    assert "*a\\_b*" in text
+    assert "by Ann, x\\_y:" in text
@@ -0,0 +1,152 @@
+"""``OpenSearchClient`` card writes against the fake cluster."""
+
+from __future__ import annotations
+
+import asyncio
+import re
+
+import pytest
+from opensearchpy import ConflictError
+from telegram.ext import CallbackContext, CallbackQueryHandler
+
+from app.handlers import callbacks as cb
+from app.handlers import cards
+from app.services import opensearch_client
+from app.services.opensearch_client import DUPLICATE_CARD, INDEX_NAME, card_doc_id
+from fake_opensearch import FakeCluster
+from helpers import callback_update, offline_application, with_bot
+
+OWNER = 42
+CODE = "4006381333931"
+
+
+@pytest.fixture
+def cluster():
+    return FakeCluster()
+
+
+@pytest.fixture
+def store(cluster):
+    return cluster.opensearch_client()
+
+
+# =====================================================================
+#  Deterministic ids and create-only writes
+# =====================================================================
+
+def test_card_ids_are_deterministic_and_short():
+    card_id = card_doc_id(OWNER, CODE, "ean13")
+    assert card_id == card_doc_id(OWNER, CODE, "ean13")
+    assert re.fullmatch(r"[A-Za-z0-9_-]{20}", card_id)
+    assert len({
+        card_id,
+        card_doc_id(OWNER + 1, CODE, "ean13"),
+        card_doc_id(OWNER, CODE, "qrcode"),
+        card_doc_id(OWNER, CODE[:-1], "ean13"),
+    }) == 4
+
+
+def test_saving_a_card_twice_keeps_one_document(store, cluster):
+    card_id, existing = store.add_card(OWNER, "Shop", CODE, "ean13")
+    assert existing is None
+    assert card_id == card_doc_id(OWNER, CODE, "ean13")
+
+    again_id, existing = store.add_card(OWNER, "Corner shop", CODE, "ean13")
+    assert again_id == card_id
+    assert existing.card_name == "Shop"
+    assert list(cluster.docs[INDEX_NAME]) == [card_id]
+    # Only create operations: a retried save never overwrites.
+    assert {path.split("/")[2] for _, path in cluster.writes()} == {"_create"}
+
+
+def test_same_code_for_another_owner_is_a_separate_card(store, cluster):
+    store.add_card(OWNER, "Shop", CODE, "ean13")
+    _, existing = store.add_card(-OWNER, "Shop", CODE, "ean13")
+    assert existing is None
+    assert len(cluster.docs[INDEX_NAME]) == 2
+
+
+def test_bulk_import_reports_duplicates(store, cluster):
+    store.add_card(OWNER, "Shop", CODE, "ean13")
+    rows = [
+        {"card_name": "Shop again", "card_code": CODE, "barcode_format": "ean13"},
+        {"card_name": "Bakery", "card_code": "96385074", "barcode_format": "ean8"},
+        {"card_name": "Bakery twice", "card_code": "96385074", "barcode_format": "ean8"},
+    ]
+    assert store.bulk_add_cards(OWNER, rows) == [DUPLICATE_CARD, None, DUPLICATE_CARD]
+    assert sorted(doc["card_name"] for doc in cluster.docs[INDEX_NAME].values()) == [
+        "Bakery", "Shop",
+    ]
+
+
+def _answer_duplicate_prompt(store, card_id: str, new_name: str, *fields: str) -> list[str]:
+    """Show the duplicate prompt, press one of its buttons; return the texts."""
+
+    async def main() -> list[str]:
+        app, request = await offline_application()
+        app.bot_data["os_client"] = store
+        router = cb.CallbackRouter()
+        router.route(cb.RENAME_CARD, cards.rename_card_cb)
+        app.add_handler(CallbackQueryHandler(router.dispatch))
+
+        update = with_bot(callback_update(OWNER, OWNER, "menu"), app.bot)
+        context = CallbackContext.from_update(update, app)
+        existing = store.get_card(card_id)
+        text, kb = cards.duplicate_prompt(context, card_id, OWNER, existing, new_name)
+        button = next(
+            b.callback_data for row in kb.inline_keyboard for b in row
+            if cb.decode(b.callback_data)[1][1:] == list(fields)
+        )
+        await app.process_update(with_bot(callback_update(OWNER, OWNER, button), app.bot))
+        await app.shutdown()
+        return [text] + [
+            params["text"] for endpoint, params in request.calls
+            if endpoint == "editMessageText"
+        ]
+
+    return asyncio.run(main())
+
+
+def test_duplicate_prompt_renames_the_existing_card(store):
+    card_id, _ = store.add_card(OWNER, "Shop", CODE, "ean13")
+    prompt, reply = _answer_duplicate_prompt(store, card_id, "Corner shop")
+    assert "already exists as *Shop*" in prompt
+    assert reply == "\u2705 Card renamed to *Corner shop*."
+    assert store.get_card(card_id).card_name == "Corner shop"
+
+
+def test_duplicate_prompt_can_keep_the_existing_card(store):
+    card_id, _ = store.add_card(OWNER, "Shop", CODE, "ean13")
+    _, reply = _answer_duplicate_prompt(store, card_id, "Corner shop", "keep")
+    assert reply == "\u2705 Kept the existing card."
+    assert store.get_card(card_id).card_name == "Shop"
+
+
+# =====================================================================
+#  Conflicts
+# =====================================================================
+
+def test_add_card_returns_the_card_recreated_during_a_retry(store, monkeypatch):
+    card_id, _ = store.add_card(OWNER, "Theirs", CODE, "ean13")
+    fetch = store._fetch_card
+    lookups = []
+
+    def deleted_then_recreated(doc_id):
+        # The first lookup misses: the card was deleted after our create
+        # failed, and another save recreated it before our retry.
+        lookups.append(doc_id)
+        return None if len(lookups) == 1 else fetch(doc_id)
+
+    monkeypatch.setattr(store, "_fetch_card", deleted_then_recreated)
+    assert store.add_card(OWNER, "Mine", CODE, "ean13") == (card_id, fetch(card_id))
+    assert fetch(card_id).card_name == "Theirs"
+    assert len(lookups) == 2
+
+
+def test_add_card_gives_up_when_the_card_keeps_churning(store, cluster, monkeypatch):
+    store.add_card(OWNER, "Theirs", CODE, "ean13")
+    monkeypatch.setattr(store, "_fetch_card", lambda doc_id: None)
+    with pytest.raises(ConflictError):
+        store.add_card(OWNER, "Mine", CODE, "ean13")
+    creates = [path for method, path in cluster.writes() if "/_create/" in path]
+    assert len(creates) == 1 + opensearch_client.ADD_CARD_ATTEMPTS
@@ -0,0 +1,137 @@
+"""Event-loop stall watchdog, the sampling profiler and ``/profile``."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+from collections import Counter
+
+import pytest
+from telegram.ext import CallbackContext
+
+from app import profiling
+from app.handlers import admin
+from app.profiling import StallWatchdog, collapsed, sample_stacks
+from helpers import offline_application, text_update, with_bot
+
+THRESHOLD = 0.1
+ADMIN = 7
+
+
+def block_the_loop(seconds: float) -> None:
+    time.sleep(seconds)
+
+
+def watch(scenario) -> StallWatchdog:
+    watchdog = StallWatchdog(THRESHOLD)
+
+    async def main() -> None:
+        watchdog.start()
+        await asyncio.sleep(THRESHOLD)
+        await scenario()
+        # Give the watchdog a few checks to see the loop recover.
+        await asyncio.sleep(THRESHOLD)
+        await watchdog.stop()
+
+    asyncio.run(main())
+    return watchdog
+
+
+def test_watchdog_logs_the_blocking_stack(caplog):
+    async def stall() -> None:
+        block_the_loop(THRESHOLD * 4)
+
+    with caplog.at_level(logging.WARNING, logger=profiling.__name__):
+        watchdog = watch(stall)
+
+    assert watchdog.stalls == 1
+    blocked, recovered = [record.getMessage() for record in caplog.records]
+    assert blocked.startswith("Event loop blocked for")
+    assert "in block_the_loop\n    time.sleep(seconds)" in blocked
+    assert recovered.startswith("Event loop was blocked for")
+
+
+def test_watchdog_stays_quiet_while_the_loop_is_free(caplog):
+    async def idle() -> None:
+        await asyncio.sleep(THRESHOLD * 4)
+
+    with caplog.at_level(logging.WARNING, logger=profiling.__name__):
+        watchdog = watch(idle)
+
+    assert watchdog.stalls == 0
+    assert caplog.records == []
+
+
+def spin(stop: threading.Event) -> None:
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_sample_stacks_collapses_other_threads():
+    stop = threading.Event()
+    worker = threading.Thread(target=spin, args=(stop,), name="busy")
+    worker.start()
+    try:
+        counts = sample_stacks(0.2, interval=0.001)
+    finally:
+        stop.set()
+        worker.join()
+
+    busy = {stack: n for stack, n in counts.items() if stack.startswith("busy;")}
+    assert busy
+    assert all(f"{__name__}:spin" in stack.split(";") for stack in busy)
+    # The sampling thread itself is never in the profile.
+    assert not any("sample_stacks" in stack for stack in counts)
+
+
+def test_only_one_profile_runs_at_a_time():
+    first = threading.Thread(target=sample_stacks, args=(0.3,))
+    first.start()
+    time.sleep(0.05)
+    try:
+        with pytest.raises(RuntimeError):
+            sample_stacks(0.1)
+    finally:
+        first.join()
+    assert sample_stacks(0.01) is not None  # released again
+
+
+def test_collapsed_lists_heaviest_stacks_first():
+    counts = Counter({"main;a;b": 1, "main;a;c": 3})
+    assert collapsed(counts) == "main;a;c 3\nmain;a;b 1\n"
+
+
+@pytest.mark.parametrize("user_id, args, seconds", [
+    (ADMIN, [], admin.PROFILE_DEFAULT_SECONDS),
+    (ADMIN, ["0.01"], 1),
+    (ADMIN, ["600"], admin.PROFILE_MAX_SECONDS),
+    (ADMIN + 1, [], None),
+])
+def test_profile_command(monkeypatch, user_id, args, seconds):
+    sampled: list[float] = []
+
+    def fake_sample(duration: float) -> Counter[str]:
+        sampled.append(duration)
+        return Counter({"MainThread;app.main:main;asyncio:run": 5})
+
+    monkeypatch.setattr(admin, "ADMIN_USER_IDS", frozenset({ADMIN}))
+    monkeypatch.setattr(admin, "sample_stacks", fake_sample)
+
+    async def main() -> list[tuple[str, dict]]:
+        app, request = await offline_application()
+        update = with_bot(text_update(user_id, user_id, "/profile"), app.bot)
+        context = CallbackContext.from_update(update, app)
+        context.args = args
+        await admin.profile_command(update, context)
+        await app.shutdown()
+        return [call for call in request.calls if call[0] != "getMe"]
+
+    calls = asyncio.run(main())
+    if seconds is None:
+        assert calls == [] and sampled == []
+        return
+    assert sampled == [seconds]
+    assert [endpoint for endpoint, _ in calls] == ["sendMessage", "sendDocument"]
+    assert calls[1][1]["caption"].startswith("5 samples, 1 distinct stacks.")
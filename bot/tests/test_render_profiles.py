@@ -0,0 +1,115 @@
+"""Render profiles, pre-rendering at save time and file_id reuse."""
+
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+from telegram.ext import CallbackQueryHandler
+
+from app.handlers import cards
+from app.handlers import callbacks as cb
+from app.services.barcode_generator import DEFAULT_PROFILE, render_barcode
+from app.services.opensearch_client import INDEX_NAME
+from fake_opensearch import FakeCluster
+from helpers import callback_update, offline_application, with_bot
+
+OWNER = 42
+CODE = "4006381333931"
+CACHE_CHAT = -1001
+
+
+@pytest.fixture
+def cluster():
+    return FakeCluster()
+
+
+@pytest.fixture
+def store(cluster):
+    return cluster.opensearch_client()
+
+
+def test_resolve_profile_prefers_card_then_owner_then_default(store):
+    assert cards.resolve_profile(store, OWNER) == DEFAULT_PROFILE
+    store.set_render_profile(OWNER, "print")
+    assert cards.resolve_profile(store, OWNER) == "print"
+    assert cards.resolve_profile(store, OWNER, "compact") == "compact"
+    assert cards.resolve_profile(store, OWNER, "no-such-profile") == DEFAULT_PROFILE
+
+
+def test_prerender_warms_the_render_cache(store, monkeypatch):
+    monkeypatch.setattr(cards, "RENDER_CACHE_CHAT_ID", 0)
+    render_barcode.__wrapped__.cache_clear()
+
+    async def main() -> list[str]:
+        app, request = await offline_application()
+        await cards.prerender_card(app.bot, store, "x" * 20, OWNER, CODE, "ean13")
+        await app.shutdown()
+        return [endpoint for endpoint, _ in request.calls if endpoint != "getMe"]
+
+    assert asyncio.run(main()) == []  # no upload without a cache chat
+    before = render_barcode.__wrapped__.cache_info().hits
+    render_barcode(CODE, "ean13", "png", DEFAULT_PROFILE)
+    assert render_barcode.__wrapped__.cache_info().hits == before + 1
+
+
+def test_prerender_uploads_once_and_stores_the_file_id(store, monkeypatch):
+    monkeypatch.setattr(cards, "RENDER_CACHE_CHAT_ID", CACHE_CHAT)
+    store.set_render_profile(OWNER, "print")
+    card_id, _ = store.add_card(OWNER, "Shop", CODE, "ean13")
+
+    async def main() -> list[tuple[str, dict]]:
+        app, request = await offline_application()
+        await cards.prerender_card(app.bot, store, card_id, OWNER, CODE, "ean13")
+        await app.shutdown()
+        return [call for call in request.calls if call[0] != "getMe"]
+
+    calls = asyncio.run(main())
+    assert [endpoint for endpoint, _ in calls] == ["sendPhoto", "deleteMessage"]
+    assert calls[0][1]["chat_id"] == CACHE_CHAT
+    assert calls[1][1]["chat_id"] == CACHE_CHAT
+    assert store.get_card(card_id).file_ids == {"print": "photo2"}
+
+
+def _show(store, card_id: str) -> list[tuple[str, dict]]:
+    """Press the card's button; return the Bot API calls made."""
+
+    async def main() -> list[tuple[str, dict]]:
+        app, request = await offline_application()
+        app.bot_data["os_client"] = store
+        router = cb.CallbackRouter()
+        router.route(cb.SHOW_CARD, cards.show_card)
+        app.add_handler(CallbackQueryHandler(router.dispatch))
+        update = with_bot(callback_update(OWNER, OWNER, cb.encode(cb.SHOW_CARD, card_id)), app.bot)
+        await app.process_update(update)
+        await app.shutdown()
+        return [call for call in request.calls if call[0] not in ("getMe", "answerCallbackQuery")]
+
+    return asyncio.run(main())
+
+
+def test_show_card_uploads_once_then_reuses_the_file_id(store, cluster):
+    card_id, _ = store.add_card(OWNER, "Shop", CODE, "ean13")
+
+    first = _show(store, card_id)
+    assert [endpoint for endpoint, _ in first] == ["sendPhoto"]
+    assert "photo" not in first[0][1]  # uploaded as a file, not sent by file_id
+    file_id = store.get_card(card_id).file_ids[DEFAULT_PROFILE]
+
+    writes = len(cluster.writes())
+    second = _show(store, card_id)
+    assert [endpoint for endpoint, _ in second] == ["sendPhoto"]
+    assert second[0][1]["photo"] == file_id
+    assert len(cluster.writes()) == writes  # nothing stored again
+
+
+def test_show_card_uses_the_file_id_of_the_resolved_profile(store, cluster):
+    card_id, _ = store.add_card(OWNER, "Shop", CODE, "ean13")
+    store.set_card_file_id(card_id, "print", "print-file")
+    store.set_render_profile(OWNER, "print")
+
+    assert _show(store, card_id)[0][1]["photo"] == "print-file"
+
+    store.set_card_render_profile(card_id, "compact")
+    assert "photo" not in _show(store, card_id)[0][1]
+    assert set(cluster.docs[INDEX_NAME][card_id]["file_ids"]) == {"print", "compact"}
@@ -0,0 +1,439 @@
+"""Circuit breaker, fallbacks and the durable write queue against a fake cluster."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+
+import pytest
+from opensearchpy.exceptions import ConnectionError as OSConnectionError
+from telegram.ext import CallbackContext
+
+from app.handlers import callbacks as cb
+from app.handlers.cards import confirm_save
+from app.handlers.errors import error_handler
+from app.services.opensearch_client import INDEX_NAME, SETTINGS_INDEX, card_doc_id
+from app.services.resilience import (
+    CircuitBreaker,
+    ResilientOpenSearchClient,
+    StorageUnavailable,
+)
+from fake_opensearch import FakeCluster
+from helpers import OfflineRequest, callback_update, offline_application, with_bot
+
+OWNER = 42
+RESET = 10.0
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def cluster() -> FakeCluster:
+    return FakeCluster()
+
+
+@pytest.fixture
+def clock() -> Clock:
+    return Clock()
+
+
+def make_client(cluster: FakeCluster, clock: Clock, queue_path, threshold: int = 1):
+    client = ResilientOpenSearchClient("localhost", 9200, queue_path, threshold, RESET)
+    client.client = cluster.client()
+    client.breaker = CircuitBreaker(threshold, RESET, clock=clock)
+    # Replay runs when a test calls it, not on a background thread.
+    client.replay_async = lambda: None
+    return client
+
+
+@pytest.fixture
+def client(cluster, clock, tmp_path):
+    return make_client(cluster, clock, tmp_path / "queue.jsonl")
+
+
+def seed(client: ResilientOpenSearchClient, name: str = "Shop", code: str = "4006381333931") -> str:
+    card_id, existing = client.add_card(OWNER, name, code, "ean13")
+    assert existing is None
+    return card_id
+
+
+def open_circuit(client, cluster) -> None:
+    cluster.down = True
+    with pytest.raises(StorageUnavailable):
+        client.bulk_record_usage({"x" * 20: (1, 1)})
+    assert client.breaker.state == CircuitBreaker.OPEN
+
+
+# =====================================================================
+#  Opening
+# =====================================================================
+
+def test_circuit_opens_after_threshold_and_then_fails_fast(cluster, clock, tmp_path):
+    client = make_client(cluster, clock, tmp_path / "queue.jsonl", threshold=3)
+    cluster.down = True
+    for _ in range(3):
+        with pytest.raises(StorageUnavailable):
+            client.get_card("x" * 20)
+    assert client.breaker.state == CircuitBreaker.OPEN
+
+    sent = len(cluster.requests)
+    with pytest.raises(StorageUnavailable):
+        client.get_card("x" * 20)
+    assert len(cluster.requests) == sent
+
+
+def test_client_errors_do_not_open_the_circuit(client, cluster):
+    for _ in range(3):
+        assert client.get_card("x" * 20) is None  # 404 from a healthy cluster
+    assert client.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_nested_breaker_call_keeps_the_failure():
+    breaker = CircuitBreaker(1, RESET)
+
+    def down():
+        raise OSConnectionError("N/A", "down", None)
+
+    with pytest.raises(StorageUnavailable):
+        breaker.call(lambda: breaker.call(down))
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+@pytest.mark.parametrize("method", ["delete_card", "rename_card", "add_card", "bulk_add_cards"])
+def test_writes_count_one_failure_per_operation(cluster, clock, tmp_path, method):
+    client = make_client(cluster, clock, tmp_path / "queue.jsonl", threshold=2)
+    card_id = card_doc_id(OWNER, "4006381333931", "ean13")
+    cluster.down = True
+    calls = {
+        "delete_card": lambda: client.delete_card(card_id, OWNER),
+        "rename_card": lambda: client.rename_card(card_id, OWNER, "New"),
+        "add_card": lambda: client.add_card(OWNER, "Shop", "4006381333931", "ean13"),
+        "bulk_add_cards": lambda: client.bulk_add_cards(OWNER, [
+            {"card_name": "Shop", "card_code": "4006381333931", "barcode_format": "ean13"},
+        ]),
+    }
+    try:
+        calls[method]()
+    except StorageUnavailable:
+        pass  # not queued: unknown card, or a bulk import
+    assert client.breaker.state == CircuitBreaker.CLOSED
+    assert len(cluster.requests) == 1
+    # Queued writes keep later ones in order; a read is the second failure.
+    with pytest.raises(StorageUnavailable):
+        client.get_cards(OWNER)
+    assert client.breaker.state == CircuitBreaker.OPEN
+
+
+# =====================================================================
+#  Half-open probes
+# =====================================================================
+
+def _calls(card_id: str) -> dict:
+    return {
+        "get_cards": lambda c: c.get_cards(OWNER),
+        "get_card": lambda c: c.get_card(card_id),
+        "search_cards": lambda c: c.search_cards(OWNER, "shop"),
+        "get_render_profile": lambda c: c.get_render_profile(OWNER),
+        "get_card_sort": lambda c: c.get_card_sort(OWNER),
+        "add_card": lambda c: c.add_card(OWNER, "Other", "96385074", "ean8"),
+        "rename_card": lambda c: c.rename_card(card_id, OWNER, "Renamed"),
+        "delete_card": lambda c: c.delete_card(card_id, OWNER),
+        "set_card_render_profile": lambda c: c.set_card_render_profile(card_id, "scanner"),
+        "set_render_profile": lambda c: c.set_render_profile(OWNER, "scanner"),
+        "set_card_sort": lambda c: c.set_card_sort(OWNER, "recent"),
+        "set_card_file_id": lambda c: c.set_card_file_id(card_id, "scanner", "file"),
+        "bulk_record_usage": lambda c: c.bulk_record_usage({card_id: (1, 1)}),
+        "bulk_add_cards": lambda c: c.bulk_add_cards(OWNER, [
+            {"card_name": "Bulk", "card_code": "96385074", "barcode_format": "ean8"},
+        ]),
+    }
+
+
+METHODS = list(_calls(""))
+
+
+@pytest.mark.parametrize("method", METHODS)
+def test_half_open_probe_success_closes_the_circuit(client, cluster, clock, method):
+    card_id = seed(client)
+    open_circuit(client, cluster)
+
+    clock.now += RESET
+    cluster.down = False
+    _calls(card_id)[method](client)
+    assert client.breaker.state == CircuitBreaker.CLOSED
+    assert len(client.queue) == 0
+
+
+@pytest.mark.parametrize("method", METHODS)
+def test_half_open_probe_failure_reopens_the_circuit(client, cluster, clock, method):
+    card_id = seed(client)
+    client.get_cards(OWNER)
+    client.get_card(card_id)
+    open_circuit(client, cluster)
+
+    clock.now += RESET
+    sent = len(cluster.requests)
+    try:
+        _calls(card_id)[method](client)
+    except StorageUnavailable:
+        pass
+    assert len(cluster.requests) == sent + 1  # exactly one probe request
+    assert client.breaker.state == CircuitBreaker.OPEN
+
+    # Still within the new open period: nothing reaches the cluster.
+    try:
+        _calls(card_id)[method](client)
+    except StorageUnavailable:
+        pass
+    assert len(cluster.requests) == sent + 1
+
+
+def test_bulk_import_fails_fast_while_the_circuit_is_open(client, cluster):
+    open_circuit(client, cluster)
+    sent = len(cluster.requests)
+    with pytest.raises(StorageUnavailable):
+        client.bulk_add_cards(OWNER, [
+            {"card_name": "Shop", "card_code": "4006381333931", "barcode_format": "ean13"},
+        ])
+    assert len(cluster.requests) == sent
+
+
+# =====================================================================
+#  Fallback caches
+# =====================================================================
+
+def test_deleted_card_is_not_served_as_existing_during_an_outage(client, cluster):
+    card_id = seed(client)
+    assert client.get_card(card_id) is not None
+    assert client.delete_card(card_id, OWNER)
+
+    open_circuit(client, cluster)
+    again, existing = client.add_card(OWNER, "Shop", "4006381333931", "ean13")
+    assert again == card_id
+    assert existing is None
+    assert len(client.queue) == 1
+
+
+@pytest.mark.parametrize("method", ["rename_card", "delete_card"])
+def test_queued_write_to_another_owners_card_is_refused(client, cluster, method):
+    card_id = seed(client)
+    client.get_cards(OWNER)
+    client.get_card(card_id)
+    open_circuit(client, cluster)
+
+    args = (card_id, 999, "Mine now") if method == "rename_card" else (card_id, 999)
+    assert getattr(client, method)(*args) is False
+    assert len(client.queue) == 0
+    assert client.get_card(card_id).card_name == "Shop"
+    assert [c.id for c in client.get_cards(OWNER)] == [card_id]
+
+    # Unknown card: its owner cannot be checked, so nothing is promised.
+    with pytest.raises(StorageUnavailable):
+        getattr(client, method)(*(("y" * 20,) + args[1:]))
+    assert len(client.queue) == 0
+
+
+def test_queued_delete_then_rename_is_refused(client, cluster):
+    card_id = seed(client)
+    client.get_card(card_id)
+    open_circuit(client, cluster)
+
+    assert client.delete_card(card_id, OWNER)
+    assert client.rename_card(card_id, OWNER, "Gone") is False
+    assert len(client.queue) == 1
+
+
+def test_renamed_card_is_served_with_its_new_name_during_an_outage(client, cluster):
+    card_id = seed(client)
+    client.get_cards(OWNER)
+    client.get_card(card_id)
+    assert client.rename_card(card_id, OWNER, "Corner shop")
+
+    open_circuit(client, cluster)
+    assert client.get_card(card_id).card_name == "Corner shop"
+    assert [c.card_name for c in client.get_cards(OWNER)] == ["Corner shop"]
+
+
+# =====================================================================
+#  Write queue
+# =====================================================================
+
+def _queue_writes(client, cluster) -> tuple[str, str]:
+    kept = seed(client, "Bakery", "96385074")
+    client.get_cards(OWNER)
+    open_circuit(client, cluster)
+
+    added, _ = client.add_card(OWNER, "Shop", "4006381333931", "ean13")
+    assert client.rename_card(added, OWNER, "Corner shop")
+    assert client.delete_card(kept, OWNER)
+    client.set_card_sort(OWNER, "recent")
+    assert len(client.queue) == 4
+    # The stale list already shows the queued changes.
+    assert [c.card_name for c in client.get_cards(OWNER)] == ["Corner shop"]
+    return kept, added
+
+
+def _assert_replayed(cluster: FakeCluster, kept: str, added: str, writes_before: int) -> None:
+    assert cluster.writes()[writes_before:] == [
+        ("PUT", f"/{INDEX_NAME}/_create/{added}"),
+        ("POST", f"/{INDEX_NAME}/_update/{added}"),
+        ("DELETE", f"/{INDEX_NAME}/_doc/{kept}"),
+        ("POST", f"/{SETTINGS_INDEX}/_update/{OWNER}"),
+    ]
+    assert list(cluster.docs[INDEX_NAME]) == [added]
+    assert cluster.docs[INDEX_NAME][added]["card_name"] == "Corner shop"
+    assert cluster.docs[SETTINGS_INDEX][str(OWNER)]["card_sort"] == "recent"
+
+
+def test_queued_writes_replay_in_order(client, cluster, clock):
+    kept, added = _queue_writes(client, cluster)
+    writes_before = len(cluster.writes())
+
+    clock.now += RESET
+    cluster.down = False
+    assert client.replay() == 4
+    assert len(client.queue) == 0
+    _assert_replayed(cluster, kept, added, writes_before)
+
+
+def test_replay_stops_at_the_first_outage_and_resumes(client, cluster, clock):
+    _queue_writes(client, cluster)
+    clock.now += RESET
+    assert client.replay() == 0
+    assert len(client.queue) == 4
+    assert client.breaker.state == CircuitBreaker.OPEN
+
+
+def test_queue_is_reloaded_from_disk(cluster, clock, tmp_path):
+    path = tmp_path / "queue.jsonl"
+    kept, added = _queue_writes(make_client(cluster, clock, path), cluster)
+    writes_before = len(cluster.writes())
+    assert [json.loads(line)[0] for line in path.read_text().splitlines()] == [
+        "add_card", "rename_card", "delete_card", "set_card_sort",
+    ]
+
+    restarted = make_client(cluster, Clock(), path)
+    assert len(restarted.queue) == 4
+    cluster.down = False
+    assert restarted.replay() == 4
+    assert path.read_text() == ""
+    _assert_replayed(cluster, kept, added, writes_before)
+
+
+def test_queued_writes_only_hold_back_their_own_owner(client, cluster, clock):
+    open_circuit(client, cluster)
+    queued, _ = client.add_card(OWNER, "Shop", "4006381333931", "ean13")
+    assert client.has_pending_writes(OWNER)
+    assert not client.has_pending_writes(7)
+
+    # OpenSearch is back before the replay ran: other owners write directly.
+    clock.now += RESET
+    cluster.down = False
+    other, existing = client.add_card(7, "Kiosk", "96385074", "ean8")
+    assert existing is None
+    assert other in cluster.docs[INDEX_NAME]
+    client.set_card_sort(7, "recent")
+    assert cluster.docs[SETTINGS_INDEX]["7"]["card_sort"] == "recent"
+
+    # ...while the first owner's writes stay in order behind the queue.
+    client.set_card_sort(OWNER, "recent")
+    assert queued not in cluster.docs[INDEX_NAME]
+    assert len(client.queue) == 2
+    assert client.replay() == 2
+    assert not client.has_pending_writes(OWNER)
+    assert queued in cluster.docs[INDEX_NAME]
+
+
+def test_queue_entries_without_owner_hold_back_everybody(cluster, clock, tmp_path):
+    path = tmp_path / "queue.jsonl"
+    path.write_text(json.dumps(["set_card_sort", [OWNER, "recent"]]) + "\n")
+    client = make_client(cluster, clock, path)
+    assert client.has_pending_writes(7)
+
+    client.set_card_sort(7, "frequent")
+    assert SETTINGS_INDEX not in cluster.docs
+    assert client.replay() == 2
+    assert cluster.docs[SETTINGS_INDEX]["7"]["card_sort"] == "frequent"
+
+
+def test_save_reply_says_the_card_is_pending(client, cluster, clock):
+    async def save(owner: int) -> str:
+        app, request = await offline_application()
+        app.bot_data["os_client"] = client
+        await app.start()  # runs the pre-render task
+        update = with_bot(callback_update(owner, owner, cb.encode(cb.CONFIRM, "yes")), app.bot)
+        context = CallbackContext.from_update(update, app)
+        context.user_data.update(
+            new_card_name="Shop", new_card_code="4006381333931", new_card_format="ean13"
+        )
+        await confirm_save(update, context)
+        await app.stop()
+        await app.shutdown()
+        return next(p["text"] for e, p in request.calls if e == "editMessageText")
+
+    open_circuit(client, cluster)
+    assert asyncio.run(save(OWNER)).startswith(
+        "\u23f3 Card *Shop* will be saved as soon as storage is back."
+    )
+    clock.now += RESET
+    cluster.down = False
+    assert asyncio.run(save(7)).startswith("\u2705 Card *Shop* saved!")
+
+
+# =====================================================================
+#  Error handler
+# =====================================================================
+
+class AnsweredRequest(OfflineRequest):
+    """Rejects ``answerCallbackQuery`` like Telegram does for an answered query."""
+
+    async def do_request(self, url, method, request_data=None, **kwargs):
+        if url.endswith("/answerCallbackQuery"):
+            self.calls.append(("answerCallbackQuery", request_data.parameters))
+            return 400, json.dumps({
+                "ok": False, "error_code": 400,
+                "description": "Bad Request: query is too old and response timeout expired",
+            }).encode()
+        return await super().do_request(url, method, request_data, **kwargs)
+
+
+def test_error_handler_replies_when_the_query_was_already_answered():
+    async def main() -> list[str]:
+        app, request = await offline_application(request=AnsweredRequest())
+        update = with_bot(callback_update(1, 1, "menu:mycards"), app.bot)
+        context = type("Context", (), {"error": StorageUnavailable("down")})()
+        await error_handler(update, context)  # type: ignore[arg-type]
+        await app.shutdown()
+        return [endpoint for endpoint, _ in request.calls]
+
+    assert asyncio.run(main())[-2:] == ["answerCallbackQuery", "sendMessage"]
+
+
+# =====================================================================
+#  Card order
+# =====================================================================
+
+def test_stale_lists_keep_their_sort_order(client, cluster):
+    first = seed(client, "Bakery", "96385074")
+    second = seed(client, "Shop", "4006381333931")
+    assert client.bulk_record_usage({second: (3, 5)}) == (1, {})
+    added = [c.id for c in client.get_cards(OWNER, "added")]
+    frequent = [c.id for c in client.get_cards(OWNER, "frequent")]
+    assert added == [first, second]
+    assert frequent == [second, first]
+
+    open_circuit(client, cluster)
+    assert [c.id for c in client.get_cards(OWNER, "added")] == added
+    assert [c.id for c in client.get_cards(OWNER, "frequent")] == frequent
+    with pytest.raises(StorageUnavailable):
+        client.get_cards(OWNER, "recent")  # never fetched: no stale answer
+
+    client.delete_card(first, OWNER)
+    assert [c.id for c in client.get_cards(OWNER, "added")] == [second]
+    assert [c.id for c in client.get_cards(OWNER, "frequent")] == [second]
@@ -0,0 +1,230 @@
+"""Tracer, sampling, slow exemplars and the span exporters."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from app.services import tracing
+from app.services.tracing import (
+    Exporter,
+    JsonlExporter,
+    OtlpHttpExporter,
+    Span,
+    Tracer,
+    span,
+    traced,
+)
+
+
+class ListExporter(Exporter):
+    """Collects written spans; ``shutdown`` makes them visible."""
+
+    def __init__(self) -> None:
+        self.spans: list[Span] = []
+        super().__init__()
+
+    def write(self, spans: list[Span]) -> None:
+        self.spans.extend(spans)
+
+
+@pytest.fixture
+def exporter():
+    return ListExporter()
+
+
+@traced("lookup")
+def lookup() -> str | None:
+    return tracing.current_span().name if tracing.current_span() else None
+
+
+@traced()
+async def handle() -> None:
+    with span("render", card="x"):
+        await asyncio.to_thread(lookup)
+
+
+def names(spans: list[Span]) -> list[str]:
+    return sorted(s.name for s in spans)
+
+
+def test_exporter_must_implement_write():
+    with pytest.raises(TypeError):
+        Exporter()  # type: ignore[abstract]
+
+
+def test_sampled_trace_exports_the_span_tree(exporter):
+    tracer = Tracer(exporter, sample_ratio=1.0)
+
+    async def main() -> None:
+        with tracer.trace("update", update_id=7):
+            await handle()
+
+    asyncio.run(main())
+    exporter.shutdown()
+    spans = {s.name: s for s in exporter.spans}
+    assert names(exporter.spans) == ["handle", "lookup", "render", "update"]
+    assert len({s.trace.trace_id for s in exporter.spans}) == 1
+    assert spans["update"].parent_id is None
+    assert spans["update"].attributes == {"update_id": 7}
+    assert spans["handle"].parent_id == spans["update"].span_id
+    assert spans["render"].parent_id == spans["handle"].span_id
+    # The context followed the call into the worker thread.
+    assert spans["lookup"].parent_id == spans["render"].span_id
+    assert all(s.end_ns >= s.start_ns > 0 for s in exporter.spans)
+
+
+def test_unsampled_fast_traces_are_not_exported(exporter, monkeypatch):
+    tracer = Tracer(exporter, sample_ratio=0.5)
+    samples = iter([0.9, 0.1])
+    monkeypatch.setattr(tracing.random, "random", lambda: next(samples))
+    with tracer.trace("dropped"):
+        with span("child"):
+            pass
+    with tracer.trace("kept"):
+        pass
+    exporter.shutdown()
+    assert names(exporter.spans) == ["kept"]
+
+
+def test_tracing_is_off_without_exporter_or_slow_threshold():
+    tracer = Tracer(None, sample_ratio=1.0)
+    assert not tracer.enabled
+    with tracer.trace("update") as root:
+        assert root is None
+        with span("child") as child:
+            assert child is None
+        assert lookup() is None
+
+
+def test_slow_trace_is_exported_and_logged(exporter, caplog):
+    tracer = Tracer(exporter, sample_ratio=0.0, slow_seconds=0.01)
+    with caplog.at_level(logging.WARNING, logger=tracing.__name__):
+        with tracer.trace("fast"):
+            pass
+        with tracer.trace("slow"):
+            with span("sleep"):
+                time.sleep(0.02)
+    exporter.shutdown()
+
+    assert names(exporter.spans) == ["sleep", "slow"]
+    assert tracer.slow_traces == 1
+    (record,) = caplog.records
+    assert record.getMessage().startswith("Slow update: slow took")
+    assert "ms  slow\n" in record.getMessage()
+    assert "ms    sleep" in record.getMessage()
+
+
+def test_errors_are_recorded_on_the_span(exporter):
+    tracer = Tracer(exporter, sample_ratio=1.0)
+    with pytest.raises(ValueError):
+        with tracer.trace("update"):
+            with span("storage"):
+                raise ValueError("boom")
+    exporter.shutdown()
+    for exported in exporter.spans:
+        assert exported.to_dict()["status"] == {"code": "ERROR", "message": "ValueError('boom')"}
+
+
+def test_span_outliving_its_root_is_exported_late(exporter):
+    tracer = Tracer(exporter, sample_ratio=1.0)
+
+    async def main() -> None:
+        release = asyncio.Event()
+
+        async def background() -> None:
+            with span("background"):
+                await release.wait()
+
+        with tracer.trace("update"):
+            task = asyncio.create_task(background())
+            await asyncio.sleep(0)
+        release.set()
+        await task
+
+    asyncio.run(main())
+    exporter.shutdown()
+    assert names(exporter.spans) == ["background", "update"]
+    assert all(s.end_ns for s in exporter.spans)
+
+
+def test_jsonl_exporter_appends_one_object_per_span(tmp_path):
+    path = tmp_path / "traces" / "spans.jsonl"
+    exporter = JsonlExporter(path)
+    tracer = Tracer(exporter, sample_ratio=1.0)
+    with tracer.trace("update", chat=-5):
+        with span("render"):
+            pass
+    exporter.shutdown()
+
+    rows = [json.loads(line) for line in path.read_text().splitlines()]
+    assert sorted(row["name"] for row in rows) == ["render", "update"]
+    root = next(row for row in rows if row["name"] == "update")
+    assert root["parentSpanId"] == ""
+    assert root["attributes"] == {"chat": -5}
+    assert root["status"] == {"code": "OK"}
+    assert {row["traceId"] for row in rows} == {root["traceId"]}
+
+
+def test_otlp_exporter_posts_resource_spans():
+    bodies: list[dict] = []
+
+    class Collector(BaseHTTPRequestHandler):
+        def do_POST(self) -> None:
+            length = int(self.headers["Content-Length"])
+            bodies.append({
+                "path": self.path,
+                "type": self.headers["Content-Type"],
+                "json": json.loads(self.rfile.read(length)),
+            })
+            self.send_response(200)
+            self.end_headers()
+
+        def log_message(self, *args) -> None:
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Collector)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        exporter = OtlpHttpExporter(f"http://127.0.0.1:{server.server_port}/v1/traces")
+        tracer = Tracer(exporter, sample_ratio=1.0)
+        with tracer.trace("update", update_id=3, slow=False, ratio=0.5, kind="text"):
+            pass
+        exporter.shutdown()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    (body,) = bodies
+    assert body["path"] == "/v1/traces"
+    assert body["type"] == "application/json"
+    (resource,) = body["json"]["resourceSpans"]
+    assert resource["resource"]["attributes"] == [
+        {"key": "service.name", "value": {"stringValue": tracing.SERVICE_NAME}},
+    ]
+    (otlp_span,) = resource["scopeSpans"][0]["spans"]
+    assert otlp_span["name"] == "update"
+    assert otlp_span["status"] == {"code": 1}
+    assert int(otlp_span["endTimeUnixNano"]) >= int(otlp_span["startTimeUnixNano"])
+    assert otlp_span["attributes"] == [
+        {"key": "update_id", "value": {"intValue": "3"}},
+        {"key": "slow", "value": {"boolValue": False}},
+        {"key": "ratio", "value": {"doubleValue": 0.5}},
+        {"key": "kind", "value": {"stringValue": "text"}},
+    ]
+
+
+def test_configure_installs_the_process_wide_tracer(tmp_path, monkeypatch):
+    monkeypatch.setattr(tracing, "tracer", tracing.tracer)
+    installed = tracing.configure("jsonl", jsonl_path=str(tmp_path / "t.jsonl"), sample_ratio=1.0)
+    assert tracing.tracer is installed
+    assert isinstance(installed.exporter, JsonlExporter)
+    installed.shutdown()
+    with pytest.raises(ValueError):
+        tracing.configure("zipkin")
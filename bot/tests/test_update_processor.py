@@ -0,0 +1,245 @@
+"""Stress tests for ``KeyedUpdateProcessor``: ordering per key, concurrency cap."""
+
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from collections import defaultdict
+
+import pytest
+from telegram.ext import (
+    ApplicationBuilder,
+    CallbackQueryHandler,
+    ContextTypes,
+    ConversationHandler,
+    MessageHandler,
+    filters,
+)
+
+from app.handlers import callbacks as cb
+from app.handlers.callbacks import CallbackRouter
+from app.handlers.cards import card_style_cb, delete_card_cb, mycards, show_card
+from app.services.models import Card
+from app.update_processor import KeyedUpdateProcessor
+from helpers import callback_update, offline_application, text_update, with_bot
+
+
+def test_random_keys_keep_order_and_respect_the_cap():
+    cap = 8
+    rng = random.Random(31)
+    keys = [(rng.randint(1, 40), rng.randint(1, 5)) for _ in range(5000)]
+    seen: dict[tuple[int, int], list[int]] = defaultdict(list)
+    running = 0
+    peak = 0
+
+    async def work(key: tuple[int, int], seq: int) -> None:
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(rng.random() / 1000)
+        seen[key].append(seq)
+        running -= 1
+
+    async def main() -> KeyedUpdateProcessor:
+        processor = KeyedUpdateProcessor(cap)
+        await asyncio.gather(*(
+            processor.process_update(text_update(chat_id, user_id, "x"), work((chat_id, user_id), i))
+            for i, (chat_id, user_id) in enumerate(keys)
+        ))
+        return processor
+
+    processor = asyncio.run(main())
+
+    expected: dict[tuple[int, int], list[int]] = defaultdict(list)
+    for i, key in enumerate(keys):
+        expected[key].append(i)
+    assert seen == expected
+    assert 1 < peak <= cap
+    assert processor.active_keys == 0
+
+
+def test_failing_update_does_not_stall_its_key():
+    done: list[int] = []
+
+    async def work(i: int) -> None:
+        if i == 1:
+            raise RuntimeError("boom")
+        done.append(i)
+
+    async def main() -> None:
+        processor = KeyedUpdateProcessor(4)
+        await asyncio.gather(*(
+            processor.process_update(text_update(1, 1, "x"), work(i)) for i in range(4)
+        ))
+
+    asyncio.run(main())
+    assert done == [0, 2, 3]
+
+
+# ── a real ConversationHandler under concurrent load ─────────────────
+
+NAME, CODE = range(2)
+
+
+def _conversation(log: dict[int, list[str]]) -> ConversationHandler:
+    """/add → name → code, with random awaits inside every step."""
+
+    async def pause() -> None:
+        await asyncio.sleep(random.random() / 500)
+
+    async def entry(update, context: ContextTypes.DEFAULT_TYPE) -> int:
+        await pause()
+        context.user_data["card"] = {}
+        log[update.effective_user.id].append("entry")
+        return NAME
+
+    async def name(update, context: ContextTypes.DEFAULT_TYPE) -> int:
+        await pause()
+        context.user_data["card"]["name"] = update.message.text
+        log[update.effective_user.id].append("name")
+        return CODE
+
+    async def code(update, context: ContextTypes.DEFAULT_TYPE) -> int:
+        await pause()
+        card = context.user_data.pop("card")
+        card["code"] = update.message.text
+        log[update.effective_user.id].append(f"saved {card['name']}={card['code']}")
+        return ConversationHandler.END
+
+    return ConversationHandler(
+        entry_points=[MessageHandler(filters.Regex("^add$"), entry)],
+        states={
+            NAME: [MessageHandler(filters.Regex("^name"), name)],
+            CODE: [MessageHandler(filters.Regex("^code"), code)],
+        },
+        fallbacks=[],
+    )
+
+
+def test_conversation_state_survives_concurrent_updates():
+    users = range(1, 201)
+    rounds = 3
+    log: dict[int, list[str]] = defaultdict(list)
+
+    async def main() -> ConversationHandler:
+        app, _ = await offline_application(
+            ApplicationBuilder().concurrent_updates(KeyedUpdateProcessor(16))
+        )
+        conversation = _conversation(log)
+        app.add_handler(conversation)
+
+        # Every user runs several add-card flows back to back.  The users'
+        # streams are randomly interleaved, so a user's next message often
+        # arrives while the previous one is still being handled.
+        streams = {
+            user_id: [
+                text_update(user_id, user_id, step)
+                for r in range(rounds)
+                for step in ("add", f"name{r}", f"code{r}")
+            ]
+            for user_id in users
+        }
+        rng = random.Random(7)
+        updates = []
+        while streams:
+            user_id = rng.choice(list(streams))
+            updates.append(streams[user_id].pop(0))
+            if not streams[user_id]:
+                del streams[user_id]
+        await asyncio.gather(*(
+            app.update_processor.process_update(update, app.process_update(update))
+            for update in updates
+        ))
+        return conversation
+
+    conversation = asyncio.run(main())
+
+    expected = []
+    for r in range(rounds):
+        expected += ["entry", "name", f"saved name{r}=code{r}"]
+    assert {user_id: log[user_id] for user_id in users} == {user_id: expected for user_id in users}
+    assert not conversation._conversations  # every flow reached END
+
+
+# ── a slow store must not hold up other users ────────────────────────
+
+SLOW_OWNER = 1
+DELAY = 0.3
+
+
+class SlowStore:
+    """Card storage that blocks (like a slow OpenSearch) for one owner."""
+
+    def __init__(self) -> None:
+        self.cards = {
+            owner: Card(f"{owner:020d}", owner, f"Shop {owner}", "ean13", "4006381333931")
+            for owner in (1, 2)
+        }
+
+    def _wait(self, owner_id: int) -> None:
+        if owner_id == SLOW_OWNER:
+            time.sleep(DELAY)
+
+    def get_card(self, card_id: str) -> Card | None:
+        card = next(c for c in self.cards.values() if c.id == card_id)
+        self._wait(card.owner_id)
+        return card
+
+    def delete_card(self, card_id: str, owner_id: int) -> bool:
+        self._wait(owner_id)
+        return True
+
+    def get_render_profile(self, owner_id: int) -> str | None:
+        self._wait(owner_id)
+        return None
+
+    def set_card_file_id(self, card_id: str, profile: str, file_id: str) -> None:
+        self._wait(int(card_id))
+
+    def get_card_sort(self, owner_id: int) -> str:
+        self._wait(owner_id)
+        return "added"
+
+    def get_cards(self, owner_id: int, sort: str = "added") -> list[Card]:
+        self._wait(owner_id)
+        return [self.cards[owner_id]]
+
+
+@pytest.mark.parametrize(
+    "tag", [cb.SHOW_CARD, cb.DELETE_CARD, cb.CARD_STYLE], ids=["show", "delete", "style"]
+)
+def test_slow_storage_call_does_not_block_other_users(tag):
+    async def main() -> tuple[float, float]:
+        app, request = await offline_application(
+            ApplicationBuilder().concurrent_updates(KeyedUpdateProcessor(8))
+        )
+        store = app.bot_data["os_client"] = SlowStore()
+        router = CallbackRouter()
+        router.route(cb.MY_CARDS, mycards)
+        router.route(cb.SHOW_CARD, show_card)
+        router.route(cb.DELETE_CARD, delete_card_cb)
+        router.route(cb.CARD_STYLE, card_style_cb)
+        app.add_handler(CallbackQueryHandler(router.dispatch))
+
+        done: dict[int, float] = {}
+
+        async def handle(update) -> None:
+            await app.process_update(update)
+            done[update.effective_user.id] = time.monotonic()
+
+        slow = with_bot(callback_update(
+            SLOW_OWNER, SLOW_OWNER, cb.encode(tag, store.cards[SLOW_OWNER].id)
+        ), app.bot)
+        fast = with_bot(callback_update(2, 2, cb.encode(cb.MY_CARDS)), app.bot)
+        start = time.monotonic()
+        await asyncio.gather(*(
+            app.update_processor.process_update(update, handle(update)) for update in (slow, fast)
+        ))
+        await app.shutdown()
+        assert not [c for c in request.calls if c[0] == "sendMessage"]  # no error replies
+        return done[2] - start, done[SLOW_OWNER] - start
+
+    fast_took, slow_took = asyncio.run(main())
+    assert slow_took >= DELAY
+    assert fast_took < DELAY / 2
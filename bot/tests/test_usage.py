@@ -0,0 +1,77 @@
+"""``UsageTracker`` flushes through ``bulk_record_usage``."""
+
+from __future__ import annotations
+
+import pytest
+
+from app.services.opensearch_client import INDEX_NAME, USAGE_RETRY_ON_CONFLICT
+from app.services.usage import UsageTracker
+from fake_opensearch import FakeCluster
+
+OWNER = 42
+
+
+@pytest.fixture
+def cluster():
+    return FakeCluster()
+
+
+@pytest.fixture
+def store(cluster):
+    return cluster.opensearch_client()
+
+
+def uses(cluster, card_id: str) -> int:
+    return cluster.docs[INDEX_NAME][card_id].get("use_count", 0)
+
+
+def test_conflicts_are_retried_server_side(store, cluster):
+    card_id, _ = store.add_card(OWNER, "Shop", "4006381333931", "ean13")
+    cluster.conflicts[card_id] = USAGE_RETRY_ON_CONFLICT
+    tracker = UsageTracker(store)
+    tracker.record(card_id)
+
+    assert tracker.flush() == 1
+    assert uses(cluster, card_id) == 1
+    assert len(tracker) == 0
+
+
+def test_cards_still_conflicting_are_kept_for_the_next_flush(store, cluster):
+    busy, _ = store.add_card(OWNER, "Shop", "4006381333931", "ean13")
+    calm, _ = store.add_card(OWNER, "Bakery", "96385074", "ean8")
+    cluster.conflicts[busy] = USAGE_RETRY_ON_CONFLICT + 1
+    tracker = UsageTracker(store)
+    for card_id in (busy, busy, calm):
+        tracker.record(card_id)
+
+    assert tracker.flush() == 1
+    assert uses(cluster, calm) == 1
+    assert uses(cluster, busy) == 0
+    assert len(tracker) == 1
+
+    tracker.record(busy)
+    assert tracker.flush() == 1
+    assert uses(cluster, busy) == 3  # no use lost or counted twice
+
+
+def test_deleted_cards_are_dropped(store, cluster):
+    card_id, _ = store.add_card(OWNER, "Shop", "4006381333931", "ean13")
+    tracker = UsageTracker(store)
+    tracker.record(card_id)
+    store.delete_card(card_id, OWNER)
+
+    assert tracker.flush() == 0
+    assert len(tracker) == 0
+
+
+def test_failed_flush_keeps_every_count(store, cluster):
+    card_id, _ = store.add_card(OWNER, "Shop", "4006381333931", "ean13")
+    tracker = UsageTracker(store)
+    tracker.record(card_id)
+    cluster.down = True
+    assert tracker.flush() == 0
+    tracker.record(card_id)
+
+    cluster.down = False
+    assert tracker.flush() == 1
+    assert uses(cluster, card_id) == 2
@@ -0,0 +1,55 @@
+// Client for the bot's HTTP API (see bot/app/api.py).
+// Disabled unless the app is built with VITE_API_URL set.
+
+const API_URL = (import.meta.env.VITE_API_URL || '').replace(/\/$/, '')
+
+export const apiEnabled = Boolean(API_URL)
+
+function authHeaders() {
+  return { Authorization: `tma ${window.Telegram?.WebApp?.initData || ''}` }
+}
+
+async function request(path, options = {}) {
+  const res = await fetch(API_URL + path, {
+    ...options,
+    headers: { ...authHeaders(), ...(options.headers || {}) },
+  })
+  if (!res.ok) {
+    let message = res.statusText
+    try {
+      message = (await res.json()).error || message
+    } catch { /* not JSON */ }
+    throw new Error(message)
+  }
+  return res
+}
+
+export async function listCards(query = '') {
+  const qs = query ? `?q=${encodeURIComponent(query)}` : ''
+  const res = await request(`/api/cards${qs}`)
+  return (await res.json()).cards
+}
+
+export async function saveCard(card) {
+  const res = await request('/api/cards', {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify(card),
+  })
+  return res.json()
+}
+
+export async function deleteCard(id) {
+  await request(`/api/cards/${id}`, { method: 'DELETE' })
+}
+
+export async function getCard(id) {
+  const res = await request(`/api/cards/${id}`)
+  return res.json()
+}
+
+// Immutable, publicly cacheable URL of the card's barcode image.
+export async function barcodeImageUrl(id) {
+  const { image_url: path } = await getCard(id)
+  return API_URL + path
+}